@@ -0,0 +1,645 @@
+#!/usr/bin/env python3
+"""
+Benchmarks del procesador de pagos
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from openpyxl import Workbook
+
+from extraer_pagos import ExcelPaymentProcessorV3, rss_pico_mb
+
+
+TAMAÑOS_PARTICION = [10_000, 100_000, 1_000_000]
+
+# La partición original es cuadrática: solo se mide en tamaños razonables
+MAX_FILAS_PARTICION_LEGACY = 100_000
+
+# Suite de libros sintéticos: estudiantes por escenario
+TAMAÑOS_SUITE = [1_000, 10_000, 100_000]
+ETAPAS_SUITE = ('lectura', 'extraccion', 'escritura')
+DIRECTORIO_BENCHMARKS = Path('benchmarks')
+ARCHIVO_RESULTADOS = DIRECTORIO_BENCHMARKS / 'resultados.json'
+
+# Compuerta de regresiones: cambio máximo tolerado sobre la mediana de la base
+UMBRAL_REGRESION_PCT = 10.0
+UMBRAL_MEMORIA_PCT = 15.0
+# Diferencias menores a esto son ruido sin importar el porcentaje
+MINIMO_SEGUNDOS = 0.05
+# La tolerancia crece con la dispersión observada: FACTOR_RUIDO × MAD relativa
+FACTOR_RUIDO = 3.0
+
+MESES = [
+    'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+    'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'
+]
+MESES_CORTOS = ['ene', 'feb', 'mar', 'abr', 'may', 'jun', 'jul', 'ago', 'sep', 'oct', 'nov', 'dic']
+
+# Columnas especiales: (encabezado, columna inicial); cada grupo ocupa 3 columnas
+COLUMNAS_ESPECIALES = [
+    ('Pago de casos', ExcelPaymentProcessorV3.COL_PAGO_CASOS_START),
+    ('Certificación Internacional', ExcelPaymentProcessorV3.COL_CERTIFICACION_START),
+    ('Títulos', ExcelPaymentProcessorV3.COL_TITULOS_START),
+    ('Capstone Project', ExcelPaymentProcessorV3.COL_CAPSTONE_START),
+    ('Graduación', ExcelPaymentProcessorV3.COL_GRADUACION_START),
+]
+
+# Proporciones de cada formato de fecha de pago
+MEZCLA_FECHAS = {
+    'fecha_excel': 0.35,  # celda con formato de fecha
+    'serial': 0.05,       # número de serie de Excel en una celda numérica
+    'dd/mm/aaaa': 0.30,
+    'd-mmm': 0.20,        # "4-ago": sin año, se deduce de la columna
+    'iso': 0.05,          # "2024-03-15"
+    'invalida': 0.05,     # "31/02/2024", "pendiente"
+}
+
+# Proporciones de cada forma de escribir el banco
+MEZCLA_BANCOS = {
+    'BI': 0.30,
+    'Banrural': 0.20,
+    'Industrial': 0.10,
+    'G & T': 0.10,
+    'BAC': 0.08,
+    'Promerica': 0.05,
+    'visa net': 0.05,
+    'Bantrab': 0.04,
+    'n/a': 0.04,
+    'Banco X': 0.04,
+}
+
+PLANES = ['MBA 24 on line', 'BBA', 'MFM 18 on line', 'MGP', 'MMKD', 'MRRHH', 'DBA', 'Plan nuevo']
+ESTATUS = ['Activo', 'Activo', 'Activo', 'Inactivo', 'Graduado 2023']
+
+
+def generar_carnets_ordenados(num_filas: int, pagos_por_estudiante: int = 12, seed: int = 42) -> pd.Series:
+    """Genera una columna de carnés ordenada con un número variable de pagos por estudiante."""
+    rng = np.random.default_rng(seed)
+    num_estudiantes = max(num_filas // pagos_por_estudiante, 1)
+    ids = np.sort(rng.integers(0, num_estudiantes, size=num_filas))
+    return pd.Series([f"ASM{2020000000 + i}" for i in ids], name='carnet')
+
+
+def particion_legacy(carnets: pd.Series, tamaño_bloque: int) -> List[List[str]]:
+    """Partición original: filtra el DataFrame completo una vez por estudiante."""
+    df_export = carnets.to_frame()
+    bloques = []
+    bloque_actual = []
+    registros_actual = 0
+
+    for carnet in df_export['carnet'].unique():
+        num_registros = len(df_export[df_export['carnet'] == carnet])
+
+        if registros_actual + num_registros > tamaño_bloque and bloque_actual:
+            bloques.append(bloque_actual)
+            bloque_actual = [carnet]
+            registros_actual = num_registros
+        else:
+            bloque_actual.append(carnet)
+            registros_actual += num_registros
+
+    if bloque_actual:
+        bloques.append(bloque_actual)
+
+    return [df_export[df_export['carnet'].isin(b)] for b in bloques]
+
+
+def benchmark_particion(tamaños: List[int] = TAMAÑOS_PARTICION, repeticiones: int = 3) -> List[dict]:
+    """Mide la división en bloques de generar_excel_normalizado_en_bloques."""
+    processor = ExcelPaymentProcessorV3(log_level=logging.WARNING, configurar_logging=False)
+    resultados = []
+
+    print(f"{'Filas':>12} | {'Estudiantes':>12} | {'Bloques':>8} | {'Nueva (s)':>10} | {'Legacy (s)':>10}")
+    print("-" * 64)
+
+    for num_filas in tamaños:
+        carnets = generar_carnets_ordenados(num_filas)
+        df = carnets.to_frame()
+
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            bloques = processor._particionar_por_estudiante(carnets)
+            _ = [df.iloc[a:b] for a, b, _ in bloques]
+            tiempos.append(time.perf_counter() - inicio)
+        tiempo_nuevo = min(tiempos)
+
+        tiempo_legacy = None
+        if num_filas <= MAX_FILAS_PARTICION_LEGACY:
+            inicio = time.perf_counter()
+            particion_legacy(carnets, processor.TAMAÑO_BLOQUE)
+            tiempo_legacy = time.perf_counter() - inicio
+
+        resultados.append({
+            'filas': num_filas,
+            'estudiantes': int(carnets.nunique()),
+            'bloques': len(bloques),
+            'segundos': tiempo_nuevo,
+            'segundos_legacy': tiempo_legacy,
+        })
+
+        legacy_str = f"{tiempo_legacy:10.3f}" if tiempo_legacy is not None else f"{'-':>10}"
+        print(
+            f"{num_filas:>12,} | {carnets.nunique():>12,} | {len(bloques):>8} | "
+            f"{tiempo_nuevo:10.3f} | {legacy_str}"
+        )
+
+    return resultados
+
+
+# ========== LIBROS SINTÉTICOS ==========
+def _elegir(rng: np.random.Generator, mezcla: Dict[str, float]) -> str:
+    opciones = list(mezcla)
+    pesos = np.array([mezcla[o] for o in opciones], dtype=float)
+    return opciones[rng.choice(len(opciones), p=pesos / pesos.sum())]
+
+
+def _fecha_sintetica(rng: np.random.Generator, formato: str, año: int, mes: int) -> Any:
+    """Fecha de pago dentro del mes de la columna, escrita en el formato indicado."""
+    dia = int(rng.integers(1, 29))
+    fecha = date(año, mes, dia)
+    if formato == 'fecha_excel':
+        return datetime(año, mes, dia)
+    if formato == 'serial':
+        return (fecha - date(1899, 12, 30)).days
+    if formato == 'dd/mm/aaaa':
+        return fecha.strftime('%d/%m/%Y')
+    if formato == 'd-mmm':
+        return f"{dia}-{MESES_CORTOS[mes - 1]}"
+    if formato == 'iso':
+        return fecha.isoformat()
+    return f"31/02/{año}" if rng.random() < 0.5 else "pendiente"
+
+
+def _celdas_pago(
+    rng: np.random.Generator,
+    año: int,
+    mes: int,
+    proporcion_multiples: float,
+    mezcla_fechas: Dict[str, float],
+    mezcla_bancos: Dict[str, float]
+) -> tuple:
+    """(boleta, monto, fecha, banco) de una celda; con varios pagos, separados por '/'."""
+    cantidad = int(rng.integers(2, 4)) if rng.random() < proporcion_multiples else 1
+    boletas, montos, fechas, bancos = [], [], [], []
+
+    for _ in range(cantidad):
+        boletas.append(int(rng.integers(100_000, 99_999_999)))
+        monto = float(rng.choice([850, 950, 1200, 1500, 425.5]))
+        montos.append(monto if rng.random() < 0.8 else f"Q{monto:,.2f}")
+        # En una celda con varios pagos las fechas se escriben como "4-ago/5-sep"
+        formato = _elegir(rng, mezcla_fechas) if cantidad == 1 else 'd-mmm'
+        fechas.append(_fecha_sintetica(rng, formato, año, mes))
+        bancos.append(_elegir(rng, mezcla_bancos))
+
+    if cantidad == 1:
+        return boletas[0], montos[0], fechas[0], bancos[0]
+
+    return (
+        '/'.join(str(b) for b in boletas),
+        '/'.join(str(m) for m in montos),
+        '/'.join(fechas),
+        '/'.join(bancos),
+    )
+
+
+def generar_libro_control(
+    ruta_archivo: str,
+    estudiantes: int = 1_000,
+    años: Sequence[int] = (2023, 2024),
+    proporcion_multiples: float = 0.05,
+    mezcla_fechas: Optional[Dict[str, float]] = None,
+    mezcla_bancos: Optional[Dict[str, float]] = None,
+    densidad_pagos: float = 0.8,
+    proporcion_especiales: float = 0.1,
+    seed: int = 42
+) -> Path:
+    """
+    ✅ Genera un libro de control sintético con el formato que espera
+    ExcelPaymentProcessorV3: fila de años, fila de meses/encabezados y un bloque
+    de 4 filas por estudiante (boletas / cantidades / fechas / bancos).
+
+    - años: un juego de 12 columnas de mes por año, desde COL_MESES_START
+    - proporcion_multiples: fracción de celdas con varios pagos separados por '/'
+    - mezcla_fechas / mezcla_bancos: proporciones de formatos de fecha y bancos
+      (por defecto MEZCLA_FECHAS / MEZCLA_BANCOS)
+    - densidad_pagos: fracción de meses con pago; proporcion_especiales: idem
+      para las columnas especiales
+
+    Con la misma seed el libro es idéntico. No contiene datos reales.
+    """
+    rng = np.random.default_rng(seed)
+    mezcla_fechas = mezcla_fechas or MEZCLA_FECHAS
+    mezcla_bancos = mezcla_bancos or MEZCLA_BANCOS
+    inicio_meses = ExcelPaymentProcessorV3.COL_MESES_START
+    columnas_meses = [(año, mes) for año in años for mes in range(1, 13)]
+    total_columnas = inicio_meses + len(columnas_meses)
+
+    fila_años: List[Any] = [None] * total_columnas
+    encabezados: List[Any] = [
+        'Notas de pago', 'Carné', 'Nombre', 'Plan de estudios', 'Asesor', 'Empresa',
+        'Teléfono', 'Estatus', 'Correo', 'Nomenclatura', 'Mes inicio', 'Valor total'
+    ]
+    encabezados += [None] * (total_columnas - len(encabezados))
+    for nombre, inicio in COLUMNAS_ESPECIALES:
+        encabezados[inicio] = nombre
+    encabezados[ExcelPaymentProcessorV3.COL_INFO_PAGO_START] = 'Información de pago'
+    for j, (año, mes) in enumerate(columnas_meses):
+        if mes == 1:
+            fila_años[inicio_meses + j] = año
+        encabezados[inicio_meses + j] = MESES[mes - 1]
+
+    ruta = Path(ruta_archivo)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Control de pagos')
+    ws.append(fila_años)
+    ws.append(encabezados)
+
+    for e in range(estudiantes):
+        filas = [[None] * total_columnas for _ in range(4)]
+        datos = filas[0]
+        prefijo = 'AMS-' if rng.random() < 0.05 else 'ASM'
+        datos[ExcelPaymentProcessorV3.COL_CARNE] = f"{prefijo}{años[0]}{e:06d}"
+        datos[ExcelPaymentProcessorV3.COL_NOMBRE] = f"Estudiante {e}"
+        datos[ExcelPaymentProcessorV3.COL_PLAN] = PLANES[int(rng.integers(len(PLANES)))]
+        datos[ExcelPaymentProcessorV3.COL_ESTATUS] = ESTATUS[int(rng.integers(len(ESTATUS)))]
+        datos[ExcelPaymentProcessorV3.COL_MES_INICIO] = MESES[int(rng.integers(12))]
+        datos[ExcelPaymentProcessorV3.COL_VALOR_TOTAL] = 20_400
+
+        for _, inicio in COLUMNAS_ESPECIALES:
+            if rng.random() < proporcion_especiales:
+                celdas = _celdas_pago(
+                    rng, años[-1], int(rng.integers(1, 13)),
+                    proporcion_multiples, mezcla_fechas, mezcla_bancos
+                )
+                for fila, valor in zip(filas, celdas):
+                    fila[inicio] = valor
+
+        for j, (año, mes) in enumerate(columnas_meses):
+            if rng.random() < densidad_pagos:
+                celdas = _celdas_pago(rng, año, mes, proporcion_multiples, mezcla_fechas, mezcla_bancos)
+                for fila, valor in zip(filas, celdas):
+                    fila[inicio_meses + j] = valor
+
+        for fila in filas:
+            ws.append(fila)
+
+    wb.save(ruta)
+    return ruta
+
+
+# ========== SUITE DE BENCHMARKS ==========
+def _medir_escenario(ruta_libro: str, modo_lectura: str, repeticiones: int) -> Dict[str, Any]:
+    """
+    Corre un escenario en un proceso propio (la memoria pico es la del escenario).
+    Mide por separado lectura (hoja + mapa de columnas), extracción y escritura.
+    """
+    # Solo se mide el procesamiento: avisos por estudiante fuera de la consola
+    logging.getLogger('extraer_pagos').setLevel(logging.ERROR)
+    tiempos: Dict[str, List[float]] = {etapa: [] for etapa in ETAPAS_SUITE}
+    pagos_extraidos = 0
+
+    for _ in range(repeticiones):
+        processor = ExcelPaymentProcessorV3(log_level=logging.WARNING, configurar_logging=False)
+        processor._iniciar_procesamiento(ruta_libro, modo_lectura)
+
+        inicio = time.perf_counter()
+        bloques, columnas_info, notas = processor._abrir_bloques(ruta_libro, modo_lectura)
+        tiempos['lectura'].append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        pagos = processor._procesar_bloques(bloques, columnas_info, notas)
+        tiempos['extraccion'].append(time.perf_counter() - inicio)
+        pagos_extraidos = len(pagos)
+
+        directorio = tempfile.mkdtemp(prefix='benchmark_pagos_')
+        try:
+            inicio = time.perf_counter()
+            processor.generar_excel_normalizado_en_bloques(pagos, os.path.join(directorio, 'salida.xlsx'))
+            tiempos['escritura'].append(time.perf_counter() - inicio)
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    return {'pagos': pagos_extraidos, 'tiempos': tiempos, 'rss_pico_mb': rss_pico_mb()['proceso']}
+
+
+def cargar_historial(archivo_resultados: Path = ARCHIVO_RESULTADOS) -> List[Dict[str, Any]]:
+    """Corridas anteriores de la suite (la más reciente al final)."""
+    if not Path(archivo_resultados).exists():
+        return []
+    with open(archivo_resultados, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def guardar_corrida(corrida: Dict[str, Any], archivo_resultados: Path = ARCHIVO_RESULTADOS):
+    """Agrega la corrida al historial JSON."""
+    historial = cargar_historial(archivo_resultados)
+    historial.append(corrida)
+    Path(archivo_resultados).parent.mkdir(parents=True, exist_ok=True)
+    with open(archivo_resultados, 'w', encoding='utf-8') as f:
+        json.dump(historial, f, ensure_ascii=False, indent=2)
+
+
+def benchmark_suite(
+    tamaños: Sequence[int] = TAMAÑOS_SUITE,
+    repeticiones: int = 3,
+    modo_lectura: str = 'pandas',
+    directorio: Path = DIRECTORIO_BENCHMARKS,
+    archivo_resultados: Optional[Path] = ARCHIVO_RESULTADOS,
+    etiqueta: str = '',
+    base: bool = False,
+    guardar: bool = True
+) -> Dict[str, Any]:
+    """
+    ✅ Mide lectura, extracción y escritura sobre libros sintéticos de cada tamaño.
+
+    Los libros se generan una vez en <directorio>/libros y se reutilizan (misma
+    seed, mismo contenido). Cada escenario corre en un proceso nuevo; se guardan
+    todas las repeticiones y se imprime la mediana junto a la corrida anterior.
+    base=True marca la corrida como referencia de comparar_con_base();
+    guardar=False no la agrega al historial (la compuerta decide después).
+    """
+    historial = cargar_historial(archivo_resultados) if archivo_resultados else []
+    anterior = historial[-1]['escenarios'] if historial else {}
+
+    corrida: Dict[str, Any] = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'etiqueta': etiqueta,
+        'base': base,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'pandas': pd.__version__,
+        'modo_lectura': modo_lectura,
+        'repeticiones': repeticiones,
+        'escenarios': {},
+    }
+
+    print(f"{'Escenario':<18} | {'Pagos':>9} | " + " | ".join(f"{e + ' (s)':>15}" for e in ETAPAS_SUITE) + f" | {'RSS (MB)':>9}")
+    print("-" * 92)
+
+    for estudiantes in tamaños:
+        nombre = f"sintetico_{estudiantes}"
+        ruta_libro = Path(directorio) / 'libros' / f"{nombre}.xlsx"
+        if not ruta_libro.exists():
+            print(f"🧪 Generando {ruta_libro}...")
+            generar_libro_control(str(ruta_libro), estudiantes=estudiantes)
+
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            resultado = pool.submit(_medir_escenario, str(ruta_libro), modo_lectura, repeticiones).result()
+        resultado['estudiantes'] = estudiantes
+        corrida['escenarios'][nombre] = resultado
+
+        columnas = []
+        for etapa in ETAPAS_SUITE:
+            mediana = statistics.median(resultado['tiempos'][etapa])
+            previo = anterior.get(nombre, {}).get('tiempos', {}).get(etapa)
+            cambio = f"{(mediana / statistics.median(previo) - 1) * 100:+5.0f}%" if previo else ""
+            columnas.append(f"{mediana:8.3f} {cambio:>6}")
+        rss = resultado['rss_pico_mb']
+        rss_str = f"{rss:9.1f}" if rss is not None else f"{'-':>9}"
+        print(f"{nombre:<18} | {resultado['pagos']:>9,} | " + " | ".join(columnas) + f" | {rss_str}")
+
+    if archivo_resultados and guardar:
+        guardar_corrida(corrida, archivo_resultados)
+        print(f"\n💾 Resultados agregados a {archivo_resultados}")
+
+    return corrida
+
+
+# ========== COMPUERTA DE REGRESIONES ==========
+def _dispersion_relativa(valores: Sequence[float]) -> float:
+    """MAD relativa a la mediana (0 con una sola repetición)."""
+    mediana = statistics.median(valores)
+    if len(valores) < 2 or mediana <= 0:
+        return 0.0
+    return statistics.median(abs(v - mediana) for v in valores) / mediana
+
+
+def buscar_base(historial: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    La última corrida marcada como base (--fijar-base), o None. No se usa la
+    corrida anterior: la referencia no debe moverse con cada corrida.
+    """
+    for corrida in reversed(historial):
+        if corrida.get('base'):
+            return corrida
+    return None
+
+
+def comparar_corridas(
+    base: Dict[str, Any],
+    actual: Dict[str, Any],
+    umbral_pct: float = UMBRAL_REGRESION_PCT,
+    umbral_memoria_pct: float = UMBRAL_MEMORIA_PCT,
+    minimo_segundos: float = MINIMO_SEGUNDOS
+) -> List[Dict[str, Any]]:
+    """
+    ✅ Compara dos corridas escenario por escenario y etapa por etapa.
+
+    Se comparan medianas de las repeticiones. La tolerancia de cada etapa es
+    el mayor entre umbral_pct y FACTOR_RUIDO × la dispersión (MAD relativa) de
+    cualquiera de las dos corridas; además, una diferencia menor a
+    minimo_segundos nunca cuenta como regresión. La memoria pico usa
+    umbral_memoria_pct. Los escenarios que no están en ambas corridas se omiten.
+    """
+    filas = []
+
+    for nombre, escenario in actual['escenarios'].items():
+        previo = base['escenarios'].get(nombre)
+        if previo is None:
+            continue
+
+        for etapa in ETAPAS_SUITE:
+            tiempos_base = previo['tiempos'].get(etapa)
+            tiempos_actual = escenario['tiempos'].get(etapa)
+            if not tiempos_base or not tiempos_actual:
+                continue
+
+            mediana_base = statistics.median(tiempos_base)
+            mediana_actual = statistics.median(tiempos_actual)
+            cambio = (mediana_actual / mediana_base - 1) * 100 if mediana_base > 0 else 0.0
+            tolerancia = max(
+                umbral_pct,
+                FACTOR_RUIDO * 100 * max(_dispersion_relativa(tiempos_base), _dispersion_relativa(tiempos_actual))
+            )
+
+            if cambio > tolerancia and mediana_actual - mediana_base >= minimo_segundos:
+                estado = 'REGRESIÓN'
+            elif cambio < -tolerancia and mediana_base - mediana_actual >= minimo_segundos:
+                estado = 'MEJORA'
+            else:
+                estado = 'OK'
+
+            filas.append({
+                'escenario': nombre, 'etapa': etapa, 'unidad': 's',
+                'base': mediana_base, 'actual': mediana_actual,
+                'cambio_pct': cambio, 'tolerancia_pct': tolerancia, 'estado': estado,
+            })
+
+        rss_base, rss_actual = previo.get('rss_pico_mb'), escenario.get('rss_pico_mb')
+        if rss_base and rss_actual:
+            cambio = (rss_actual / rss_base - 1) * 100
+            filas.append({
+                'escenario': nombre, 'etapa': 'memoria_pico', 'unidad': 'MB',
+                'base': rss_base, 'actual': rss_actual,
+                'cambio_pct': cambio, 'tolerancia_pct': umbral_memoria_pct,
+                'estado': (
+                    'REGRESIÓN' if cambio > umbral_memoria_pct
+                    else 'MEJORA' if cambio < -umbral_memoria_pct
+                    else 'OK'
+                ),
+            })
+
+    return filas
+
+
+def imprimir_comparacion(filas: List[Dict[str, Any]]):
+    """Tabla legible de comparar_corridas()."""
+    print(
+        f"{'Escenario':<18} | {'Etapa':<13} | {'Base':>12} | {'Actual':>12} | "
+        f"{'Cambio':>8} | {'Tolerancia':>10} | Estado"
+    )
+    print("-" * 96)
+    for fila in filas:
+        icono = {'REGRESIÓN': '❌', 'MEJORA': '✅', 'OK': '  '}[fila['estado']]
+        print(
+            f"{fila['escenario']:<18} | {fila['etapa']:<13} | "
+            f"{fila['base']:>9.3f} {fila['unidad']:<2} | {fila['actual']:>9.3f} {fila['unidad']:<2} | "
+            f"{fila['cambio_pct']:>+7.1f}% | {fila['tolerancia_pct']:>9.1f}% | {icono} {fila['estado']}"
+        )
+
+
+def comparar_con_base(
+    tamaños: Sequence[int] = TAMAÑOS_SUITE,
+    repeticiones: int = 5,
+    modo_lectura: str = 'pandas',
+    archivo_resultados: Path = ARCHIVO_RESULTADOS,
+    umbral_pct: float = UMBRAL_REGRESION_PCT,
+    umbral_memoria_pct: float = UMBRAL_MEMORIA_PCT,
+    etiqueta: str = '',
+    fijar_base: bool = False
+) -> int:
+    """
+    ✅ Compuerta de regresiones: corre la suite y la compara con la base fija
+    (ver buscar_base). Devuelve 1 si alguna etapa o la memoria pico empeoró más
+    allá de su tolerancia, o si no hay base; 0 si no.
+
+    fijar_base=True guarda esta corrida como la nueva base sin comparar. Sin
+    base, falla antes de medir. Solo las corridas que pasan la compuerta se
+    agregan al historial; las que fallan no quedan como referencia de nada.
+    """
+    if fijar_base:
+        benchmark_suite(
+            tamaños, repeticiones=repeticiones, modo_lectura=modo_lectura,
+            archivo_resultados=archivo_resultados, etiqueta=etiqueta, base=True
+        )
+        print("\n📌 Corrida fijada como base de las comparaciones")
+        return 0
+
+    base = buscar_base(cargar_historial(archivo_resultados))
+    if base is None:
+        print(f"\n❌ No hay corrida base en {archivo_resultados}: fije una con --comparar --fijar-base")
+        return 1
+
+    actual = benchmark_suite(
+        tamaños, repeticiones=repeticiones, modo_lectura=modo_lectura,
+        archivo_resultados=archivo_resultados, etiqueta=etiqueta, guardar=False
+    )
+
+    print(f"\n📐 Comparación contra la base del {base['fecha']} {base.get('etiqueta') or ''}".rstrip())
+    if base.get('modo_lectura') != actual['modo_lectura']:
+        print(f"⚠️ La base usó modo_lectura={base.get('modo_lectura')}, esta corrida {actual['modo_lectura']}")
+    print()
+
+    filas = comparar_corridas(base, actual, umbral_pct, umbral_memoria_pct)
+    if not filas:
+        print("❌ Ningún escenario en común con la base")
+        return 1
+
+    imprimir_comparacion(filas)
+
+    regresiones = [f for f in filas if f['estado'] == 'REGRESIÓN']
+    if regresiones:
+        print(f"\n❌ {len(regresiones)} regresiones por encima de la tolerancia (la corrida no se guarda)")
+        return 1
+    guardar_corrida(actual, archivo_resultados)
+    print(f"\n✅ Sin regresiones (corrida agregada a {archivo_resultados})")
+    return 0
+
+
+def main():
+    """Ejecuta los benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmarks del procesador de pagos")
+    parser.add_argument('--suite', action='store_true', help="Medir lectura/extracción/escritura con libros sintéticos")
+    parser.add_argument('--tamaños', type=int, nargs='+', default=TAMAÑOS_SUITE, help="Estudiantes por escenario")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Repeticiones por escenario")
+    parser.add_argument('--modo-lectura', default='pandas', help="Modo de lectura de procesar_excel_v3")
+    parser.add_argument('--resultados', type=Path, default=ARCHIVO_RESULTADOS, help="Historial JSON de corridas")
+    parser.add_argument('--etiqueta', default='', help="Texto libre para identificar la corrida (p. ej. versión)")
+    parser.add_argument('--comparar', action='store_true', help="Correr la suite y fallar si hay regresiones respecto de la base fija (o si no hay base)")
+    parser.add_argument('--fijar-base', action='store_true', help="Marcar esta corrida como base de las comparaciones (con --comparar: fijarla sin comparar)")
+    parser.add_argument('--umbral', type=float, default=UMBRAL_REGRESION_PCT, help="--comparar: %% máximo de aumento de tiempo")
+    parser.add_argument('--umbral-memoria', type=float, default=UMBRAL_MEMORIA_PCT, help="--comparar: %% máximo de aumento de memoria")
+    parser.add_argument('--generar', metavar='RUTA', help="Solo generar un libro sintético en RUTA")
+    parser.add_argument('--estudiantes', type=int, default=1_000, help="--generar: número de estudiantes")
+    parser.add_argument('--años', type=int, nargs='+', default=[2023, 2024], help="--generar: años con columnas de mes")
+    parser.add_argument('--multiples', type=float, default=0.05, help="--generar: proporción de celdas con varios pagos")
+    parser.add_argument('--seed', type=int, default=42, help="--generar: semilla")
+    args = parser.parse_args()
+
+    if args.generar:
+        ruta = generar_libro_control(
+            args.generar, estudiantes=args.estudiantes, años=args.años,
+            proporcion_multiples=args.multiples, seed=args.seed
+        )
+        print(f"✅ Libro sintético generado: {ruta}")
+        return 0
+
+    if args.comparar:
+        print("=" * 92)
+        print("🚦 Compuerta de regresiones de rendimiento")
+        print("=" * 92)
+        return comparar_con_base(
+            args.tamaños, repeticiones=args.repeticiones, modo_lectura=args.modo_lectura,
+            archivo_resultados=args.resultados, umbral_pct=args.umbral,
+            umbral_memoria_pct=args.umbral_memoria, etiqueta=args.etiqueta,
+            fijar_base=args.fijar_base
+        )
+
+    if args.suite:
+        print("=" * 92)
+        print("⏱️ Benchmark - Libros sintéticos (mediana de las repeticiones, cambio vs. corrida anterior)")
+        print("=" * 92)
+        benchmark_suite(
+            args.tamaños, repeticiones=args.repeticiones, modo_lectura=args.modo_lectura,
+            archivo_resultados=args.resultados, etiqueta=args.etiqueta,
+            base=args.fijar_base
+        )
+        return 0
+
+    print("=" * 70)
+    print("⏱️ Benchmark - División en bloques por estudiante")
+    print("=" * 70)
+    benchmark_particion()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
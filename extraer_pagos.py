@@ -1,14 +1,1195 @@
+import argparse
+import atexit
 import os
 import re
+import shutil
+import sqlite3
 import logging
+from logging.handlers import QueueHandler, QueueListener
 import sys
 import calendar
-from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple, Set
+import contextlib
+import time
+import hashlib
+import json
+import heapq
+import pickle
+import queue
+import tempfile
+import threading
+import uuid
+from array import array
+import functools
+import glob
+from itertools import groupby, islice
+from operator import itemgetter
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Set, Union
 from pathlib import Path
-from collections import defaultdict
+from collections import Counter, defaultdict, OrderedDict
 
+import numpy as np
 import pandas as pd
+from openpyxl import load_workbook
+
+
+# Niveles aceptados por log_estado
+NIVELES_LOG = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+    'critical': logging.CRITICAL,
+}
+# Log por estudiante: 'auto' registra el detalle de los primeros
+# UMBRAL_DETALLE_ESTUDIANTES y luego un avance cada INTERVALO_RESUMEN_ESTUDIANTES
+VERBOSIDADES_ESTUDIANTE = ('auto', 'detalle', 'resumen')
+UMBRAL_DETALLE_ESTUDIANTES = 200
+INTERVALO_RESUMEN_ESTUDIANTES = 1000
+
+# Valores que pd.read_excel convierte a NaN por defecto; el lector streaming
+# los replica para que ambos modos de lectura produzcan exactamente lo mismo.
+VALORES_NA_EXCEL = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null', '#DIV/0!', '#REF!', '#VALUE!', '#NAME?', '#NUM!', '#NULL!',
+})
+
+MODOS_LECTURA = ('pandas', 'numpy', 'streaming')
+
+# Textos que _is_empty considera vacíos (comparados en minúsculas y sin espacios)
+VALORES_VACIOS = frozenset({
+    '', 'nan', 'n/a', 'na', 'null', 'none',
+    'undefined', 'nil', '-', '--', '---',
+    'sin dato', 'sin datos', 'no aplica',
+    'no disponible', 'nd', 's/d', 's/n',
+    'vacio', 'vacío', 'empty', '0'
+})
+
+# Estados del parseo de montos (escalar y vectorizado)
+MONTO_VACIO = 0
+MONTO_VALIDO = 1
+MONTO_INVALIDO = 2
+MONTO_FUERA_DE_RANGO = 3
+# Estados rechazados (cuentan en montos_invalidos) y su evento en RegistroEventos
+EVENTOS_MONTO_RECHAZADO = {MONTO_INVALIDO: 'monto_invalido', MONTO_FUERA_DE_RANGO: 'monto_fuera_de_rango'}
+
+# Estados del parseo por lotes de fechas
+FECHA_NO_DISPONIBLE = 0
+FECHA_PARSEADA = 1
+FECHA_FALLIDA = 2
+
+# Formatos de salida de generar_excel_normalizado_en_bloques
+FORMATOS_SALIDA = ('excel', 'parquet', 'arrow')
+EXTENSIONES_COLUMNARES = {'parquet': '.parquet', 'arrow': '.arrow'}
+# Columnas de baja cardinalidad que se guardan codificadas como diccionario
+COLUMNAS_DICCIONARIO = ('plan_estudios', 'estatus', 'banco', 'concepto', 'tipo_pago', 'mes_pago')
+
+# Columnas (en orden) de los archivos de salida
+COLUMNAS_EXPORT = [
+    'carnet',
+    'nombre_estudiante',
+    'plan_estudios',
+    'Notas de pago',
+    'Nomenclatura',
+    'estatus',
+    'numero_boleta',
+    'monto',
+    'fecha_pago',
+    'banco',
+    'concepto',
+    'tipo_pago',
+    'mes_pago',
+    'año'
+]
+
+# Motores de escritura de los bloques .xlsx: 'openpyxl' arma la hoja completa
+# en memoria desde un DataFrame; 'streaming' toma las filas directo de los pagos
+# (dicts o RegistroPagos) y las escribe en memoria constante (xlsxwriter)
+MOTORES_EXCEL = ('openpyxl', 'streaming')
+HOJA_PAGOS = 'Pagos'
+# Marca de fin entre etapas de procesar_excel_pipeline
+FIN_ETAPA = object()
+COLUMNAS_RENOMBRADAS = {'estatus': 'Estatus (normalizado)'}
+ANCHO_MAXIMO_COLUMNA = 50
+
+# Caché en disco de hojas ya parseadas (ver CacheLibros)
+DIRECTORIO_CACHE_LIBROS = Path('cache') / 'libros'
+# Cambiar al modificar la lectura o la codificación: invalida las entradas previas
+VERSION_CACHE_LIBROS = 1
+CELDA_VACIA, CELDA_TEXTO, CELDA_ENTERO, CELDA_DECIMAL, CELDA_BOOLEANO, CELDA_FECHA, CELDA_HORA = range(7)
+
+# Diario de checkpoints de procesar_excel_v3 (ver _con_checkpoints)
+VERSION_CHECKPOINT = 2
+CHECKPOINT_BLOQUES_POR_DEFECTO = 500
+
+# Estado del procesamiento incremental (ver procesar_excel_incremental)
+VERSION_ESTADO_INCREMENTAL = 1
+# Campos que identifican un pago entre corridas (más su número de ocurrencia)
+CAMPOS_IDENTIDAD_PAGO = ('carnet', 'tipo_pago', 'concepto', 'mes_pago', 'año')
+# Únicas clases que puede reconstruir la carga del estado (ver _UnpicklerEstado)
+CLASES_ESTADO_INCREMENTAL = frozenset({
+    ('builtins', nombre) for nombre in (
+        'bool', 'bytes', 'dict', 'float', 'frozenset', 'int', 'list', 'set', 'str', 'tuple'
+    )
+} | {
+    ('collections', 'defaultdict'), ('collections', 'OrderedDict'), ('collections', 'Counter'),
+    ('datetime', 'date'), ('datetime', 'datetime'), ('datetime', 'time'), ('datetime', 'timedelta'),
+    ('decimal', 'Decimal'),
+    ('numpy', 'dtype'), ('numpy.core.multiarray', 'scalar'), ('numpy._core.multiarray', 'scalar'),
+    ('pandas._libs.tslibs.timestamps', '_unpickle_timestamp'),
+})
+
+# Textos de banco que equivalen a "No especificado"
+VALORES_BANCO_VACIO = frozenset({'n/a', 'na', '0', '-', 'null', 'none'})
+
+# Instrumentación por etapa (tiempos inclusivos: una etapa contiene a las que llama)
+ETAPAS_INSTRUMENTADAS = (
+    'lectura', 'mapa_columnas', 'estudiante', 'columnas_especiales', 'columnas_meses',
+    'limpiar_monto', 'parse_fecha_mejorada', 'detectar_banco',
+    'ordenamiento', 'particion', 'escritura_bloque',
+)
+PERFILADORES = ('cprofile', 'pyinstrument')
+
+# Carga directa a kardex_pagos (Postgres, requiere psycopg)
+ESTADOS_PAGO_KARDEX = ('pendiente_revision', 'aprobado', 'rechazado')
+COLUMNAS_STAGING_KARDEX = (
+    'carnet', 'plan_estudios', 'numero_boleta', 'numero_boleta_normalizada', 'monto', 'fecha_pago',
+    'banco', 'banco_normalizado', 'concepto', 'mes_pago', 'año', 'tipo_pago',
+)
+TIPOS_STAGING_KARDEX = (
+    'text', 'text', 'text', 'text', 'numeric', 'date', 'text', 'text', 'text', 'text', 'int4', 'text'
+)
+# banco_normalizado de kardex_pagos: el nombre canónico en mayúsculas, salvo estos
+BANCOS_NORMALIZADOS_KARDEX = {'BI': 'BANCO INDUSTRIAL', 'Industrial': 'BANCO INDUSTRIAL'}
+
+SQL_STAGING_KARDEX = """
+CREATE TEMP TABLE stg_kardex_pagos (
+    carnet text,
+    plan_estudios text,
+    numero_boleta text,
+    numero_boleta_normalizada text,
+    monto numeric(12,2),
+    fecha_pago date,
+    banco text,
+    banco_normalizado text,
+    concepto text,
+    mes_pago text,
+    "año" integer,
+    tipo_pago text
+) ON COMMIT DROP
+"""
+
+# carné → estudiante_programa_id en un solo join. Si el estudiante tiene varios
+# programas se prefiere el de la abreviatura igual al plan y luego el más reciente.
+SQL_RESOLVER_KARDEX = """
+CREATE TEMP TABLE stg_kardex_estudiantes ON COMMIT DROP AS
+SELECT DISTINCT ON (c.carnet, c.plan_estudios)
+       c.carnet, c.plan_estudios, ep.id AS estudiante_programa_id
+FROM (SELECT DISTINCT carnet, plan_estudios FROM stg_kardex_pagos) c
+JOIN prospectos p ON upper(regexp_replace(p.carnet, '[[:space:]-]', '', 'g')) = c.carnet
+JOIN estudiante_programa ep ON ep.prospecto_id = p.id AND ep.deleted_at IS NULL
+LEFT JOIN tb_programas pr ON pr.id = ep.programa_id
+ORDER BY c.carnet, c.plan_estudios,
+         (upper(pr.abreviatura) = c.plan_estudios) DESC NULLS LAST,
+         ep.fecha_inicio DESC, ep.id DESC
+"""
+
+# boleta_fingerprint como la calcula producción:
+# sha256(banco_normalizado|numero_boleta_normalizada|estudiante_programa_id|fecha_pago)
+SQL_HUELLA_KARDEX = """
+encode(sha256(convert_to(concat_ws('|',
+    {banco_normalizado}, {numero_boleta_normalizada}, {estudiante_programa_id},
+    to_char({fecha_pago}, 'YYYY-MM-DD')), 'UTF8')), 'hex')
+"""
+
+# Upsert en una sola sentencia. La huella es la de los pagos ya importados
+# (ver SQL_HUELLA_KARDEX): una recarga actualiza en vez de duplicar.
+SQL_UPSERT_KARDEX = """
+WITH pagos AS (
+    SELECT DISTINCT ON (huella) *
+    FROM (
+        SELECT e.estudiante_programa_id, s.fecha_pago, s.monto, s.numero_boleta, s.numero_boleta_normalizada,
+               s.banco, s.banco_normalizado,
+               concat_ws(' ', s.concepto, s.mes_pago, s."año"::text) AS observaciones,
+               """ + SQL_HUELLA_KARDEX.format(
+    banco_normalizado='s.banco_normalizado',
+    numero_boleta_normalizada='s.numero_boleta_normalizada',
+    estudiante_programa_id='e.estudiante_programa_id',
+    fecha_pago='s.fecha_pago'
+).strip() + """ AS huella
+        FROM stg_kardex_pagos s
+        JOIN stg_kardex_estudiantes e USING (carnet, plan_estudios)
+        WHERE s.fecha_pago IS NOT NULL AND s.monto IS NOT NULL
+    ) t
+    ORDER BY huella
+)
+INSERT INTO kardex_pagos (
+    estudiante_programa_id, fecha_pago, monto_pagado, numero_boleta, numero_boleta_normalizada,
+    banco, banco_normalizado, observaciones, estado_pago, boleta_fingerprint,
+    created_by, uploaded_by, created_at, updated_at
+)
+SELECT estudiante_programa_id, fecha_pago, monto, numero_boleta, numero_boleta_normalizada,
+       banco, banco_normalizado, observaciones, %(estado_pago)s, huella,
+       %(usuario_id)s, %(usuario_id)s, now(), now()
+FROM pagos
+ON CONFLICT (boleta_fingerprint) DO UPDATE SET
+    monto_pagado = EXCLUDED.monto_pagado,
+    numero_boleta = EXCLUDED.numero_boleta,
+    banco = EXCLUDED.banco,
+    banco_normalizado = EXCLUDED.banco_normalizado,
+    observaciones = EXCLUDED.observaciones,
+    updated_by = EXCLUDED.uploaded_by,
+    updated_at = now()
+RETURNING (xmax = 0) AS insertado
+"""
+
+# Índice persistente de boletas entre corridas (ver IndiceBoletas)
+ARCHIVO_INDICE_BOLETAS = Path('cache') / 'boletas.sqlite'
+# 'marcar' deja los duplicados en la salida y los lista aparte; 'descartar' los quita
+ACCIONES_DUPLICADOS = ('marcar', 'descartar')
+ORIGEN_MISMA_EJECUCION = 'misma ejecución'
+
+
+def normalizar_boleta(boleta: Any) -> str:
+    """Boleta solo con letras y dígitos, en mayúsculas (numero_boleta_normalizada de kardex_pagos)."""
+    return re.sub(r'[^0-9A-Za-z]', '', str(boleta)).upper()
+
+
+def normalizar_banco_kardex(banco: Any) -> str:
+    """banco_normalizado de kardex_pagos para un banco canónico de detectar_banco."""
+    if banco is None or pd.isna(banco) or not str(banco).strip():
+        return 'NO ESPECIFICADO'
+    banco = str(banco).strip()
+    return BANCOS_NORMALIZADOS_KARDEX.get(banco, banco.upper())
+
+
+class CacheNormalizacion:
+    """
+    Caché LRU acotada para los resultados de las funciones de normalización.
+    Guarda junto a cada resultado los incrementos de estadísticas y las
+    advertencias de log que produjo, para repetirlos en cada acierto y que el
+    reporte y el log no cambien.
+    """
+
+    def __init__(self, tamaño_maximo: int = 4096):
+        self.tamaño_maximo = tamaño_maximo
+        self._entradas: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def obtener(self, clave) -> Optional[Tuple[Any, Dict[str, Any], Tuple[Tuple[int, str], ...]]]:
+        entrada = self._entradas.get(clave)
+        if entrada is not None:
+            self._entradas.move_to_end(clave)
+        return entrada
+
+    def guardar(self, clave, resultado: Any, efectos: Dict[str, Any], avisos: Tuple[Tuple[int, str], ...] = ()):
+        self._entradas[clave] = (resultado, efectos, avisos)
+        self._entradas.move_to_end(clave)
+        if len(self._entradas) > self.tamaño_maximo:
+            self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        self._entradas.clear()
+
+
+# Hilo que escribe los registros encolados por setup_logging
+_listener_logging: Optional[QueueListener] = None
+
+
+def _detener_listener_logging():
+    """Vacía la cola de logging y detiene su hilo."""
+    global _listener_logging
+    if _listener_logging is not None:
+        _listener_logging.stop()
+        _listener_logging = None
+
+
+def _logging_directo_en_hijo():
+    """
+    En un proceso hijo creado con fork no existe el hilo del QueueListener:
+    los handlers del padre vuelven a colgarse directamente del logger raíz.
+    """
+    if _listener_logging is None:
+        return
+    raiz = logging.getLogger()
+    for handler in raiz.handlers[:]:
+        if isinstance(handler, QueueHandler):
+            raiz.removeHandler(handler)
+    for handler in _listener_logging.handlers:
+        raiz.addHandler(handler)
+
+
+atexit.register(_detener_listener_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_logging_directo_en_hijo)
+
+
+def _clave_celda(v: Any) -> Optional[Tuple]:
+    """Clave hashable que distingue tipos (1, 1.0 y True producen textos distintos)."""
+    if v is None or (isinstance(v, float) and v != v):
+        return None
+    return (type(v), v)
+
+
+def memoizado(*claves_estadisticas: str):
+    """
+    Decorador para métodos de normalización de ExcelPaymentProcessorV3.
+
+    Consulta la caché por (método, argumentos). En un fallo ejecuta el método y
+    registra cuánto cambiaron las estadísticas indicadas y qué advertencias
+    registró; en un acierto reaplica esos incrementos y repite las advertencias.
+    Valores vacíos/NaN y argumentos no hashables no se cachean.
+    """
+    def decorador(func):
+        nombre = func.__name__
+
+        @functools.wraps(func)
+        def envoltura(self, *args, **kwargs):
+            cache = self.cache_normalizacion
+            if cache is None:
+                return func(self, *args, **kwargs)
+
+            claves_args = tuple(_clave_celda(a) for a in args)
+            if None in claves_args:
+                return func(self, *args, **kwargs)
+
+            clave = (nombre, claves_args, tuple(sorted(kwargs.items())))
+            try:
+                entrada = cache.obtener(clave)
+            except TypeError:
+                return func(self, *args, **kwargs)
+
+            estadisticas = self.estadisticas
+
+            if entrada is not None:
+                resultado, efectos, avisos = entrada
+                for nombre_est, delta in efectos.items():
+                    if isinstance(delta, dict):
+                        for k, v in delta.items():
+                            estadisticas[nombre_est][k] += v
+                    else:
+                        estadisticas[nombre_est] += delta
+                for nivel_log, mensaje in avisos:
+                    self._registrar_log(nivel_log, mensaje)
+                estadisticas['cache_aciertos'][nombre] += 1
+                return resultado
+
+            antes = {
+                k: dict(estadisticas[k]) if isinstance(estadisticas[k], dict) else estadisticas[k]
+                for k in claves_estadisticas
+            }
+            # Pila de capturas: una llamada memoizada anidada también cuenta para la externa
+            avisos_externos = self._avisos_memoizados
+            self._avisos_memoizados = []
+            try:
+                resultado = func(self, *args, **kwargs)
+            finally:
+                avisos = tuple(self._avisos_memoizados)
+                self._avisos_memoizados = avisos_externos
+                if avisos_externos is not None:
+                    avisos_externos.extend(avisos)
+
+            efectos = {}
+            for k, previo in antes.items():
+                actual = estadisticas[k]
+                if isinstance(previo, dict):
+                    delta = {
+                        sub: v - previo.get(sub, 0)
+                        for sub, v in actual.items()
+                        if v != previo.get(sub, 0)
+                    }
+                    if delta:
+                        efectos[k] = delta
+                elif actual != previo:
+                    efectos[k] = actual - previo
+
+            cache.guardar(clave, resultado, efectos, avisos)
+            estadisticas['cache_fallos'][nombre] += 1
+            return resultado
+
+        return envoltura
+
+    return decorador
+
+
+def cronometrado(etapa: str):
+    """
+    Decorador que acumula segundos y llamadas del método en la etapa indicada
+    cuando el procesador se creó con instrumentar=True; si no, no mide nada.
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        def envoltura(self, *args, **kwargs):
+            if not self.instrumentar:
+                return func(self, *args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                self._registrar_etapa(etapa, time.perf_counter() - inicio)
+        return envoltura
+    return decorador
+
+
+def rss_pico_mb() -> Dict[str, Optional[float]]:
+    """
+    Memoria residente máxima (MB) de este proceso y de sus hijos ya terminados.
+    En Windows se usa psutil si está instalado; sin él se devuelve None.
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return {'proceso': None, 'hijos': None}
+        info = psutil.Process().memory_info()
+        return {'proceso': getattr(info, 'peak_wset', info.rss) / (1024 * 1024), 'hijos': None}
+
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'proceso': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor,
+        'hijos': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor,
+    }
+
+
+@contextlib.contextmanager
+def perfilar(perfilador: Optional[str], ruta_base: str):
+    """
+    ✅ Perfila el bloque con cProfile o pyinstrument (opcional).
+
+    - 'cprofile': guarda <ruta_base>.prof e imprime las 25 funciones más costosas
+    - 'pyinstrument': guarda <ruta_base>_perfil.html (requiere pyinstrument)
+
+    Solo se perfila el proceso principal, no los workers.
+    """
+    if perfilador is None:
+        yield
+        return
+    if perfilador not in PERFILADORES:
+        raise ValueError(f"Perfilador no soportado: {perfilador}. Use uno de {PERFILADORES}")
+
+    if perfilador == 'cprofile':
+        import cProfile
+        import pstats
+
+        perfil = cProfile.Profile()
+        perfil.enable()
+        try:
+            yield
+        finally:
+            perfil.disable()
+            perfil.dump_stats(f"{ruta_base}.prof")
+            print(f"\n🔬 Perfil cProfile guardado en {ruta_base}.prof")
+            pstats.Stats(perfil).sort_stats('cumulative').print_stats(25)
+        return
+
+    try:
+        from pyinstrument import Profiler
+    except ImportError as e:
+        raise ImportError("El perfilador pyinstrument no está instalado: pip install pyinstrument") from e
+
+    perfil = Profiler()
+    perfil.start()
+    try:
+        yield
+    finally:
+        perfil.stop()
+        with open(f"{ruta_base}_perfil.html", 'w', encoding='utf-8') as f:
+            f.write(perfil.output_html())
+        print(f"\n🔬 Perfil pyinstrument guardado en {ruta_base}_perfil.html")
+
+
+class RegistroPagos:
+    """
+    ✅ Almacén columnar de pagos extraídos (alternativa a List[Dict]).
+
+    - Los campos del estudiante se guardan una vez por estudiante y cada pago
+      solo referencia su índice.
+    - banco, concepto, plan, mes, tipo y fecha se guardan como códigos de
+      categoría (cada texto distinto existe una sola vez).
+    - monto e índices usan arreglos compactos (array).
+
+    Se comporta como una secuencia de pagos (len, iteración de dicts) y se
+    convierte a DataFrame tomando directamente de las columnas.
+    """
+
+    CAMPOS_ESTUDIANTE = (
+        'Notas de pago', 'carnet', 'nombre_estudiante', 'plan_estudios', 'Nomenclatura', 'estatus'
+    )
+    CAMPOS_CATEGORICOS = ('fecha_pago', 'banco', 'concepto', 'mes_pago', 'tipo_pago')
+    # Orden de columnas igual al de los dicts que arman los procesadores
+    COLUMNAS = CAMPOS_ESTUDIANTE + (
+        'numero_boleta', 'monto', 'fecha_pago', 'banco', 'concepto', 'mes_pago', 'tipo_pago', 'año'
+    )
+
+    def __init__(self):
+        self._estudiantes: Dict[str, List[Any]] = {campo: [] for campo in self.CAMPOS_ESTUDIANTE}
+        self._clave_ultimo_estudiante: Optional[Tuple] = None
+        self._indice_estudiante = array('q')
+
+        self._categorias: Dict[str, List[Any]] = {campo: [] for campo in self.CAMPOS_CATEGORICOS}
+        self._codigos_categoria: Dict[str, Dict[Any, int]] = {campo: {} for campo in self.CAMPOS_CATEGORICOS}
+        self._codigos = {campo: array('q') for campo in self.CAMPOS_CATEGORICOS}
+
+        self._numero_boleta: List[str] = []
+        self._monto = array('d')
+        self._año: List[Optional[int]] = []
+        self._tiene_año = False
+
+    def __len__(self) -> int:
+        return len(self._monto)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.desde(0)
+
+    def desde(self, inicio: int) -> Iterator[Dict[str, Any]]:
+        """Pagos a partir de la posición inicio (para volcados parciales)."""
+        for i in range(inicio, len(self)):
+            yield self._pago(i)
+
+    def _pago(self, i: int) -> Dict[str, Any]:
+        e = self._indice_estudiante[i]
+        pago = {campo: self._estudiantes[campo][e] for campo in self.CAMPOS_ESTUDIANTE}
+        pago['numero_boleta'] = self._numero_boleta[i]
+        pago['monto'] = self._monto[i]
+        for campo in ('fecha_pago', 'banco', 'concepto', 'mes_pago', 'tipo_pago'):
+            pago[campo] = self._categorias[campo][self._codigos[campo][i]]
+        if pago['tipo_pago'] == 'Mensual':
+            pago['año'] = self._año[i]
+        return pago
+
+    def pagos_en(self, posiciones: Iterable[int]) -> Iterator[Dict[str, Any]]:
+        """Pagos en las posiciones dadas, uno a la vez."""
+        for i in posiciones:
+            yield self._pago(i)
+
+    def orden_exportacion(self) -> List[int]:
+        """Posiciones de los pagos ordenadas por carné y fecha (como _clave_orden_pago)."""
+        carnets = self._estudiantes['carnet']
+        fechas = self._categorias['fecha_pago']
+        indice, codigos = self._indice_estudiante, self._codigos['fecha_pago']
+
+        def clave(i: int) -> Tuple[str, bool, str]:
+            fecha = fechas[codigos[i]]
+            return carnets[indice[i]], fecha is None, fecha or ''
+
+        return sorted(range(len(self)), key=clave)
+
+    def columnas(self) -> Tuple[str, ...]:
+        """Columnas que tendría to_dataframe()."""
+        return self.COLUMNAS + ('año',) if self._tiene_año else self.COLUMNAS
+
+    @property
+    def num_estudiantes(self) -> int:
+        return len(self._estudiantes['carnet'])
+
+    def append(self, pago: Dict[str, Any]):
+        """Agrega un pago; los campos del estudiante se reutilizan si no cambian."""
+        clave = tuple(pago[campo] for campo in self.CAMPOS_ESTUDIANTE)
+        if clave != self._clave_ultimo_estudiante:
+            for campo, valor in zip(self.CAMPOS_ESTUDIANTE, clave):
+                self._estudiantes[campo].append(valor)
+            self._clave_ultimo_estudiante = clave
+        self._indice_estudiante.append(self.num_estudiantes - 1)
+
+        for campo in self.CAMPOS_CATEGORICOS:
+            valor = pago[campo]
+            codigos = self._codigos_categoria[campo]
+            codigo = codigos.get(valor)
+            if codigo is None:
+                codigo = codigos[valor] = len(self._categorias[campo])
+                self._categorias[campo].append(valor)
+            self._codigos[campo].append(codigo)
+
+        self._numero_boleta.append(pago['numero_boleta'])
+        self._monto.append(pago['monto'])
+        if 'año' in pago:
+            self._tiene_año = True
+        self._año.append(pago.get('año'))
+
+    def extend(self, pagos: Iterable[Dict[str, Any]]):
+        for pago in pagos:
+            self.append(pago)
+
+    def to_dataframe(self, categorico: bool = False) -> pd.DataFrame:
+        """
+        Construye el DataFrame columna por columna (sin pasar por dicts).
+        Con categorico=True los campos repetidos salen como pd.Categorical;
+        por defecto son columnas object, iguales a pd.DataFrame(List[Dict]).
+        """
+        indice = np.frombuffer(self._indice_estudiante, dtype=np.int64) if len(self) else np.zeros(0, dtype=np.int64)
+        columnas: Dict[str, Any] = {}
+
+        for campo in self.CAMPOS_ESTUDIANTE:
+            valores = np.empty(self.num_estudiantes, dtype=object)
+            valores[:] = self._estudiantes[campo]
+            if categorico and campo == 'plan_estudios':
+                columnas[campo] = pd.Categorical(valores)[indice]
+            else:
+                columnas[campo] = valores[indice]
+
+        columnas['numero_boleta'] = np.array(self._numero_boleta, dtype=object)
+        columnas['monto'] = np.frombuffer(self._monto, dtype=np.float64).copy() if len(self) else np.zeros(0)
+
+        for campo in ('fecha_pago', 'banco', 'concepto', 'mes_pago', 'tipo_pago'):
+            codigos = np.frombuffer(self._codigos[campo], dtype=np.int64) if len(self) else np.zeros(0, dtype=np.int64)
+            categorias = np.empty(len(self._categorias[campo]), dtype=object)
+            categorias[:] = self._categorias[campo]
+            if categorico and campo != 'fecha_pago':
+                columnas[campo] = pd.Categorical(categorias[codigos])
+            else:
+                columnas[campo] = categorias[codigos]
+
+        if self._tiene_año:
+            columnas['año'] = pd.Series(self._año)
+
+        return pd.DataFrame(columnas)
+
+
+def _sha256_archivo(ruta_archivo) -> 'hashlib._Hash':
+    """SHA-256 del contenido de un archivo, leído por trozos de 1 MB."""
+    sha = hashlib.sha256()
+    with open(ruta_archivo, 'rb') as f:
+        for trozo in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(trozo)
+    return sha
+
+
+class CacheLibros:
+    """
+    ✅ Caché en disco de la grilla de celdas cruda de un libro (pd.read_excel
+    con dtype=object). La clave combina el hash del contenido del archivo, la
+    hoja y la versión del lector; cada entrada guarda arrays .npy:
+    - tipos: código de tipo por celda (CELDA_*)
+    - numeros: valor de las celdas numéricas / booleanas
+    - texto + offsets: textos, fechas y horas (isoformat) concatenados en UTF-8
+    El tamaño total se limita con desalojo LRU (fecha de último uso).
+    """
+
+    ARCHIVOS = ('tipos.npy', 'numeros.npy', 'texto.npy', 'offsets.npy')
+
+    def __init__(self, directorio: Path = DIRECTORIO_CACHE_LIBROS, tamaño_maximo_mb: int = 512):
+        self.directorio = Path(directorio)
+        self.tamaño_maximo = tamaño_maximo_mb * 1024 * 1024
+
+    def clave(self, archivo: str, hoja: Any = 0) -> str:
+        import openpyxl
+
+        sha = _sha256_archivo(archivo)
+        version_lector = f"v{VERSION_CACHE_LIBROS}|pandas {pd.__version__}|openpyxl {openpyxl.__version__}"
+        sha.update(f"|hoja={hoja}|{version_lector}".encode('utf-8'))
+        return sha.hexdigest()
+
+    def cargar(self, clave: str) -> Optional[pd.DataFrame]:
+        entrada = self.directorio / clave
+        if not entrada.is_dir():
+            return None
+        try:
+            tipos, numeros, texto, offsets = (
+                np.load(entrada / nombre, allow_pickle=False) for nombre in self.ARCHIVOS
+            )
+        except (OSError, ValueError):
+            return None
+
+        os.utime(entrada)
+        return pd.DataFrame(self._decodificar(tipos, numeros, texto, offsets), dtype=object)
+
+    def guardar(self, clave: str, df: pd.DataFrame) -> bool:
+        """Guarda la grilla; devuelve False si hay celdas de un tipo no soportado."""
+        codificado = self._codificar(df.to_numpy(dtype=object))
+        if codificado is None:
+            return False
+
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        temporal = Path(tempfile.mkdtemp(prefix=f".{clave}_", dir=self.directorio))
+        for nombre, datos in zip(self.ARCHIVOS, codificado):
+            np.save(temporal / nombre, datos, allow_pickle=False)
+
+        destino = self.directorio / clave
+        try:
+            temporal.rename(destino)
+        except OSError:
+            # Otra corrida ya guardó la misma entrada
+            shutil.rmtree(temporal, ignore_errors=True)
+
+        self._recortar(conservar=clave)
+        return True
+
+    def limpiar(self) -> int:
+        """Elimina todas las entradas; devuelve cuántas había."""
+        entradas = self._entradas()
+        for entrada in entradas:
+            shutil.rmtree(entrada, ignore_errors=True)
+        return len(entradas)
+
+    def _entradas(self) -> List[Path]:
+        if not self.directorio.is_dir():
+            return []
+        return [e for e in self.directorio.iterdir() if e.is_dir() and not e.name.startswith('.')]
+
+    def _recortar(self, conservar: Optional[str] = None):
+        """Desaloja las entradas usadas hace más tiempo hasta respetar el tamaño máximo."""
+        entradas = []
+        for entrada in self._entradas():
+            tamaño = sum(f.stat().st_size for f in entrada.iterdir())
+            entradas.append((entrada.stat().st_mtime, tamaño, entrada))
+
+        total = sum(tamaño for _, tamaño, _ in entradas)
+        for _, tamaño, entrada in sorted(entradas, key=lambda e: e[0]):
+            if total <= self.tamaño_maximo:
+                break
+            if entrada.name == conservar:
+                continue
+            shutil.rmtree(entrada, ignore_errors=True)
+            total -= tamaño
+
+    @staticmethod
+    def _codificar(grilla: np.ndarray) -> Optional[Tuple[np.ndarray, ...]]:
+        tipos = np.zeros(grilla.shape, dtype=np.uint8)
+        numeros = np.zeros(grilla.shape, dtype=np.float64)
+        textos: List[str] = []
+
+        for (i, j), v in np.ndenumerate(grilla):
+            if v is None or (isinstance(v, float) and v != v) or v is pd.NaT:
+                continue
+            if isinstance(v, str):
+                tipos[i, j] = CELDA_TEXTO
+                textos.append(v)
+            elif isinstance(v, bool):
+                tipos[i, j] = CELDA_BOOLEANO
+                numeros[i, j] = v
+            elif isinstance(v, int):
+                if abs(v) > 2 ** 53:
+                    return None
+                tipos[i, j] = CELDA_ENTERO
+                numeros[i, j] = v
+            elif isinstance(v, float):
+                tipos[i, j] = CELDA_DECIMAL
+                numeros[i, j] = v
+            elif isinstance(v, datetime):
+                tipos[i, j] = CELDA_FECHA
+                textos.append(v.isoformat())
+            elif isinstance(v, dt_time):
+                tipos[i, j] = CELDA_HORA
+                textos.append(v.isoformat())
+            else:
+                return None
+
+        offsets = np.zeros(len(textos) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(t) for t in textos])
+        try:
+            texto = np.frombuffer(''.join(textos).encode('utf-8'), dtype=np.uint8)
+        except UnicodeEncodeError:
+            # Texto no representable en UTF-8 (p. ej. surrogates sueltos)
+            return None
+        return tipos, numeros, texto, offsets
+
+    @staticmethod
+    def _decodificar(
+        tipos: np.ndarray,
+        numeros: np.ndarray,
+        texto: np.ndarray,
+        offsets: np.ndarray
+    ) -> np.ndarray:
+        grilla = np.full(tipos.shape, np.nan, dtype=object)
+
+        for codigo, convertir in ((CELDA_DECIMAL, float), (CELDA_ENTERO, int), (CELDA_BOOLEANO, bool)):
+            mascara = tipos == codigo
+            if mascara.any():
+                grilla[mascara] = [convertir(x) for x in numeros[mascara].tolist()]
+
+        # Los offsets están en caracteres: se decodifica el UTF-8 una sola vez
+        contenido = texto.tobytes().decode('utf-8')
+        limites = offsets.tolist()
+        textos = [contenido[a:b] for a, b in zip(limites[:-1], limites[1:])]
+
+        mascara = (tipos == CELDA_TEXTO) | (tipos == CELDA_FECHA) | (tipos == CELDA_HORA)
+        if textos:
+            valores = np.empty(len(textos), dtype=object)
+            valores[:] = textos
+            codigos = tipos[mascara]
+            for codigo, convertir in ((CELDA_FECHA, datetime.fromisoformat), (CELDA_HORA, dt_time.fromisoformat)):
+                seleccion = codigos == codigo
+                if seleccion.any():
+                    valores[seleccion] = [convertir(t) for t in valores[seleccion]]
+            grilla[mascara] = valores
+
+        return grilla
+
+
+class RegistroEventos:
+    """
+    ✅ Registro estructurado de eventos de normalización en JSON Lines.
+
+    Cada línea es un objeto con id_ejecucion, evento, fila (fila de la hoja,
+    base 1), columna (índice base 0), carnet, valor_crudo y valor_normalizado.
+    Las líneas se acumulan en memoria y se escriben por tandas; al superar
+    tamaño_maximo_mb se abre una nueva parte (eventos_<id>_001.jsonl, _002...).
+
+    En un worker de procesos el registro llega serializado y continúa en sus
+    propios archivos (eventos_<id>_p<pid>_<sufijo>_NNN.jsonl) con el mismo id_ejecucion.
+    """
+
+    def __init__(
+        self,
+        directorio: str = 'logs',
+        id_ejecucion: Optional[str] = None,
+        tamaño_buffer: int = 1000,
+        tamaño_maximo_mb: int = 64,
+        sufijo: str = ''
+    ):
+        self.directorio = Path(directorio)
+        self.id_ejecucion = id_ejecucion or f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        self.tamaño_buffer = tamaño_buffer
+        self.tamaño_maximo = tamaño_maximo_mb * 1024 * 1024
+        self.sufijo = sufijo
+        self.eventos_emitidos = 0
+        self.archivos: List[str] = []
+        self._buffer: List[str] = []
+        self._archivo = None
+        self._bytes_archivo = 0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        self.vaciar()
+        return {
+            'directorio': str(self.directorio),
+            'id_ejecucion': self.id_ejecucion,
+            'tamaño_buffer': self.tamaño_buffer,
+            'tamaño_maximo_mb': self.tamaño_maximo // (1024 * 1024),
+        }
+
+    def __setstate__(self, estado: Dict[str, Any]):
+        # Cada lote de un worker abre sus propios archivos: pid + sufijo aleatorio
+        self.__init__(**estado, sufijo=f"_p{os.getpid()}_{uuid.uuid4().hex[:6]}")
+
+    def emitir(
+        self,
+        evento: str,
+        fila: Optional[int] = None,
+        columna: Optional[int] = None,
+        carnet: Optional[str] = None,
+        valor_crudo: Any = None,
+        valor_normalizado: Any = None,
+        **extra
+    ):
+        registro = {
+            'id_ejecucion': self.id_ejecucion,
+            'evento': evento,
+            'fila': fila,
+            'columna': columna,
+            'carnet': carnet,
+            'valor_crudo': valor_crudo,
+            'valor_normalizado': valor_normalizado,
+        }
+        if extra:
+            registro.update(extra)
+        self._buffer.append(json.dumps(registro, ensure_ascii=False, default=str))
+        self.eventos_emitidos += 1
+        if len(self._buffer) >= self.tamaño_buffer:
+            self.vaciar()
+
+    def vaciar(self):
+        """Escribe las líneas acumuladas, rotando de archivo si se supera el tamaño máximo."""
+        if not self._buffer:
+            return
+        datos = ('\n'.join(self._buffer) + '\n').encode('utf-8')
+        self._buffer = []
+
+        if self._archivo is None or (self._bytes_archivo and self._bytes_archivo + len(datos) > self.tamaño_maximo):
+            self._abrir_siguiente()
+        self._archivo.write(datos)
+        self._archivo.flush()
+        self._bytes_archivo += len(datos)
+
+    def _abrir_siguiente(self):
+        if self._archivo is not None:
+            self._archivo.close()
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        ruta = self.directorio / f"eventos_{self.id_ejecucion}{self.sufijo}_{len(self.archivos) + 1:03d}.jsonl"
+        self._archivo = open(ruta, 'wb')
+        self._bytes_archivo = 0
+        self.archivos.append(str(ruta))
+
+    def cerrar(self):
+        self.vaciar()
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+
+
+def clave_boleta(boleta: Any, banco: Any, monto: Any) -> Optional[str]:
+    """
+    Clave de un pago en IndiceBoletas: boleta normalizada (igual que
+    numero_boleta_normalizada de kardex_pagos) | banco | monto con 2 decimales.
+    None si falta la boleta o el monto.
+    """
+    if boleta is None or monto is None or pd.isna(boleta):
+        return None
+    boleta_normalizada = normalizar_boleta(boleta)
+    try:
+        monto = float(monto)
+    except (TypeError, ValueError):
+        return None
+    if not boleta_normalizada or np.isnan(monto):
+        return None
+    banco = 'NO ESPECIFICADO' if banco is None or pd.isna(banco) else str(banco).strip().upper()
+    return f"{boleta_normalizada}|{banco}|{monto:.2f}"
+
+
+class IndiceBoletas:
+    """
+    ✅ Índice persistente de boletas ya registradas, en SQLite.
+
+    Una tabla sin rowid con la clave de clave_boleta como clave primaria, el
+    origen de cada boleta (el libro que la registró o la salida/respaldo con
+    que se sembró) y, para las registradas desde un libro, el SHA-256 de su
+    contenido: así se reconoce un reproceso del mismo libro aunque los libros
+    de cada mes reutilicen el nombre de archivo. Se consulta por tandas de TAMAÑO_CONSULTA claves contra la
+    clave primaria, así el costo por pago no crece con millones de boletas
+    históricas; las altas van en una transacción por tanda.
+    """
+
+    TAMAÑO_CONSULTA = 500
+    TAMAÑO_TANDA = 50000
+
+    def __init__(self, ruta: str = ARCHIVO_INDICE_BOLETAS):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        # El pipeline consulta desde su hilo de normalización
+        self._conexion = sqlite3.connect(str(self.ruta), check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS boletas ("
+            "clave TEXT PRIMARY KEY, origen TEXT NOT NULL, registrada TEXT NOT NULL, libro TEXT"
+            ") WITHOUT ROWID"
+        )
+        # Índices creados antes de guardar el SHA-256 del libro
+        columnas = {fila[1] for fila in self._conexion.execute("PRAGMA table_info(boletas)")}
+        if 'libro' not in columnas:
+            self._conexion.execute("ALTER TABLE boletas ADD COLUMN libro TEXT")
+        self._conexion.commit()
+
+    def __len__(self) -> int:
+        return self._conexion.execute("SELECT count(*) FROM boletas").fetchone()[0]
+
+    def buscar(self, claves: Iterable[str]) -> Dict[str, Tuple[str, Optional[str]]]:
+        """(origen, SHA-256 del libro) de cada clave ya registrada; las que no están no aparecen."""
+        claves = list(claves)
+        encontradas: Dict[str, Tuple[str, Optional[str]]] = {}
+        for inicio in range(0, len(claves), self.TAMAÑO_CONSULTA):
+            tanda = claves[inicio:inicio + self.TAMAÑO_CONSULTA]
+            encontradas.update(
+                (clave, (origen, libro)) for clave, origen, libro in self._conexion.execute(
+                    f"SELECT clave, origen, libro FROM boletas WHERE clave IN ({','.join('?' * len(tanda))})",
+                    tanda
+                )
+            )
+        return encontradas
+
+    def registrar(self, entradas: Iterable[Tuple[str, str]], libro: Optional[str] = None) -> int:
+        """
+        Agrega pares (clave, origen); una clave existente conserva su origen.
+        libro: SHA-256 del libro que las registró (None al sembrar). Devuelve las nuevas.
+        """
+        registrada = datetime.now().isoformat(timespec='seconds')
+        antes = self._conexion.total_changes
+        entradas = iter(entradas)
+        while True:
+            tanda = [(clave, origen, registrada, libro) for clave, origen in islice(entradas, self.TAMAÑO_TANDA)]
+            if not tanda:
+                break
+            with self._conexion:
+                self._conexion.executemany(
+                    "INSERT OR IGNORE INTO boletas (clave, origen, registrada, libro) VALUES (?, ?, ?, ?)", tanda
+                )
+        return self._conexion.total_changes - antes
+
+    def cerrar(self):
+        self._conexion.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+
+
+class EscritorExcelStreaming:
+    """
+    ✅ Escritor .xlsx de memoria constante (xlsxwriter con constant_memory).
+    Cada fila se vuelca al disco al escribirla; los anchos de columna salen de
+    contadores de longitud máxima actualizados durante la escritura.
+    """
+
+    def __init__(self, ruta_archivo, columnas: List[str], nombre_hoja: str = HOJA_PAGOS):
+        try:
+            import xlsxwriter
+        except ImportError as e:
+            raise ImportError(
+                "El motor de escritura 'streaming' requiere xlsxwriter: pip install xlsxwriter"
+            ) from e
+
+        self.workbook = xlsxwriter.Workbook(str(ruta_archivo), {'constant_memory': True})
+        self.hoja = self.workbook.add_worksheet(nombre_hoja)
+        # Mismo estilo de encabezado que DataFrame.to_excel
+        formato_encabezado = self.workbook.add_format({
+            'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'
+        })
+        for j, columna in enumerate(columnas):
+            self.hoja.write_string(0, j, columna, formato_encabezado)
+
+        self.anchos = [len(columna) for columna in columnas]
+        self.fila = 1
+
+    def escribir_fila(self, valores: Iterable[Any]):
+        """Escribe una fila; las celdas vacías (None/NaN) se omiten como en to_excel."""
+        hoja, fila, anchos = self.hoja, self.fila, self.anchos
+        for j, v in enumerate(valores):
+            if v is None or (isinstance(v, float) and v != v):
+                continue
+            if isinstance(v, (bool, np.bool_)):
+                hoja.write_boolean(fila, j, bool(v))
+            elif isinstance(v, (int, float, np.number)):
+                hoja.write_number(fila, j, float(v))
+            else:
+                hoja.write_string(fila, j, str(v))
+            largo = largo_celda(v)
+            if largo > anchos[j]:
+                anchos[j] = largo
+        self.fila = fila + 1
+
+    def escribir_filas(self, filas: Iterable[Iterable[Any]]):
+        for valores in filas:
+            self.escribir_fila(valores)
+
+    def cerrar(self):
+        """Aplica los anchos acumulados y cierra el archivo."""
+        for j, largo in enumerate(self.anchos):
+            ancho = min(largo + 2, ANCHO_MAXIMO_COLUMNA)
+            # xlsxwriter agrega el relleno de celda (5px) al ancho pedido; se
+            # descuenta para guardar el mismo valor que column_dimensions de openpyxl
+            self.hoja.set_column(j, j, ancho - 5 / 7)
+        self.workbook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+
+
+def largo_celda(valor: Any) -> int:
+    """
+    Largo con que una celda cuenta para el ancho de su columna (igual en ambos
+    motores): las celdas vacías (None/NaN) no cuentan y los números enteros se
+    miden sin '.0', como los muestra Excel.
+    """
+    if valor is None or valor is pd.NA:
+        return 0
+    if isinstance(valor, (float, np.floating)):
+        if valor != valor:
+            return 0
+        if float(valor).is_integer():
+            return len(str(int(valor)))
+    return len(str(valor))
+
+
+def filas_exportacion(pagos: Iterable[Dict[str, Any]], columnas: List[str]) -> Iterator[Tuple]:
+    """Filas de la hoja tomadas de los pagos, con las conversiones de _preparar_df_export."""
+    for pago in pagos:
+        fila = [pago.get(columna) for columna in columnas]
+        for j, columna in enumerate(columnas):
+            if columna == 'numero_boleta':
+                fila[j] = str(fila[j])
+            elif columna == 'monto' and not isinstance(fila[j], (int, float, np.number)):
+                fila[j] = pd.to_numeric(fila[j], errors='coerce')
+        yield tuple(fila)
+
+
+def escribir_bloque_excel(
+    bloque: Union[pd.DataFrame, Iterable[Dict[str, Any]]],
+    ruta_archivo: Path,
+    motor_excel: str = 'openpyxl',
+    columnas: Optional[List[str]] = None
+) -> Path:
+    """
+    Escribe un bloque de pagos en la hoja 'Pagos' con anchos de columna ajustados.
+    Con motor 'openpyxl' el bloque es un DataFrame de _preparar_df_export; con
+    'streaming' son los pagos ya ordenados y columnas fija las de la hoja.
+    """
+    if motor_excel == 'streaming':
+        encabezados = [COLUMNAS_RENOMBRADAS.get(columna, columna) for columna in columnas]
+        with EscritorExcelStreaming(ruta_archivo, encabezados) as escritor:
+            escritor.escribir_filas(filas_exportacion(bloque, columnas))
+        return ruta_archivo
+
+    df_bloque_to_write = bloque.rename(columns=COLUMNAS_RENOMBRADAS)
+    with pd.ExcelWriter(ruta_archivo, engine='openpyxl') as writer:
+        df_bloque_to_write.to_excel(writer, index=False, sheet_name=HOJA_PAGOS)
+
+        worksheet = writer.sheets[HOJA_PAGOS]
+        for idx, col in enumerate(df_bloque_to_write.columns, 1):
+            max_length = max(map(largo_celda, df_bloque_to_write[col]), default=0)
+            max_length = max(max_length, len(col))
+            col_letter = chr(64 + idx) if idx <= 26 else 'A' + chr(64 + idx - 26)
+            worksheet.column_dimensions[col_letter].width = min(max_length + 2, ANCHO_MAXIMO_COLUMNA)
+
+    return ruta_archivo
+
+
+def _clave_orden_pago(pago: Dict[str, Any]) -> Tuple[str, bool, str]:
+    """Clave equivalente a sort_values(['carnet', 'fecha_pago'], na_position='last')."""
+    fecha = pago.get('fecha_pago')
+    return pago['carnet'], fecha is None, fecha or ''
+
+
+def _volcar_corrida(pagos: List[Dict[str, Any]], ruta_archivo: Path) -> Path:
+    """Guarda una corrida ordenada, un registro por pickle, para leerla en streaming."""
+    with open(ruta_archivo, 'wb') as f:
+        for pago in sorted(pagos, key=_clave_orden_pago):
+            pickle.dump(pago, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return ruta_archivo
+
+
+def _leer_corrida(ruta_archivo: Path) -> Iterator[Dict[str, Any]]:
+    with open(ruta_archivo, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+class _UnpicklerEstado(pickle.Unpickler):
+    """
+    Unpickler del estado incremental: solo reconstruye CLASES_ESTADO_INCREMENTAL
+    (contenedores, números, fechas), así un archivo manipulado no puede
+    ejecutar código al cargarse.
+    """
+
+    def find_class(self, modulo: str, nombre: str):
+        if (modulo, nombre) not in CLASES_ESTADO_INCREMENTAL:
+            raise pickle.UnpicklingError(f"Clase no permitida en el estado incremental: {modulo}.{nombre}")
+        return super().find_class(modulo, nombre)
 
 
 class ExcelPaymentProcessorV3:
@@ -58,8 +1239,56 @@ class ExcelPaymentProcessorV3:
     # A partir de aquí empiezan los meses (columna AC = 28 en base 0)
     COL_MESES_START = 28
     
-    def __init__(self, log_level=logging.INFO, tamaño_bloque=4000):
+    def __init__(
+        self,
+        log_level=logging.INFO,
+        tamaño_bloque=4000,
+        configurar_logging=True,
+        usar_cache=True,
+        tamaño_cache=4096,
+        cache_libros: Optional[CacheLibros] = None,
+        verbosidad_estudiantes: str = 'auto',
+        eventos: Optional[RegistroEventos] = None,
+        instrumentar: bool = False,
+        indice_boletas: Optional[IndiceBoletas] = None,
+        accion_duplicados: str = 'marcar'
+    ):
+        if verbosidad_estudiantes not in VERBOSIDADES_ESTUDIANTE:
+            raise ValueError(
+                f"Verbosidad no soportada: {verbosidad_estudiantes}. Use una de {VERBOSIDADES_ESTUDIANTE}"
+            )
+        if accion_duplicados not in ACCIONES_DUPLICADOS:
+            raise ValueError(
+                f"Acción para duplicados no soportada: {accion_duplicados}. Use una de {ACCIONES_DUPLICADOS}"
+            )
         self.TAMAÑO_BLOQUE = tamaño_bloque
+        self.log_level = log_level
+        # Líneas de log por estudiante: 'detalle', 'resumen' o 'auto' (ver _detalle_estudiante)
+        self.verbosidad_estudiantes = verbosidad_estudiantes
+        self._estudiantes_registrados = 0
+        
+        # Caché LRU por ejecución para los normalizadores (None = desactivada)
+        self.tamaño_cache = tamaño_cache
+        self.cache_normalizacion = CacheNormalizacion(tamaño_cache) if usar_cache else None
+        # Caché en disco de hojas parseadas entre ejecuciones (None = desactivada)
+        self.cache_libros = cache_libros
+        # Registro JSONL de eventos por fila/columna (None = desactivado)
+        self.eventos = eventos
+        self._fila_actual: Optional[int] = None
+        # Advertencias registradas durante una llamada @memoizado en curso (None = sin captura)
+        self._avisos_memoizados: Optional[List[Tuple[int, str]]] = None
+        # Tiempos y llamadas por etapa (ver ETAPAS_INSTRUMENTADAS)
+        self.instrumentar = instrumentar
+        # Boletas de corridas anteriores y de kardex_pagos (None = sin control de duplicados)
+        self.indice_boletas = indice_boletas
+        self.accion_duplicados = accion_duplicados
+        self._claves_ejecucion: Set[str] = set()
+        self._huella_libro_indice: Optional[str] = None
+        
+        # Montos parseados en bloque (texto → (valor, estado)), ver _precalcular_montos
+        self._montos_precalculados: Dict[str, Tuple[float, int]] = {}
+        # Fechas parseadas en lote ((texto, contexto) → (fecha, estadísticas)), ver _precalcular_fechas
+        self._fechas_precalculadas: Dict[Tuple, Tuple[Optional[str], Tuple[str, ...]]] = {}
         
         # Mapeo de meses en español a números
         self.mes_a_numero = {
@@ -196,11 +1425,19 @@ class ExcelPaymentProcessorV3:
             (r'visa\s*net', 'Visa'),
             (r'mastercard|master\s*card', 'Mastercard'),
         ]
+        self.regex_bancos, self.grupos_bancos = self._compilar_patrones_bancos()
         
-        self.setup_logging(log_level)
+        # Los workers de procesos no crean su propio archivo de log
+        if configurar_logging:
+            self.setup_logging(log_level)
         self.logger = logging.getLogger(__name__)
         
-        self.estadisticas = {
+        self.estadisticas = self._nuevas_estadisticas()
+
+    @staticmethod
+    def _nuevas_estadisticas() -> Dict[str, Any]:
+        """Contadores de una corrida en cero."""
+        return {
             'estudiantes_procesados': 0,
             'pagos_extraidos': 0,
             'pagos_especiales': 0,
@@ -227,12 +1464,20 @@ class ExcelPaymentProcessorV3:
             'carnets_duplicados': defaultdict(int),
             'filas_problematicas': [],
             'bloques_generados': 0,
+            'tiempos_escritura': [],
             'estudiantes_activos': 0,
             'estudiantes_inactivos': 0,
             'estudiantes_graduados': 0,
+            'cache_aciertos': defaultdict(int),
+            'cache_fallos': defaultdict(int),
+            'etapas_segundos': defaultdict(float),
+            'etapas_llamadas': defaultdict(int),
+            'boletas_consultadas': 0,
+            'boletas_duplicadas': 0,
+            'boletas_descartadas': 0,
+            'boletas_registradas': 0,
+            'pagos_duplicados': [],
         }
-    
-    
 
     # ========== LOGGING ==========
     def setup_logging(self, level):
@@ -245,31 +1490,80 @@ class ExcelPaymentProcessorV3:
         
         log_format = '%(asctime)s | %(levelname)-8s | %(funcName)-30s | %(message)s'
         
+        _detener_listener_logging()
         for handler in logging.root.handlers[:]:
             logging.root.removeHandler(handler)
+            handler.close()
         
-        logging.basicConfig(
-            level=level,
-            format=log_format,
-            handlers=[
-                logging.StreamHandler(sys.stdout),
-                logging.FileHandler(log_file, encoding='utf-8')
-            ],
-            force=True
-        )
+        formato = logging.Formatter(log_format)
+        handlers = [
+            logging.StreamHandler(sys.stdout),
+            logging.FileHandler(log_file, encoding='utf-8')
+        ]
+        for handler in handlers:
+            handler.setFormatter(formato)
+        
+        # El hilo actual solo encola registros; la escritura a consola y
+        # archivo corre en el hilo del QueueListener
+        global _listener_logging
+        cola_logging = queue.SimpleQueue()
+        _listener_logging = QueueListener(cola_logging, *handlers, respect_handler_level=True)
+        _listener_logging.start()
+        
+        handler_cola = QueueHandler(cola_logging)
+        handler_cola.setFormatter(logging.Formatter('%(message)s'))
+        logging.root.addHandler(handler_cola)
+        logging.root.setLevel(level)
         
         self.logger = logging.getLogger(__name__)
         self.logger.info(f"📁 Log guardado en: {log_file}")
 
     def log_estado(self, msg: str, nivel: str = "info", **kwargs):
-        """Log con contexto adicional."""
+        """Log con contexto adicional; no arma el texto si el nivel está desactivado."""
+        nivel_log = NIVELES_LOG.get(nivel.lower(), logging.INFO)
+        if not self.logger.isEnabledFor(nivel_log):
+            return
+        
         contexto = " | ".join([f"{k}={v}" for k, v in kwargs.items()])
         m = f"{msg}"
         if contexto:
             m += f" | {contexto}"
         
-        log_func = getattr(self.logger, nivel.lower(), self.logger.info)
-        log_func(m)
+        self._registrar_log(nivel_log, m)
+
+    def _registrar_log(self, nivel_log: int, mensaje: str):
+        """Emite el mensaje; las advertencias se guardan además para @memoizado."""
+        if self._avisos_memoizados is not None and nivel_log >= logging.WARNING:
+            self._avisos_memoizados.append((nivel_log, mensaje))
+        self.logger.log(nivel_log, mensaje)
+
+    def _detalle_estudiante(self) -> bool:
+        """
+        Indica si se registran las líneas por estudiante (👤 Procesando, ✅ Procesado).
+        'auto' las registra para los primeros UMBRAL_DETALLE_ESTUDIANTES estudiantes
+        y luego pasa a resumen; las advertencias se registran siempre.
+        """
+        if self.verbosidad_estudiantes == 'detalle':
+            return True
+        if self.verbosidad_estudiantes == 'resumen':
+            return False
+        return self._estudiantes_registrados < UMBRAL_DETALLE_ESTUDIANTES
+
+    def _log_avance_estudiantes(self):
+        """Resumen periódico cuando no se registra cada estudiante."""
+        vistos = self._estudiantes_registrados
+        if self.verbosidad_estudiantes == 'auto' and vistos == UMBRAL_DETALLE_ESTUDIANTES + 1:
+            self.log_estado(
+                f"ℹ️ Log por estudiante resumido",
+                desde_estudiante=vistos,
+                cada=INTERVALO_RESUMEN_ESTUDIANTES
+            )
+        elif vistos % INTERVALO_RESUMEN_ESTUDIANTES == 0:
+            self.log_estado(
+                f"📈 Avance",
+                estudiantes=vistos,
+                pagos=self.estadisticas['pagos_extraidos']
+            )
 
     # ========== UTILIDADES ==========
     def _is_empty(self, v: Any) -> bool:
@@ -281,18 +1575,11 @@ class ExcelPaymentProcessorV3:
             return True
         
         if isinstance(v, str):
-            s = v.strip().lower()
-            empty_values = {
-                '', 'nan', 'n/a', 'na', 'null', 'none', 
-                'undefined', 'nil', '-', '--', '---',
-                'sin dato', 'sin datos', 'no aplica',
-                'no disponible', 'nd', 's/d', 's/n',
-                'vacio', 'vacío', 'empty', '0'
-            }
-            return s in empty_values
+            return v.strip().lower() in VALORES_VACIOS
         
         return False
 
+    @memoizado()
     def limpiar_texto(self, v: Any) -> Optional[str]:
         """Limpieza robusta de texto."""
         if self._is_empty(v):
@@ -308,6 +1595,7 @@ class ExcelPaymentProcessorV3:
             self.log_estado(f"Error limpiando texto: {e}", "debug", valor=str(v)[:50])
             return None
 
+    @memoizado()
     def normalizar_estatus(self, estatus_raw: Any) -> str:
         """
         Normaliza el estatus según las nuevas reglas:
@@ -396,12 +1684,40 @@ class ExcelPaymentProcessorV3:
         
         return carnet_limpio
 
+    @cronometrado('limpiar_monto')
     def limpiar_monto(self, v: Any) -> Optional[float]:
         """
         ✅ MEJORADO: Limpieza ROBUSTA de montos con soporte para negativos.
         """
+        val, estado = self._clasificar_monto(v)
+
+        if estado == MONTO_VALIDO:
+            # Estadística para montos negativos
+            if val < 0:
+                self.estadisticas['montos_negativos'] += 1
+                self.log_estado(f"💸 Monto negativo (reembolso/devolución)", "info", monto=val)
+            return val
+
+        if estado in EVENTOS_MONTO_RECHAZADO:
+            if estado == MONTO_FUERA_DE_RANGO:
+                self.log_estado(f"Monto fuera de rango", "debug", valor=str(v)[:50])
+            self.estadisticas['montos_invalidos'] += 1
+        return None
+
+    def _clasificar_monto(self, v: Any) -> Tuple[Optional[float], int]:
+        """
+        Núcleo escalar de limpiar_monto, sin efectos en estadísticas.
+        Devuelve (monto, estado): el monto solo si el estado es MONTO_VALIDO;
+        si no, MONTO_VACIO, MONTO_INVALIDO o MONTO_FUERA_DE_RANGO.
+        """
+        if type(v) is str and self._montos_precalculados:
+            precalculado = self._montos_precalculados.get(v)
+            if precalculado is not None:
+                val, estado = precalculado
+                return (val if estado == MONTO_VALIDO else None), estado
+
         if self._is_empty(v):
-            return None
+            return None, MONTO_VACIO
         
         try:
             s = str(v).strip()
@@ -419,7 +1735,7 @@ class ExcelPaymentProcessorV3:
             s = re.sub(r'[^\d\.\-]', '', s)
             
             if not s or s == '-' or s == '.':
-                return None
+                return None, MONTO_VACIO
             
             # Convertir a float SIN abs() para preservar signo
             val = float(s)
@@ -430,29 +1746,131 @@ class ExcelPaymentProcessorV3:
             
             # Validar rango (permitiendo negativos)
             if not (-100000.0 <= val <= 100000.0):
-                if val != 0:
-                    self.log_estado(f"Monto fuera de rango", "debug", monto=val)
-                self.estadisticas['montos_invalidos'] += 1
-                return None
-            
-            # Estadística para montos negativos
-            if val < 0:
-                self.estadisticas['montos_negativos'] += 1
-                self.log_estado(
-                    f"💸 Monto negativo (reembolso/devolución)",
-                    "info",
-                    monto=val
-                )
+                return None, MONTO_FUERA_DE_RANGO
             
-            return val
+            return val, MONTO_VALIDO
             
         except (ValueError, TypeError):
-            self.estadisticas['montos_invalidos'] += 1
-            return None
+            return None, MONTO_INVALIDO
         except Exception as e:
             self.log_estado(f"Error procesando monto: {e}", "debug", valor=str(v)[:50])
-            self.estadisticas['montos_invalidos'] += 1
-            return None
+            return None, MONTO_INVALIDO
+
+    def _parsear_montos(self, valores: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        ✅ Núcleo vectorizado de limpiar_monto, sin efectos en estadísticas.
+
+        Devuelve (montos float64, estado int8) con las mismas reglas que
+        _clasificar_monto: MONTO_VACIO (NaN, sin contador), MONTO_VALIDO o
+        MONTO_INVALIDO / MONTO_FUERA_DE_RANGO (NaN, cuentan en montos_invalidos).
+        """
+        serie = pd.Series(np.asarray(valores, dtype=object).ravel(), dtype=object)
+        n = len(serie)
+        montos = np.full(n, np.nan)
+        estado = np.full(n, MONTO_VACIO, dtype=np.int8)
+
+        if n == 0:
+            return montos, estado
+
+        tipos = serie.map(type)
+        es_texto = (tipos == str).to_numpy()
+        vacio = serie.isna().to_numpy().copy()
+        if es_texto.any():
+            vacio[es_texto] = serie[es_texto].str.strip().str.lower().isin(VALORES_VACIOS).to_numpy()
+
+        # Números cuyo str() no usa notación científica: el valor es el propio número
+        es_entero = tipos.isin([int, np.int64, np.int32]).to_numpy()
+        es_flotante = tipos.isin([float, np.float64]).to_numpy() & ~vacio
+        if es_flotante.any():
+            absolutos = np.abs(serie[es_flotante].to_numpy(dtype=np.float64))
+            directo = (absolutos == 0) | ((absolutos >= 1e-4) & (absolutos < 1e16))
+            es_flotante[es_flotante] = directo
+
+        numerico = es_entero | es_flotante
+        montos[numerico] = serie[numerico].to_numpy(dtype=np.float64)
+        estado[numerico] = MONTO_VALIDO
+
+        # Resto de celdas: mismas transformaciones de texto que limpiar_monto
+        por_texto = ~vacio & ~numerico
+        if por_texto.any():
+            textos = serie[por_texto].map(str).str.strip()
+            negativo = textos.str.startswith('-') | (textos.str.startswith('(') & textos.str.endswith(')'))
+            parentesis = textos.str.startswith('(') & textos.str.endswith(')')
+            textos = textos.where(~parentesis, textos.str[1:-1])
+            # Los símbolos Q/$/€/₡, comas y espacios también caen en este filtro
+            textos = textos.str.replace(r'[^\d\.\-]', '', regex=True)
+
+            sin_valor = textos.isin(['', '-', '.']).to_numpy()
+            formato_valido = textos.str.fullmatch(r'-?(?:\d+\.?\d*|\.\d+)').fillna(False).to_numpy(dtype=bool)
+
+            valores_texto = np.full(len(textos), np.nan)
+            valores_texto[formato_valido] = textos[formato_valido].astype(np.float64).to_numpy()
+            invertir = negativo.to_numpy() & (valores_texto > 0)
+            valores_texto[invertir] = -valores_texto[invertir]
+
+            estado_texto = np.where(
+                sin_valor, MONTO_VACIO, np.where(formato_valido, MONTO_VALIDO, MONTO_INVALIDO)
+            ).astype(np.int8)
+
+            montos[por_texto] = valores_texto
+            estado[por_texto] = estado_texto
+
+        fuera_de_rango = (estado == MONTO_VALIDO) & ~((montos >= -100000.0) & (montos <= 100000.0))
+        estado[fuera_de_rango] = MONTO_FUERA_DE_RANGO
+        montos[estado != MONTO_VALIDO] = np.nan
+
+        return montos, estado
+
+    def limpiar_montos(self, valores: Any) -> np.ndarray:
+        """
+        ✅ Versión vectorizada de limpiar_monto para una fila de cantidades o una
+        columna completa. Devuelve float64 con NaN en los vacíos/inválidos y
+        actualiza montos_negativos / montos_invalidos igual que la versión escalar.
+        """
+        forma = np.shape(valores)
+        montos, estado = self._parsear_montos(valores)
+
+        invalidos = int(np.isin(estado, list(EVENTOS_MONTO_RECHAZADO)).sum())
+        negativos = int((montos < 0).sum())
+        self.estadisticas['montos_invalidos'] += invalidos
+        self.estadisticas['montos_negativos'] += negativos
+
+        if negativos:
+            self.log_estado(f"💸 Montos negativos (reembolsos/devoluciones)", "info", cantidad=negativos)
+
+        return montos.reshape(forma) if forma else montos
+
+    def _precalcular_montos(self, filas_cantidades: np.ndarray, columnas_info: List[Dict]):
+        """
+        Parsea de una sola vez las celdas de monto (no múltiples) de todas las filas
+        de cantidades. limpiar_monto consulta el resultado por texto y sigue
+        contando las estadísticas en cada uso.
+        """
+        indices = [
+            idx for idx in self._indices_columnas_pago(columnas_info)
+            if idx < filas_cantidades.shape[1]
+        ]
+        if not indices or not len(filas_cantidades):
+            return
+
+        celdas = pd.Series(filas_cantidades[:, indices].ravel(), dtype=object)
+        celdas = celdas[celdas.notna()]
+        textos = celdas.map(str).str.strip()
+        textos = textos[(textos != '') & ~textos.str.contains('/', regex=False)].drop_duplicates()
+
+        montos, estado = self._parsear_montos(textos.to_numpy())
+        self._montos_precalculados = dict(zip(textos, zip(montos.tolist(), estado.tolist())))
+
+        self.log_estado(f"🧮 Montos precalculados", "debug", valores_distintos=len(textos))
+
+    def _indices_columnas_pago(self, columnas_info: List[Dict]) -> List[int]:
+        """Índices de las columnas especiales y de meses que contienen pagos."""
+        especiales = [
+            self.COL_PAGO_CASOS_START, self.COL_CERTIFICACION_START, self.COL_TITULOS_START,
+            self.COL_CAPSTONE_START, self.COL_GRADUACION_START,
+        ]
+        meses = [c['indice'] for c in columnas_info if c['indice'] >= self.COL_MESES_START and c['mes_numero']]
+        return especiales + meses
 
     def to_str_preserve_number(self, v: Any) -> Optional[str]:
         """Preserva números largos como texto."""
@@ -482,6 +1900,11 @@ class ExcelPaymentProcessorV3:
             return None
 
     # ========== PARSEO DE FECHAS MEJORADO ==========
+    @cronometrado('parse_fecha_mejorada')
+    @memoizado(
+        'fechas_no_disponibles', 'fechas_parseadas', 'fechas_fallidas',
+        'fechas_corregidas', 'fechas_cambio_año'
+    )
     def parse_fecha_mejorada(
         self, 
         v: Any, 
@@ -492,6 +1915,14 @@ class ExcelPaymentProcessorV3:
         """
         ✅ MEJORADO: Parser de fechas con mejor manejo de cambio de año.
         """
+        if type(v) is str and self._fechas_precalculadas:
+            precalculada = self._fechas_precalculadas.get((v, año_contexto, mes_nombre, año_columna))
+            if precalculada is not None:
+                fecha, efectos = precalculada
+                for nombre_estadistica in efectos:
+                    self.estadisticas[nombre_estadistica] += 1
+                return fecha
+
         if self._is_empty(v):
             self.estadisticas['fechas_no_disponibles'] += 1
             return None
@@ -585,6 +2016,252 @@ class ExcelPaymentProcessorV3:
         self.log_estado(f"⚠️ Fecha no parseada", "debug", fecha=texto_original)
         return None
 
+    def _parsear_fecha_pandas(self, texto: str) -> Optional[str]:
+        """Último recurso de parse_fecha_mejorada: pd.to_datetime escalar (sin estadísticas)."""
+        try:
+            fecha = pd.to_datetime(texto, dayfirst=True, errors='coerce')
+            if not pd.isna(fecha) and 2000 <= fecha.year <= 2030:
+                return fecha.strftime('%Y-%m-%d')
+        except Exception:
+            pass
+        return None
+
+    def _parsear_fechas(
+        self,
+        valores: Any,
+        año_contexto: Any = None,
+        mes_nombre: Any = None,
+        año_columna: Any = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        ✅ Motor por lotes de parse_fecha_mejorada, sin efectos en estadísticas.
+
+        Clasifica todas las celdas por patrón (serial de Excel, dd/mm/yyyy, d-mmm)
+        y convierte cada clase con operaciones vectorizadas; el cambio de año
+        (mes_columna >= 7 y mes_pago <= 6) se aplica como operación de arreglos.
+        Solo los sobrantes pasan por pd.to_datetime escalar. Los contextos pueden
+        ser escalares o arreglos del mismo largo que valores.
+
+        Devuelve (fechas, estado, cambio_año, corregida) por celda, con estado en
+        FECHA_NO_DISPONIBLE / FECHA_PARSEADA / FECHA_FALLIDA.
+        """
+        serie = pd.Series(np.asarray(valores, dtype=object).ravel(), dtype=object)
+        n = len(serie)
+        fechas = np.full(n, None, dtype=object)
+        estado = np.full(n, FECHA_FALLIDA, dtype=np.int8)
+        cambio_año = np.zeros(n, dtype=bool)
+        corregida = np.zeros(n, dtype=bool)
+
+        if n == 0:
+            return fechas, estado, cambio_año, corregida
+
+        ctx_año = np.broadcast_to(np.asarray(año_contexto, dtype=object), (n,))
+        ctx_mes = np.broadcast_to(np.asarray(mes_nombre, dtype=object), (n,))
+        ctx_col = np.broadcast_to(np.asarray(año_columna, dtype=object), (n,))
+
+        # Misma definición de vacío que _is_empty (NaT y similares no cuentan)
+        es_texto = np.array(serie.map(lambda v: isinstance(v, str)), dtype=bool)
+        es_numero = np.array(serie.map(lambda v: isinstance(v, (int, float))), dtype=bool)
+        vacio = np.array(serie.map(lambda v: v is None or (isinstance(v, float) and v != v)), dtype=bool)
+        if es_texto.any():
+            vacio[es_texto] = serie[es_texto].str.strip().str.lower().isin(VALORES_VACIOS).to_numpy()
+        estado[vacio] = FECHA_NO_DISPONIBLE
+        pendiente = ~vacio
+
+        # 1. Timestamp de Excel
+        serial = pendiente & es_numero
+        if serial.any():
+            dias = serie[serial].astype(np.float64)
+            en_rango = ((dias >= 25000) & (dias <= 65000)).to_numpy()
+            idx = np.flatnonzero(serial)[en_rango]
+            if len(idx):
+                convertidas = pd.Timestamp('1899-12-30') + pd.to_timedelta(dias[en_rango].to_numpy(), unit='D')
+                fechas[idx] = convertidas.strftime('%Y-%m-%d').to_numpy(dtype=object)
+                estado[idx] = FECHA_PARSEADA
+                pendiente[idx] = False
+
+        textos = pd.Series('', index=serie.index, dtype=object)
+        if pendiente.any():
+            textos[pendiente] = serie[pendiente].map(str).str.strip()
+
+        # 2. Formato dd/mm/yyyy
+        partes = textos[pendiente].str.extract(r'^(\d{1,2})/(\d{1,2})/(\d{4})$').dropna()
+        if len(partes):
+            dia = partes[0].map(int).to_numpy()
+            mes = partes[1].map(int).to_numpy()
+            año = partes[2].map(int).to_numpy()
+            en_rango = (mes >= 1) & (mes <= 12) & (dia >= 1) & (dia <= 31) & (año >= 2000) & (año <= 2030)
+            convertidas = pd.to_datetime(
+                pd.DataFrame({
+                    'year': np.where(en_rango, año, 2000),
+                    'month': np.where(en_rango, mes, 1),
+                    'day': np.where(en_rango, dia, 1),
+                }),
+                errors='coerce'
+            )
+            validas = en_rango & convertidas.notna().to_numpy()
+            idx = partes.index.to_numpy()[validas]
+            fechas[idx] = convertidas[validas].dt.strftime('%Y-%m-%d').to_numpy(dtype=object)
+            estado[idx] = FECHA_PARSEADA
+            pendiente[idx] = False
+
+        # 3. Formato d-mmm con cambio de año
+        partes = textos[pendiente].str.lower().str.extract(r'^(\d{1,2})-([a-zA-Zá-ú]+)$').dropna()
+        if len(partes):
+            meses = partes[1].map(self.mes_a_numero)
+            partes = partes[meses.notna()]
+            meses = meses[meses.notna()]
+        if len(partes):
+            idx = partes.index.to_numpy()
+            dia = partes[0].map(int).to_numpy()
+            mes = meses.astype(int).to_numpy()
+
+            col = ctx_col[idx]
+            año = np.array([
+                c if c else (a or 2020) for c, a in zip(col, ctx_año[idx])
+            ], dtype=np.int64)
+
+            meses_columna = {}
+            mes_columna = np.array([
+                meses_columna.setdefault(m, self._extraer_mes_de_nombre_columna(m)) or 0
+                if (m and c) else 0
+                for m, c in zip(ctx_mes[idx], col)
+            ], dtype=np.int64)
+            rollover = (mes_columna >= 7) & (mes <= 6)
+            año = año + rollover
+            cambio_año[idx] = rollover
+
+            ultimos = {}
+            for a, m in set(zip(año.tolist(), mes.tolist())):
+                try:
+                    ultimos[(a, m)] = calendar.monthrange(a, m)[1]
+                except Exception:
+                    ultimos[(a, m)] = 0
+            ultimo_dia = np.array([ultimos[(a, m)] for a, m in zip(año.tolist(), mes.tolist())], dtype=np.int64)
+
+            # Día 0 o año fuera de rango: el parser escalar cae al último recurso
+            validas = (dia >= 1) & (ultimo_dia > 0) & (año >= 1) & (año <= 9999)
+            ajustadas = validas & (dia > ultimo_dia)
+            dia = np.minimum(dia, ultimo_dia)
+
+            textos_fecha = (
+                pd.Series(año).map('{:04d}'.format) + '-' +
+                pd.Series(mes).map('{:02d}'.format) + '-' +
+                pd.Series(dia).map('{:02d}'.format)
+            ).to_numpy(dtype=object)
+            # strftime('%Y') no rellena con ceros los años < 1000
+            for k in np.flatnonzero(validas & (año < 1000)):
+                textos_fecha[k] = datetime(int(año[k]), int(mes[k]), int(dia[k])).strftime('%Y-%m-%d')
+
+            fechas[idx[validas]] = textos_fecha[validas]
+            estado[idx[validas]] = FECHA_PARSEADA
+            corregida[idx[ajustadas]] = True
+            pendiente[idx[validas]] = False
+
+        # 4. Último recurso: pandas, una vez por texto distinto
+        if pendiente.any():
+            idx = np.flatnonzero(pendiente)
+            resueltas = {}
+            for k in idx:
+                texto = textos.iat[k]
+                if texto not in resueltas:
+                    resueltas[texto] = self._parsear_fecha_pandas(texto)
+                fecha = resueltas[texto]
+                if fecha is not None:
+                    fechas[k] = fecha
+                    estado[k] = FECHA_PARSEADA
+
+        return fechas, estado, cambio_año, corregida
+
+    def parse_fechas(
+        self,
+        valores: Any,
+        año_contexto: Any = None,
+        mes_nombre: Any = None,
+        año_columna: Any = None
+    ) -> List[Optional[str]]:
+        """
+        ✅ Versión por lotes de parse_fecha_mejorada para una columna completa.
+        Actualiza fechas_parseadas, fechas_fallidas, fechas_no_disponibles,
+        fechas_cambio_año y fechas_corregidas igual que la versión escalar.
+        """
+        fechas, estado, cambio_año, corregida = self._parsear_fechas(
+            valores, año_contexto, mes_nombre, año_columna
+        )
+
+        self.estadisticas['fechas_no_disponibles'] += int((estado == FECHA_NO_DISPONIBLE).sum())
+        self.estadisticas['fechas_parseadas'] += int((estado == FECHA_PARSEADA).sum())
+        self.estadisticas['fechas_fallidas'] += int((estado == FECHA_FALLIDA).sum())
+        self.estadisticas['fechas_cambio_año'] += int(cambio_año.sum())
+        self.estadisticas['fechas_corregidas'] += int(corregida.sum())
+
+        if corregida.any():
+            self.log_estado(f"⚠️ Días ajustados", "warning", cantidad=int(corregida.sum()))
+
+        return fechas.tolist()
+
+    def _precalcular_fechas(self, filas_fechas: np.ndarray, columnas_info: List[Dict]):
+        """
+        Parsea en un solo lote las celdas de fecha (no múltiples) de todas las
+        columnas de pago, cada una con el contexto que usa el procesamiento por
+        estudiante. parse_fecha_mejorada consulta el resultado y reaplica sus
+        estadísticas en cada uso.
+        """
+        contextos = [
+            (idx, 2020, None, None)
+            for idx in self._indices_columnas_pago([])
+        ] + [
+            (c['indice'], c['año'], c['nombre'], c['año'])
+            for c in columnas_info
+            if c['indice'] >= self.COL_MESES_START and c['mes_numero']
+        ]
+
+        textos, años, meses, años_columna = [], [], [], []
+        for idx, año_contexto, mes_nombre, año_columna in contextos:
+            if idx >= filas_fechas.shape[1]:
+                continue
+            celdas = pd.Series(filas_fechas[:, idx], dtype=object)
+            celdas = celdas[celdas.notna()].map(str).str.strip()
+            # Celdas que extraer_valores_multiples devuelve completas
+            completas = ~celdas.str.contains('/', regex=False) | (
+                (celdas.str.count('/') <= 2) & celdas.str.contains(r'\d{1,2}/\d{1,2}', regex=True)
+            )
+            distintos = celdas[(celdas != '') & completas].drop_duplicates().tolist()
+            textos.extend(distintos)
+            años.extend([año_contexto] * len(distintos))
+            meses.extend([mes_nombre] * len(distintos))
+            años_columna.extend([año_columna] * len(distintos))
+
+        if not textos:
+            return
+
+        contexto_año = np.empty(len(años), dtype=object)
+        contexto_año[:] = años
+        contexto_mes = np.empty(len(meses), dtype=object)
+        contexto_mes[:] = meses
+        contexto_col = np.empty(len(años_columna), dtype=object)
+        contexto_col[:] = años_columna
+
+        fechas, estado, cambio_año, corregida = self._parsear_fechas(
+            textos, contexto_año, contexto_mes, contexto_col
+        )
+
+        nombres_estado = {
+            FECHA_NO_DISPONIBLE: 'fechas_no_disponibles',
+            FECHA_PARSEADA: 'fechas_parseadas',
+            FECHA_FALLIDA: 'fechas_fallidas',
+        }
+        for k, texto in enumerate(textos):
+            efectos = [nombres_estado[int(estado[k])]]
+            if cambio_año[k]:
+                efectos.append('fechas_cambio_año')
+            if corregida[k]:
+                efectos.append('fechas_corregidas')
+            clave = (texto, años[k], meses[k], años_columna[k])
+            self._fechas_precalculadas[clave] = (fechas[k], tuple(efectos))
+
+        self.log_estado(f"🧮 Fechas precalculadas", "debug", valores_distintos=len(textos))
+
     def _extraer_mes_de_nombre_columna(self, nombre_columna: str) -> Optional[int]:
         """Extrae el número de mes desde el nombre de la columna."""
         if not nombre_columna:
@@ -594,6 +2271,7 @@ class ExcelPaymentProcessorV3:
         return self.mes_a_numero.get(nombre_limpio)
 
     # ========== NORMALIZACIÓN DE PLAN DE ESTUDIOS ==========
+    @memoizado('planes_detectados', 'planes_no_mapeados')
     def obtener_programa(self, plan_raw: Any) -> str:
         """Obtiene el código de programa normalizado."""
         if self._is_empty(plan_raw):
@@ -638,27 +2316,88 @@ class ExcelPaymentProcessorV3:
         self.log_estado(f"⚠️ Plan NO mapeado", "warning", plan=str(plan_raw))
         return "TEMP"
 
+    def _compilar_patrones_bancos(self) -> Tuple[re.Pattern, Dict[str, str]]:
+        """
+        ✅ Compila self.patrones_bancos en una sola expresión.
+        Cada alternativa es un lookahead anclado al inicio, de modo que gana el
+        primer patrón de la lista que aparezca en cualquier parte del texto
+        (misma prioridad que el recorrido original: 'visa net' vs 'visa', ' bi ').
+        """
+        alternativas = []
+        grupos = {}
+        for i, (patron, nombre_banco) in enumerate(self.patrones_bancos):
+            grupo = f"banco_{i}"
+            alternativas.append(f"(?=.*?(?:{patron}))(?P<{grupo}>)")
+            grupos[grupo] = nombre_banco
+
+        regex = re.compile("^(?:" + "|".join(alternativas) + ")", re.IGNORECASE | re.DOTALL)
+        return regex, grupos
+
+    def _clasificar_banco(self, texto: Any) -> Optional[str]:
+        """Nombre canónico del banco, o None si no se reconoce (sin estadísticas)."""
+        if not texto or self._is_empty(texto):
+            return None
+
+        t = str(texto).strip().lower()
+
+        if t in VALORES_BANCO_VACIO:
+            return None
+
+        m = self.regex_bancos.match(t)
+        return self.grupos_bancos[m.lastgroup] if m else None
+
+    @cronometrado('detectar_banco')
+    @memoizado('bancos_detectados')
     def detectar_banco(self, texto: Optional[str]) -> str:
         """Detector de banco."""
-        if not texto or self._is_empty(texto):
-            return "No especificado"
-        
         try:
-            t = str(texto).strip().lower()
-            
-            if t in ['n/a', 'na', '0', '-', 'null', 'none']:
+            nombre_banco = self._clasificar_banco(texto)
+            if nombre_banco is None:
                 return "No especificado"
             
-            for patron, nombre_banco in self.patrones_bancos:
-                if re.search(patron, t, re.IGNORECASE):
-                    self.estadisticas['bancos_detectados'][nombre_banco] += 1
-                    return nombre_banco
-            
-            return "No especificado"
+            self.estadisticas['bancos_detectados'][nombre_banco] += 1
+            return nombre_banco
         except Exception as e:
             self.log_estado(f"Error detectando banco: {e}", "debug", texto=str(texto)[:50])
             return "No especificado"
 
+    def detectar_bancos(self, textos: Iterable[Any]) -> List[str]:
+        """
+        ✅ Clasifica una columna completa de celdas de banco en una sola llamada.
+        Cada valor distinto se evalúa una vez; bancos_detectados se incrementa
+        por cada celda igual que con detectar_banco.
+        """
+        resultados: List[str] = []
+        por_valor: Dict[Any, Optional[str]] = {}
+        conteos: Dict[str, int] = defaultdict(int)
+
+        for texto in textos:
+            clave = _clave_celda(texto)
+            if clave is None:
+                resultados.append("No especificado")
+                continue
+
+            if clave in por_valor:
+                nombre_banco = por_valor[clave]
+            else:
+                try:
+                    nombre_banco = self._clasificar_banco(texto)
+                except Exception as e:
+                    self.log_estado(f"Error detectando banco: {e}", "debug", texto=str(texto)[:50])
+                    nombre_banco = None
+                por_valor[clave] = nombre_banco
+
+            if nombre_banco is None:
+                resultados.append("No especificado")
+            else:
+                conteos[nombre_banco] += 1
+                resultados.append(nombre_banco)
+
+        for nombre_banco, cantidad in conteos.items():
+            self.estadisticas['bancos_detectados'][nombre_banco] += cantidad
+
+        return resultados
+
     def _validar_balance_pagos_multiples(
         self,
         boletas: List[str],
@@ -796,218 +2535,727 @@ class ExcelPaymentProcessorV3:
         
         return [texto] if texto else []
 
+    # ========== LECTURA DEL ARCHIVO ==========
+    def _normalizar_celda_streaming(self, v: Any) -> Any:
+        """Replica la conversión de celdas que hace pd.read_excel(dtype=object)."""
+        if v is None:
+            return None
+        if isinstance(v, float) and v.is_integer():
+            return int(v)
+        if isinstance(v, str) and v in VALORES_NA_EXCEL:
+            return None
+        return v
+
+    def leer_bloques_streaming(self, archivo_entrada: str) -> Iterator[Tuple]:
+        """
+        ✅ Lectura en streaming con openpyxl (read_only + values_only).
+
+        Primero produce la tupla (años_row, headers_row) y luego, por cada
+        estudiante, (fila_inicio, (datos, cantidades, fechas, bancos)).
+        La memoria queda acotada a un bloque de 4 filas en lugar de la hoja completa.
+        """
+        wb = load_workbook(archivo_entrada, read_only=True, data_only=True)
+        try:
+            ws = wb.worksheets[0]
+            encabezados: List[Tuple] = []
+            bloque: List[Tuple] = []
+            fila_inicio = 2
+            # pd.read_excel descarta las filas vacías finales: se retienen hasta
+            # saber si detrás viene contenido.
+            vacias_pendientes = 0
+
+            for fila_raw in ws.iter_rows(values_only=True):
+                fila = tuple(self._normalizar_celda_streaming(v) for v in fila_raw)
+
+                if all(v is None for v in fila):
+                    vacias_pendientes += 1
+                    continue
+
+                filas = [()] * vacias_pendientes + [fila]
+                vacias_pendientes = 0
+
+                for f in filas:
+                    if len(encabezados) < 2:
+                        encabezados.append(f)
+                        if len(encabezados) == 2:
+                            yield encabezados[0], encabezados[1]
+                        continue
+
+                    bloque.append(f)
+                    if len(bloque) == 4:
+                        yield fila_inicio, tuple(bloque)
+                        fila_inicio += 4
+                        bloque = []
+
+            if not encabezados:
+                raise ValueError("El archivo Excel está vacío")
+            if len(encabezados) == 1:
+                yield encabezados[0], ()
+            if bloque:
+                self.log_estado(f"⚠️ Bloque incompleto al final", "warning", fila=fila_inicio+1)
+        finally:
+            wb.close()
+
+    @cronometrado('lectura')
+    def _leer_hoja(self, archivo_entrada: str) -> pd.DataFrame:
+        """
+        ✅ Lee la hoja completa como grilla de objetos.
+        Con cache_libros, un libro ya visto se carga desde disco sin parsear el XLSX.
+        """
+        if self.cache_libros is None:
+            return pd.read_excel(archivo_entrada, engine='openpyxl', dtype=object, header=None)
+
+        clave = self.cache_libros.clave(archivo_entrada)
+        df = self.cache_libros.cargar(clave)
+        if df is not None:
+            self.log_estado(f"⚡ Hoja cargada desde caché", clave=clave[:12])
+            return df
+
+        df = pd.read_excel(archivo_entrada, engine='openpyxl', dtype=object, header=None)
+        if self.cache_libros.guardar(clave, df):
+            self.log_estado(f"💾 Hoja guardada en caché", clave=clave[:12])
+        else:
+            self.log_estado(f"⚠️ Hoja con celdas no cacheables, se omite la caché", "warning")
+        return df
+
+    def _bloques_dataframe(self, df: pd.DataFrame) -> Iterator[Tuple[int, Tuple]]:
+        """Recorre el DataFrame en bloques de 4 filas (implementación de referencia)."""
+        i = 2
+        n = len(df)
+
+        while i < n:
+            if i + 3 >= n:
+                self.log_estado(f"⚠️ Bloque incompleto al final", "warning", fila=i+1)
+                break
+
+            yield i, (df.iloc[i], df.iloc[i + 1], df.iloc[i + 2], df.iloc[i + 3])
+            i += 4
+
+    def _matriz_bloques(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        ✅ Convierte la hoja una sola vez a un ndarray de objetos con forma
+        (estudiantes, 4, columnas).
+        """
+        datos = df.to_numpy(dtype=object)
+        n, num_columnas = datos.shape
+        num_bloques = max(n - 2, 0) // 4
+
+        if n > 2 and (n - 2) % 4:
+            self.log_estado(f"⚠️ Bloque incompleto al final", "warning", fila=2 + num_bloques * 4 + 1)
+
+        return datos[2:2 + num_bloques * 4].reshape(num_bloques, 4, num_columnas)
+
+    def _bloques_ndarray(self, matriz: np.ndarray) -> Iterator[Tuple[int, np.ndarray]]:
+        """Recorre la matriz de bloques sin crear una Series por fila."""
+        for b in range(len(matriz)):
+            yield 2 + b * 4, matriz[b]
+
+    def _extraer_notas_pago_encabezado(self, años_row, headers_row) -> Optional[str]:
+        """Obtiene la nota de pago global definida en el encabezado (si existe)."""
+        notas_pago_encabezado = None
+        if self.COL_NOTAS_PAGO < len(años_row):
+            notas_pago_encabezado = self.limpiar_texto(años_row[self.COL_NOTAS_PAGO])
+        if not notas_pago_encabezado and self.COL_NOTAS_PAGO < len(headers_row):
+            notas_pago_encabezado = self.limpiar_texto(headers_row[self.COL_NOTAS_PAGO])
+        if notas_pago_encabezado:
+            normalized_label = notas_pago_encabezado.lower().replace(' ', '_')
+            if normalized_label in {'notas_de_pago', 'notas_pago'}:
+                notas_pago_encabezado = None
+        return notas_pago_encabezado
+
     # ========== PROCESAMIENTO PRINCIPAL ==========
-    def procesar_excel_v3(self, archivo_entrada: str) -> List[Dict[str, Any]]:
+    def procesar_excel_v3(
+        self,
+        archivo_entrada: str,
+        modo_lectura: str = 'pandas',
+        workers: int = 1,
+        columnar: bool = False,
+        archivo_checkpoint: Optional[str] = None,
+        checkpoint_bloques: Optional[int] = None,
+        checkpoint_segundos: Optional[float] = None,
+        resume: bool = False
+    ) -> List[Dict[str, Any]]:
         """
         Procesa el archivo Excel con estructura de doble encabezado.
+
+        modo_lectura:
+        - 'pandas': carga la hoja completa con pd.read_excel (referencia)
+        - 'numpy': igual que 'pandas', pero recorre una vista ndarray (estudiantes, 4, columnas)
+        - 'streaming': lee con openpyxl en modo read_only, bloque a bloque
+
+        workers > 1 reparte los bloques de estudiantes entre un pool de procesos;
+        el resultado y las estadísticas son idénticos al procesamiento serial.
+
+        columnar=True devuelve un RegistroPagos en lugar de List[Dict].
+
+        archivo_checkpoint: guarda el avance cada checkpoint_bloques bloques y/o
+        cada checkpoint_segundos segundos (por defecto cada
+        CHECKPOINT_BLOQUES_POR_DEFECTO bloques); con resume=True continúa desde
+        el último checkpoint del mismo archivo de entrada y el resultado es el
+        de una corrida sin interrupciones. Requiere workers=1.
         """
-        self.estadisticas['inicio_procesamiento'] = datetime.now()
-        self.log_estado(f"🚀 Iniciando procesamiento V3.1", archivo=archivo_entrada)
+        if modo_lectura not in MODOS_LECTURA:
+            raise ValueError(f"Modo de lectura no soportado: {modo_lectura}")
+        if archivo_checkpoint and workers > 1:
+            raise ValueError("Los checkpoints requieren workers=1")
+
+        self._iniciar_procesamiento(archivo_entrada, modo_lectura)
 
         try:
-            archivo_path = Path(archivo_entrada)
-            if not archivo_path.exists():
-                raise FileNotFoundError(f"Archivo no encontrado: {archivo_entrada}")
-            
-            self.log_estado("📖 Leyendo archivo Excel con doble encabezado...")
-            
-            df = pd.read_excel(archivo_entrada, engine='openpyxl', dtype=object, header=None)
+            bloques, columnas_info, notas_pago_encabezado = self._abrir_bloques(
+                archivo_entrada, modo_lectura, workers
+            )
+
+            destino = RegistroPagos() if columnar else []
+
+            if workers > 1:
+                pagos = self._procesar_bloques_paralelo(
+                    bloques, columnas_info, notas_pago_encabezado, workers, pagos=destino
+                )
+            elif archivo_checkpoint:
+                bloques = self._con_checkpoints(
+                    bloques, destino, archivo_checkpoint, archivo_entrada,
+                    checkpoint_bloques, checkpoint_segundos, resume
+                )
+                pagos = self._procesar_bloques(bloques, columnas_info, notas_pago_encabezado, pagos=destino)
+                # Corrida completa: el checkpoint ya no hace falta
+                Path(archivo_checkpoint).unlink(missing_ok=True)
+            else:
+                pagos = self._procesar_bloques(bloques, columnas_info, notas_pago_encabezado, pagos=destino)
+
+            if self.indice_boletas is not None:
+                pagos = self._aplicar_indice_boletas(pagos, archivo_entrada)
+
+            self.generar_reporte_final(pagos)
+            return pagos
+
+        except FileNotFoundError as e:
+            self.log_estado(f"❌ {e}", "error")
+            return []
+        except Exception as e:
+            self.log_estado(f"❌ Error fatal: {e}", "error")
+            import traceback
+            traceback.print_exc()
+            return []
+
+    def _iniciar_procesamiento(self, archivo_entrada: str, modo_lectura: str):
+        """Reinicia cachés y precálculos al comenzar una corrida."""
+        self.estadisticas['inicio_procesamiento'] = datetime.now()
+        if self.cache_normalizacion is not None:
+            self.cache_normalizacion.limpiar()
+        self._montos_precalculados = {}
+        self._fechas_precalculadas = {}
+        self._estudiantes_registrados = 0
+        self._claves_ejecucion = set()
+        self._huella_libro_indice = None
+        self.log_estado(f"🚀 Iniciando procesamiento V3.1", archivo=archivo_entrada, modo=modo_lectura)
+
+    def _abrir_bloques(
+        self,
+        archivo_entrada: str,
+        modo_lectura: str,
+        workers: int = 1
+    ) -> Tuple[Iterable[Tuple[int, Any]], List[Dict], Optional[str]]:
+        """
+        Abre la hoja según el modo de lectura.
+        Devuelve (bloques de estudiantes, columnas_info, notas_pago_encabezado).
+        """
+        archivo_path = Path(archivo_entrada)
+        if not archivo_path.exists():
+            raise FileNotFoundError(f"Archivo no encontrado: {archivo_entrada}")
+        
+        self.log_estado("📖 Leyendo archivo Excel con doble encabezado...")
+
+        if modo_lectura == 'streaming':
+            lector = self.leer_bloques_streaming(archivo_entrada)
+            if self.instrumentar:
+                lector = self._cronometrar_iterador('lectura', lector)
+            años_row, headers_row = next(lector)
+            bloques: Iterable[Tuple[int, Tuple]] = lector
+
+            self.log_estado(f"📋 Archivo abierto en modo streaming", columnas=len(headers_row))
+        else:
+            df = self._leer_hoja(archivo_entrada)
             
             if df.empty:
                 raise ValueError("El archivo Excel está vacío")
             
             años_row = df.iloc[0]
             headers_row = df.iloc[1]
+            # Los workers reciben arrays: se evita serializar una Series por fila
+            if modo_lectura == 'numpy' or workers > 1:
+                matriz = self._matriz_bloques(df)
+                bloques = self._bloques_ndarray(matriz)
+            else:
+                bloques = self._bloques_dataframe(df)
             
             self.log_estado(
                 f"📋 Archivo cargado",
                 filas_totales=len(df),
                 columnas=len(df.columns)
             )
-            
-            columnas_info = self._construir_mapa_columnas(años_row, headers_row)
-
-            notas_pago_encabezado = None
-            if self.COL_NOTAS_PAGO < len(años_row):
-                notas_pago_encabezado = self.limpiar_texto(años_row.iloc[self.COL_NOTAS_PAGO])
-            if not notas_pago_encabezado and self.COL_NOTAS_PAGO < len(headers_row):
-                notas_pago_encabezado = self.limpiar_texto(headers_row.iloc[self.COL_NOTAS_PAGO])
-            if notas_pago_encabezado:
-                normalized_label = notas_pago_encabezado.lower().replace(' ', '_')
-                if normalized_label in {'notas_de_pago', 'notas_pago'}:
-                    notas_pago_encabezado = None
-
-            pagos: List[Dict[str, Any]] = []
-            i = 2
-            n = len(df)
-            
-            while i < n:
+        
+        columnas_info = self._construir_mapa_columnas(años_row, headers_row)
+        notas_pago_encabezado = self._extraer_notas_pago_encabezado(años_row, headers_row)
+
+        if modo_lectura == 'numpy' and workers == 1:
+            self._precalcular_montos(matriz[:, 1, :], columnas_info)
+            self._precalcular_fechas(matriz[:, 2, :], columnas_info)
+
+        return bloques, columnas_info, notas_pago_encabezado
+
+    # ========== CHECKPOINTS ==========
+    def _con_checkpoints(
+        self,
+        bloques: Iterable[Tuple[int, Any]],
+        pagos: Any,
+        archivo_checkpoint: str,
+        archivo_entrada: str,
+        checkpoint_bloques: Optional[int],
+        checkpoint_segundos: Optional[float],
+        resume: bool
+    ) -> Iterator[Tuple[int, Any]]:
+        """
+        ✅ Envuelve la secuencia de bloques y registra checkpoints entre bloques.
+
+        El checkpoint es un diario de solo agregado: un encabezado (versión y
+        huella del archivo de entrada) seguido de un registro por checkpoint con
+        la fila del próximo bloque y lo nuevo desde el anterior: pagos y delta
+        de estadísticas (ver _delta_estadisticas), así el diario crece en
+        proporción a la entrada. _procesar_bloques termina un bloque antes de
+        pedir el siguiente, así que al pedir el bloque i todo lo anterior ya
+        está en pagos.
+        """
+        if checkpoint_bloques is None and checkpoint_segundos is None:
+            checkpoint_bloques = CHECKPOINT_BLOQUES_POR_DEFECTO
+
+        huella = _sha256_archivo(archivo_entrada).hexdigest()
+        siguiente_fila = self._reanudar_checkpoint(archivo_checkpoint, huella, pagos) if resume else None
+
+        if siguiente_fila is None:
+            with open(archivo_checkpoint, 'wb') as f:
+                pickle.dump({'version': VERSION_CHECKPOINT, 'huella_archivo': huella}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        pagos_guardados = len(pagos)
+        estadisticas_guardadas = self._instantanea_estadisticas(self.estadisticas)
+        bloques_desde_checkpoint = 0
+        ultimo_checkpoint = time.monotonic()
+
+        for i, filas in bloques:
+            if siguiente_fila is not None and i < siguiente_fila:
+                continue
+
+            vence_bloques = checkpoint_bloques is not None and bloques_desde_checkpoint >= checkpoint_bloques
+            vence_tiempo = (
+                checkpoint_segundos is not None and bloques_desde_checkpoint
+                and time.monotonic() - ultimo_checkpoint >= checkpoint_segundos
+            )
+            if vence_bloques or vence_tiempo:
+                self._guardar_checkpoint(archivo_checkpoint, i, pagos, pagos_guardados, estadisticas_guardadas)
+                pagos_guardados = len(pagos)
+                estadisticas_guardadas = self._instantanea_estadisticas(self.estadisticas)
+                bloques_desde_checkpoint = 0
+                ultimo_checkpoint = time.monotonic()
+
+            bloques_desde_checkpoint += 1
+            yield i, filas
+
+    def _guardar_checkpoint(
+        self,
+        archivo_checkpoint: str,
+        siguiente_fila: int,
+        pagos: Any,
+        desde: int,
+        estadisticas_previas: Dict[str, Any]
+    ):
+        """Agrega un registro al diario y lo fuerza a disco."""
+        if isinstance(pagos, RegistroPagos):
+            nuevos = list(pagos.desde(desde))
+        else:
+            nuevos = pagos[desde:]
+
+        with open(archivo_checkpoint, 'ab') as f:
+            pickle.dump({
+                'siguiente_fila': siguiente_fila,
+                'pagos': nuevos,
+                'estadisticas': self._delta_estadisticas(self.estadisticas, estadisticas_previas),
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.log_estado(f"💾 Checkpoint guardado", fila=siguiente_fila + 1, pagos=len(pagos))
+
+    def _reanudar_checkpoint(self, archivo_checkpoint: str, huella: str, pagos: Any) -> Optional[int]:
+        """
+        Carga el diario en pagos y self.estadisticas; devuelve la fila desde la
+        que se continúa, o None si no hay un checkpoint válido para este archivo.
+        Un último registro truncado (corte durante la escritura) se descarta.
+        """
+        ruta = Path(archivo_checkpoint)
+        if not ruta.exists():
+            self.log_estado("ℹ️ Sin checkpoint previo: se procesa desde el inicio")
+            return None
+
+        registros = []
+        with open(ruta, 'rb') as f:
+            while True:
                 try:
-                    if i + 3 >= n:
-                        self.log_estado(f"⚠️ Bloque incompleto al final", "warning", fila=i+1)
-                        break
-                    
-                    row_datos_principales = df.iloc[i]
-                    row_cantidades = df.iloc[i + 1]
-                    row_fechas = df.iloc[i + 2]
-                    row_bancos = df.iloc[i + 3]
-                    
-                    carnet_val = row_datos_principales.iloc[self.COL_CARNE]
-                    
-                    if self._is_empty(carnet_val):
-                        i += 4
-                        continue
-                    
-                    carnet = self.limpiar_texto(carnet_val)
-                    if not carnet:
-                        i += 4
-                        continue
-                    
-                    # ✅ NORMALIZAR CARNÉ (aplicar reglas: quitar espacios, AMS→ASM, eliminar guiones)
-                    carnet = self.normalizar_carnet(carnet)
-                    
-                    if not self._es_carnet_valido(carnet):
-                        self.log_estado(f"⚠️ Carné inválido", "debug", carnet=carnet, fila=i+1)
-                        i += 4
-                        continue
-                    
-                    if carnet in self.estadisticas['carnets_procesados']:
-                        self.estadisticas['carnets_duplicados'][carnet] += 1
-                        self.log_estado(
-                            f"ℹ️ Carné duplicado (puede ser múltiples programas)",
-                            "info",
-                            carnet=carnet,
-                            ocurrencias=self.estadisticas['carnets_duplicados'][carnet] + 1
-                        )
-                    
-                    self.estadisticas['carnets_procesados'].add(carnet)
-                    
-                    nombre = self.limpiar_texto(row_datos_principales.iloc[self.COL_NOMBRE]) or "Sin nombre"
-                    plan_raw = row_datos_principales.iloc[self.COL_PLAN]
-                    plan_estudios = self.obtener_programa(plan_raw)
-                    
-                    asesor = self.limpiar_texto(row_datos_principales.iloc[self.COL_ASESOR])
-                    empresa = self.limpiar_texto(row_datos_principales.iloc[self.COL_EMPRESA])
-                    telefono = self.limpiar_texto(row_datos_principales.iloc[self.COL_TELEFONO])
-
-                    notas_pago_raw = (
-                        row_datos_principales.iloc[self.COL_NOTAS_PAGO]
-                        if self.COL_NOTAS_PAGO < len(row_datos_principales)
-                        else None
-                    )
-                    notas_pago = self.limpiar_texto(notas_pago_raw)
-                    if not notas_pago:
-                        notas_pago = notas_pago_encabezado
-
-                    nomenclatura_raw = (
-                        row_datos_principales.iloc[self.COL_NOMENCLATURA]
-                        if self.COL_NOMENCLATURA < len(row_datos_principales)
-                        else None
-                    )
-                    nomenclatura = self.limpiar_texto(nomenclatura_raw)
+                    registros.append(pickle.load(f))
+                except EOFError:
+                    break
+                except (pickle.UnpicklingError, ValueError, AttributeError):
+                    self.log_estado("⚠️ Último registro del checkpoint incompleto, se descarta", "warning")
+                    break
+
+        if not registros or registros[0].get('version') != VERSION_CHECKPOINT:
+            self.log_estado("⚠️ Checkpoint de otra versión, se procesa desde el inicio", "warning")
+            return None
+        if registros[0].get('huella_archivo') != huella:
+            self.log_estado("⚠️ El archivo de entrada cambió desde el checkpoint, se procesa desde el inicio", "warning")
+            return None
+
+        avances = registros[1:]
+        if not avances:
+            return None
+
+        # Se reescribe el diario sin el registro truncado antes de seguir agregando
+        with open(ruta, 'wb') as f:
+            for registro in registros:
+                pickle.dump(registro, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        for avance in avances:
+            pagos.extend(avance['pagos'])
+            self._fusionar_estadisticas(avance['estadisticas'])
+
+        siguiente_fila = avances[-1]['siguiente_fila']
+        self.log_estado(f"▶️ Reanudando desde checkpoint", fila=siguiente_fila + 1, pagos=len(pagos))
+        return siguiente_fila
+
+    @staticmethod
+    def _instantanea_estadisticas(estadisticas: Dict[str, Any]) -> Dict[str, Any]:
+        """Copia liviana para _delta_estadisticas: de las listas basta el largo."""
+        return {
+            clave: len(valor) if isinstance(valor, list)
+            else set(valor) if isinstance(valor, set)
+            else dict(valor) if isinstance(valor, dict)
+            else valor
+            for clave, valor in estadisticas.items()
+        }
+
+    @staticmethod
+    def _delta_estadisticas(estadisticas: Dict[str, Any], previas: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Lo acumulado desde la instantánea previas, en el formato que suma
+        _fusionar_estadisticas: contadores restados, elementos nuevos de
+        conjuntos y colas nuevas de listas (las listas solo crecen).
+        """
+        delta = {}
+        for clave, valor in estadisticas.items():
+            if clave == 'inicio_procesamiento' or isinstance(valor, bool):
+                continue
+            previo = previas.get(clave)
+
+            if isinstance(valor, set):
+                delta[clave] = valor - (previo or set())
+            elif isinstance(valor, dict):
+                previo = previo or {}
+                delta[clave] = {k: v - previo.get(k, 0) for k, v in valor.items() if v != previo.get(k, 0)}
+            elif isinstance(valor, list):
+                delta[clave] = valor[previo or 0:]
+            elif isinstance(valor, (int, float)):
+                delta[clave] = valor - (previo or 0)
+        return delta
+
+    def _procesar_bloques(
+        self,
+        bloques: Iterable[Tuple[int, Tuple]],
+        columnas_info: List[Dict],
+        notas_pago_encabezado: Optional[str],
+        pagos: Optional[Any] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Procesa una secuencia de bloques (fila_inicio, 4 filas) de estudiantes.
+        pagos: destino opcional (lista o RegistroPagos) donde se acumulan los pagos.
+        """
+        if pagos is None:
+            pagos = []
+
+        for i, filas in bloques:
+            try:
+                pagos.extend(
+                    self._procesar_bloque_estudiante(i, filas, columnas_info, notas_pago_encabezado)
+                )
+            except Exception as e:
+                self.log_estado(f"❌ Error en bloque", "error", fila=i+1, error=str(e)[:200])
+                self.estadisticas['errores'] += 1
+                self.estadisticas['filas_problematicas'].append(i+1)
+
+        return pagos
+
+    def _procesar_bloques_paralelo(
+        self,
+        bloques: Iterable[Tuple[int, Tuple]],
+        columnas_info: List[Dict],
+        notas_pago_encabezado: Optional[str],
+        workers: int,
+        bloques_por_tarea: int = 500,
+        pagos: Optional[Any] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        ✅ Reparte los bloques de estudiantes en lotes contiguos entre un pool de procesos.
+        Cada worker usa su propio procesador; los resultados se incorporan en el
+        orden original y sus estadísticas se fusionan en las del procesador actual.
+        """
+        if pagos is None:
+            pagos = []
+        pendientes = deque()
+
+        self.log_estado(f"⚙️ Procesamiento paralelo", workers=workers, bloques_por_tarea=bloques_por_tarea)
+
+        def incorporar(futuro):
+            pagos_lote, estadisticas_lote = futuro.result()
+            pagos.extend(pagos_lote)
+            self._fusionar_estadisticas(estadisticas_lote)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            lote: List[Tuple[int, Tuple]] = []
+
+            for bloque in bloques:
+                lote.append(bloque)
+                if len(lote) < bloques_por_tarea:
+                    continue
+
+                pendientes.append(pool.submit(
+                    _procesar_lote_bloques, type(self), lote, columnas_info,
+                    notas_pago_encabezado, self._opciones_worker()
+                ))
+                lote = []
+
+                # Limitar los lotes en vuelo para acotar la memoria
+                if len(pendientes) >= workers * 2:
+                    incorporar(pendientes.popleft())
+
+            if lote:
+                pendientes.append(pool.submit(
+                    _procesar_lote_bloques, type(self), lote, columnas_info,
+                    notas_pago_encabezado, self._opciones_worker()
+                ))
+
+            while pendientes:
+                incorporar(pendientes.popleft())
+
+        return pagos
+
+    def _opciones_worker(self) -> Dict[str, Any]:
+        """Argumentos del constructor para replicar este procesador en un worker."""
+        return {
+            'log_level': self.log_level,
+            'tamaño_bloque': self.TAMAÑO_BLOQUE,
+            'usar_cache': self.cache_normalizacion is not None,
+            'tamaño_cache': self.tamaño_cache,
+            # Cada lote cuenta sus estudiantes desde cero: 'auto' pasa a resumen
+            'verbosidad_estudiantes': 'resumen' if self.verbosidad_estudiantes == 'auto' else self.verbosidad_estudiantes,
+            'eventos': self.eventos,
+            'instrumentar': self.instrumentar,
+        }
+
+    def _fusionar_estadisticas(self, otras: Dict[str, Any]):
+        """
+        Acumula en self.estadisticas las de otro procesador (worker, lote o archivo).
+        Contadores y diccionarios se suman, conjuntos se unen y listas se concatenan.
+        """
+        propias = self.estadisticas
+
+        # Un carné ya visto en lotes anteriores cuenta como un duplicado más
+        for carnet in otras.get('carnets_procesados', set()) & propias['carnets_procesados']:
+            propias['carnets_duplicados'][carnet] += 1
+
+        for clave, valor in otras.items():
+            if clave == 'inicio_procesamiento' or isinstance(valor, bool):
+                continue
+
+            actual = propias.get(clave)
+
+            if isinstance(valor, set):
+                propias[clave] = (actual or set()) | valor
+            elif isinstance(valor, dict):
+                if actual is None:
+                    actual = propias[clave] = defaultdict(int)
+                for k, v in valor.items():
+                    actual[k] = actual.get(k, 0) + v
+            elif isinstance(valor, list):
+                propias[clave] = (actual or []) + valor
+            elif isinstance(valor, (int, float)):
+                propias[clave] = (actual or 0) + valor
+
+    @cronometrado('estudiante')
+    def _procesar_bloque_estudiante(
+        self,
+        i: int,
+        filas: Tuple,
+        columnas_info: List[Dict],
+        notas_pago_encabezado: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Extrae los pagos de un bloque de 4 filas (datos / cantidades / fechas / bancos).
+        Las filas pueden ser Series, tuplas o arrays: se indexan por posición.
+        """
+        row_datos_principales, row_cantidades, row_fechas, row_bancos = filas
+
+        carnet_val = row_datos_principales[self.COL_CARNE]
+        
+        if self._is_empty(carnet_val):
+            return []
+        
+        carnet = self.limpiar_texto(carnet_val)
+        if not carnet:
+            return []
+        
+        # ✅ NORMALIZAR CARNÉ (aplicar reglas: quitar espacios, AMS→ASM, eliminar guiones)
+        carnet_texto = carnet
+        carnet = self.normalizar_carnet(carnet)
+        self._fila_actual = i
+        if self.eventos is not None and carnet != carnet_texto.upper():
+            self.eventos.emitir(
+                'carnet_normalizado', fila=i + 1, columna=self.COL_CARNE, carnet=carnet,
+                valor_crudo=carnet_val, valor_normalizado=carnet
+            )
+        
+        if not self._es_carnet_valido(carnet):
+            self.log_estado(f"⚠️ Carné inválido", "debug", carnet=carnet, fila=i+1)
+            return []
+        
+        detalle = self._detalle_estudiante()
+        self._estudiantes_registrados += 1
+        
+        if carnet in self.estadisticas['carnets_procesados']:
+            self.estadisticas['carnets_duplicados'][carnet] += 1
+            if detalle:
+                self.log_estado(
+                    f"ℹ️ Carné duplicado (puede ser múltiples programas)",
+                    "info",
+                    carnet=carnet,
+                    ocurrencias=self.estadisticas['carnets_duplicados'][carnet] + 1
+                )
+        
+        self.estadisticas['carnets_procesados'].add(carnet)
+        
+        nombre = self.limpiar_texto(row_datos_principales[self.COL_NOMBRE]) or "Sin nombre"
+        plan_raw = row_datos_principales[self.COL_PLAN]
+        plan_estudios = self.obtener_programa(plan_raw)
+        if self.eventos is not None and plan_estudios == "TEMP" and not self._is_empty(plan_raw):
+            self.eventos.emitir(
+                'plan_no_mapeado', fila=i + 1, columna=self.COL_PLAN, carnet=carnet,
+                valor_crudo=plan_raw, valor_normalizado=plan_estudios
+            )
+        
+        asesor = self.limpiar_texto(row_datos_principales[self.COL_ASESOR])
+        empresa = self.limpiar_texto(row_datos_principales[self.COL_EMPRESA])
+        telefono = self.limpiar_texto(row_datos_principales[self.COL_TELEFONO])
 
-                    estatus_raw = (
-                        row_datos_principales.iloc[self.COL_ESTATUS]
-                        if self.COL_ESTATUS < len(row_datos_principales)
-                        else None
-                    )
-                    estatus = self.normalizar_estatus(estatus_raw)
+        notas_pago_raw = (
+            row_datos_principales[self.COL_NOTAS_PAGO]
+            if self.COL_NOTAS_PAGO < len(row_datos_principales)
+            else None
+        )
+        notas_pago = self.limpiar_texto(notas_pago_raw)
+        if not notas_pago:
+            notas_pago = notas_pago_encabezado
 
-                    if estatus == "Inactivo":
-                        self.estadisticas['estudiantes_inactivos'] += 1
-                    elif estatus == "GRADUADO":
-                        self.estadisticas['estudiantes_graduados'] += 1
-                    else:
-                        self.estadisticas['estudiantes_activos'] += 1
+        nomenclatura_raw = (
+            row_datos_principales[self.COL_NOMENCLATURA]
+            if self.COL_NOMENCLATURA < len(row_datos_principales)
+            else None
+        )
+        nomenclatura = self.limpiar_texto(nomenclatura_raw)
 
-                    mail = self.limpiar_texto(row_datos_principales.iloc[self.COL_MAIL])
-                    mes_inicio = self.limpiar_texto(row_datos_principales.iloc[self.COL_MES_INICIO])
-                    valor_total = self.limpiar_monto(row_datos_principales.iloc[self.COL_VALOR_TOTAL])
+        estatus_raw = (
+            row_datos_principales[self.COL_ESTATUS]
+            if self.COL_ESTATUS < len(row_datos_principales)
+            else None
+        )
+        estatus = self.normalizar_estatus(estatus_raw)
 
-                    self.log_estado(
-                        f"👤 Procesando",
-                        carnet=carnet,
-                        nombre=nombre[:30],
-                        plan=plan_estudios,
-                        estatus=estatus
-                    )
+        if estatus == "Inactivo":
+            self.estadisticas['estudiantes_inactivos'] += 1
+        elif estatus == "GRADUADO":
+            self.estadisticas['estudiantes_graduados'] += 1
+        else:
+            self.estadisticas['estudiantes_activos'] += 1
 
-                    pagos_estudiante: List[Dict[str, Any]] = []
-
-                    pagos_estudiante.extend(
-                        self._procesar_columnas_especiales(
-                            row_datos_principales,
-                            row_cantidades,
-                            row_fechas,
-                            row_bancos,
-                            carnet,
-                            nombre,
-                            plan_estudios,
-                            estatus,
-                            notas_pago,
-                            nomenclatura
-                        )
-                    )
+        mail = self.limpiar_texto(row_datos_principales[self.COL_MAIL])
+        mes_inicio = self.limpiar_texto(row_datos_principales[self.COL_MES_INICIO])
+        valor_total = self.limpiar_monto(row_datos_principales[self.COL_VALOR_TOTAL])
 
-                    pagos_estudiante.extend(
-                        self._procesar_columnas_meses(
-                            row_datos_principales,
-                            row_cantidades,
-                            row_fechas,
-                            row_bancos,
-                            columnas_info,
-                            carnet,
-                            nombre,
-                            plan_estudios,
-                            estatus,
-                            notas_pago,
-                            nomenclatura,
-                            mes_inicio
-                        )
-                    )
-                    
-                    pagos.extend(pagos_estudiante)
-                    self.estadisticas['estudiantes_procesados'] += 1
-                    
-                    if not pagos_estudiante:
-                        self.estadisticas['estudiantes_sin_pagos'] += 1
-                        self.log_estado(f"⚠️ Sin pagos válidos", "warning", carnet=carnet)
-                    else:
-                        self.log_estado(
-                            f"✅ Procesado exitosamente",
-                            carnet=carnet,
-                            pagos=len(pagos_estudiante)
-                        )
-                    
-                    i += 4
+        if detalle:
+            self.log_estado(
+                f"👤 Procesando",
+                carnet=carnet,
+                nombre=nombre[:30],
+                plan=plan_estudios,
+                estatus=estatus
+            )
 
-                except Exception as e:
-                    self.log_estado(f"❌ Error en bloque", "error", fila=i+1, error=str(e)[:200])
-                    self.estadisticas['errores'] += 1
-                    self.estadisticas['filas_problematicas'].append(i+1)
-                    i += 4
-                    continue
+        pagos_estudiante: List[Dict[str, Any]] = []
 
-            self.generar_reporte_final(pagos)
-            return pagos
+        pagos_estudiante.extend(
+            self._procesar_columnas_especiales(
+                row_datos_principales,
+                row_cantidades,
+                row_fechas,
+                row_bancos,
+                carnet,
+                nombre,
+                plan_estudios,
+                estatus,
+                notas_pago,
+                nomenclatura
+            )
+        )
 
-        except FileNotFoundError as e:
-            self.log_estado(f"❌ {e}", "error")
-            return []
-        except Exception as e:
-            self.log_estado(f"❌ Error fatal: {e}", "error")
-            import traceback
-            traceback.print_exc()
-            return []
+        pagos_estudiante.extend(
+            self._procesar_columnas_meses(
+                row_datos_principales,
+                row_cantidades,
+                row_fechas,
+                row_bancos,
+                columnas_info,
+                carnet,
+                nombre,
+                plan_estudios,
+                estatus,
+                notas_pago,
+                nomenclatura,
+                mes_inicio
+            )
+        )
+        
+        self.estadisticas['estudiantes_procesados'] += 1
+        
+        if not pagos_estudiante:
+            self.estadisticas['estudiantes_sin_pagos'] += 1
+            self.log_estado(f"⚠️ Sin pagos válidos", "warning", carnet=carnet)
+        elif detalle:
+            self.log_estado(
+                f"✅ Procesado exitosamente",
+                carnet=carnet,
+                pagos=len(pagos_estudiante)
+            )
+
+        if not detalle:
+            self._log_avance_estudiantes()
 
+        return pagos_estudiante
+
+    @cronometrado('mapa_columnas')
     def _construir_mapa_columnas(self, años_row, headers_row) -> List[Dict]:
         """Construye un mapa de columnas con información de año y mes."""
         columnas_info = []
         año_actual = None
         
         for idx in range(len(headers_row)):
-            año_celda = años_row.iloc[idx] if idx < len(años_row) else None
-            header_celda = headers_row.iloc[idx] if idx < len(headers_row) else None
+            año_celda = años_row[idx] if idx < len(años_row) else None
+            header_celda = headers_row[idx] if idx < len(headers_row) else None
             
             if not self._is_empty(año_celda):
                 try:
@@ -1030,6 +3278,7 @@ class ExcelPaymentProcessorV3:
         
         return columnas_info
 
+    @cronometrado('columnas_especiales')
     def _procesar_columnas_especiales(
         self,
         row_datos,
@@ -1058,16 +3307,16 @@ class ExcelPaymentProcessorV3:
             try:
                 idx_inicio = col_especial['inicio']
                 
-                boleta_raw = row_datos.iloc[idx_inicio] if idx_inicio < len(row_datos) else None
+                boleta_raw = row_datos[idx_inicio] if idx_inicio < len(row_datos) else None
                 boletas = self.extraer_valores_multiples(boleta_raw)
                 
-                monto_raw = row_cantidades.iloc[idx_inicio] if idx_inicio < len(row_cantidades) else None
+                monto_raw = row_cantidades[idx_inicio] if idx_inicio < len(row_cantidades) else None
                 montos = self.extraer_valores_multiples(monto_raw)
                 
-                fecha_raw = row_fechas.iloc[idx_inicio] if idx_inicio < len(row_fechas) else None
+                fecha_raw = row_fechas[idx_inicio] if idx_inicio < len(row_fechas) else None
                 fechas = self.extraer_valores_multiples(fecha_raw)
                 
-                banco_raw = row_bancos.iloc[idx_inicio] if idx_inicio < len(row_bancos) else None
+                banco_raw = row_bancos[idx_inicio] if idx_inicio < len(row_bancos) else None
                 bancos = self.extraer_valores_multiples(banco_raw)
                 
                 if not self._validar_balance_pagos_multiples(
@@ -1079,13 +3328,24 @@ class ExcelPaymentProcessorV3:
                         carnet=carnet,
                         concepto=col_especial['nombre']
                     )
+                    longitudes_previas = (len(boletas), len(montos), len(fechas), len(bancos))
                     boletas, montos, fechas, bancos = self._auto_reconciliar_pagos_multiples(
                         boletas, montos, fechas, bancos, carnet, col_especial['nombre']
                     )
+                    if self.eventos is not None:
+                        self.eventos.emitir(
+                            'pago_multiple_reconciliado', fila=self._fila_actual + 1, columna=idx_inicio,
+                            carnet=carnet, valor_crudo=boleta_raw, valor_normalizado=boletas,
+                            concepto=col_especial['nombre'], longitudes_previas=longitudes_previas,
+                            longitudes=(len(boletas), len(montos), len(fechas), len(bancos))
+                        )
                 
                 max_items = max(len(boletas), len(montos), len(fechas), len(bancos))
                 
                 for i in range(max_items):
+                    if self.eventos is not None:
+                        invalidos_previos = self.estadisticas['montos_invalidos']
+                        fallidas_previas = self.estadisticas['fechas_fallidas']
                     boleta = boletas[i] if i < len(boletas) else None
                     monto = self.limpiar_monto(montos[i]) if i < len(montos) else None
                     fecha = self.parse_fecha_mejorada(
@@ -1093,6 +3353,12 @@ class ExcelPaymentProcessorV3:
                         año_contexto=2020
                     )
                     banco = self.detectar_banco(bancos[i]) if i < len(bancos) else "No especificado"
+                    if self.eventos is not None:
+                        self._emitir_eventos_valores(
+                            idx_inicio, carnet, invalidos_previos, fallidas_previas,
+                            montos[i] if i < len(montos) else None,
+                            fechas[i] if i < len(fechas) else None
+                        )
                     
                     if boleta and monto:
                         pago = {
@@ -1125,6 +3391,7 @@ class ExcelPaymentProcessorV3:
         
         return pagos
 
+    @cronometrado('columnas_meses')
     def _procesar_columnas_meses(
         self,
         row_datos,
@@ -1152,16 +3419,16 @@ class ExcelPaymentProcessorV3:
                 mes_nombre = col_info['nombre']
                 mes_numero = col_info['mes_numero']
                 
-                boleta_raw = row_datos.iloc[idx] if idx < len(row_datos) else None
+                boleta_raw = row_datos[idx] if idx < len(row_datos) else None
                 boletas = self.extraer_valores_multiples(boleta_raw)
                 
-                monto_raw = row_cantidades.iloc[idx] if idx < len(row_cantidades) else None
+                monto_raw = row_cantidades[idx] if idx < len(row_cantidades) else None
                 montos = self.extraer_valores_multiples(monto_raw)
                 
-                fecha_raw = row_fechas.iloc[idx] if idx < len(row_fechas) else None
+                fecha_raw = row_fechas[idx] if idx < len(row_fechas) else None
                 fechas = self.extraer_valores_multiples(fecha_raw)
                 
-                banco_raw = row_bancos.iloc[idx] if idx < len(row_bancos) else None
+                banco_raw = row_bancos[idx] if idx < len(row_bancos) else None
                 bancos = self.extraer_valores_multiples(banco_raw)
                 
                 if not self._validar_balance_pagos_multiples(
@@ -1173,13 +3440,24 @@ class ExcelPaymentProcessorV3:
                         carnet=carnet,
                         concepto=f"Mes {mes_nombre}"
                     )
+                    longitudes_previas = (len(boletas), len(montos), len(fechas), len(bancos))
                     boletas, montos, fechas, bancos = self._auto_reconciliar_pagos_multiples(
                         boletas, montos, fechas, bancos, carnet, f"Mes {mes_nombre}"
                     )
+                    if self.eventos is not None:
+                        self.eventos.emitir(
+                            'pago_multiple_reconciliado', fila=self._fila_actual + 1, columna=idx,
+                            carnet=carnet, valor_crudo=boleta_raw, valor_normalizado=boletas,
+                            concepto=f"Mes {mes_nombre}", longitudes_previas=longitudes_previas,
+                            longitudes=(len(boletas), len(montos), len(fechas), len(bancos))
+                        )
                 
                 max_items = max(len(boletas), len(montos), len(fechas), len(bancos))
                 
                 for i in range(max_items):
+                    if self.eventos is not None:
+                        invalidos_previos = self.estadisticas['montos_invalidos']
+                        fallidas_previas = self.estadisticas['fechas_fallidas']
                     boleta = boletas[i] if i < len(boletas) else None
                     monto = self.limpiar_monto(montos[i]) if i < len(montos) else None
                     fecha_str = fechas[i] if i < len(fechas) else None
@@ -1191,6 +3469,11 @@ class ExcelPaymentProcessorV3:
                         mes_nombre=mes_nombre,
                         año_columna=año_col
                     )
+                    if self.eventos is not None:
+                        self._emitir_eventos_valores(
+                            idx, carnet, invalidos_previos, fallidas_previas,
+                            montos[i] if i < len(montos) else None, fecha_str
+                        )
                     
                     if boleta and monto:
                         pago = {
@@ -1225,141 +3508,1118 @@ class ExcelPaymentProcessorV3:
         
         return pagos
 
-    def _es_carnet_valido(self, carnet: str) -> bool:
-        """Valida formato de carné."""
-        if not carnet or len(carnet) < 5 or len(carnet) > 20:
-            return False
-        if not re.search(r'\d', carnet):
-            return False
-        if carnet.isdigit():
-            return False
-        if not carnet[0].isalpha():
-            return False
-        return True
+    def _emitir_eventos_valores(
+        self,
+        columna: int,
+        carnet: str,
+        invalidos_previos: int,
+        fallidas_previas: int,
+        monto_raw: Any,
+        fecha_raw: Any
+    ):
+        """
+        Emite los eventos de monto rechazado y fecha no parseada de una celda.
+        Se detectan por el cambio en los contadores, que también se aplica cuando
+        el resultado viene de la caché o de un precálculo; el motivo del rechazo
+        sale de _clasificar_monto, el mismo núcleo que usa limpiar_monto.
+        """
+        fila = self._fila_actual
+        if self.estadisticas['montos_invalidos'] > invalidos_previos:
+            _, estado = self._clasificar_monto(monto_raw)
+            evento = EVENTOS_MONTO_RECHAZADO.get(estado, 'monto_invalido')
+            self.eventos.emitir(evento, fila=fila + 2, columna=columna, carnet=carnet, valor_crudo=monto_raw)
+        if self.estadisticas['fechas_fallidas'] > fallidas_previas:
+            self.eventos.emitir(
+                'fecha_no_parseada', fila=fila + 3, columna=columna, carnet=carnet, valor_crudo=fecha_raw
+            )
+
+    def _es_carnet_valido(self, carnet: str) -> bool:
+        """Valida formato de carné."""
+        if not carnet or len(carnet) < 5 or len(carnet) > 20:
+            return False
+        if not re.search(r'\d', carnet):
+            return False
+        if carnet.isdigit():
+            return False
+        if not carnet[0].isalpha():
+            return False
+        return True
+
+    # ========== GENERACIÓN DE ARCHIVOS ==========
+    def generar_excel_normalizado_en_bloques(
+        self,
+        pagos: Iterable[Dict[str, Any]],
+        archivo_salida: str,
+        formatos: Tuple[str, ...] = ('excel',),
+        motor_excel: str = 'openpyxl',
+        write_workers: int = 1
+    ) -> List[str]:
+        """
+        ✅ MEJORADO: Genera archivos preservando integridad de estudiantes.
+
+        formatos: cualquier combinación de 'excel' (bloques .xlsx), 'parquet' y
+        'arrow' (un solo archivo tipado junto a los bloques, requiere pyarrow).
+        motor_excel: 'openpyxl' (hoja completa en memoria) o 'streaming'
+        (filas tomadas directo de los pagos y escritas en memoria constante con
+        xlsxwriter, ver EscritorExcelStreaming). Ambos miden los anchos con largo_celda.
+        write_workers: procesos que serializan bloques .xlsx a la vez; los nombres
+        y el orden de archivos_generados no cambian.
+        """
+        formatos_invalidos = set(formatos) - set(FORMATOS_SALIDA)
+        if formatos_invalidos:
+            raise ValueError(f"Formatos de salida no soportados: {sorted(formatos_invalidos)}")
+        if motor_excel not in MOTORES_EXCEL:
+            raise ValueError(f"Motor de escritura no soportado: {motor_excel}. Use uno de {MOTORES_EXCEL}")
+
+        if not pagos:
+            self.log_estado("⚠️ No hay pagos para exportar", "warning")
+            return []
+
+        try:
+            # El motor streaming escribe desde los pagos: el DataFrame solo se
+            # arma si lo necesitan el motor openpyxl o los formatos columnares
+            df_export = None
+            if motor_excel != 'streaming' or any(f in EXTENSIONES_COLUMNARES for f in formatos):
+                df_export = self._preparar_df_export(pagos)
+            
+            archivos_generados = []
+            archivo_path = Path(archivo_salida)
+            nombre_base = archivo_path.stem
+            extension = archivo_path.suffix
+            directorio = archivo_path.parent
+            
+            for formato in formatos:
+                if formato in EXTENSIONES_COLUMNARES:
+                    ruta_columnar = directorio / f"{nombre_base}{EXTENSIONES_COLUMNARES[formato]}"
+                    self.generar_archivo_columnar(df_export, ruta_columnar, formato)
+                    archivos_generados.append(str(ruta_columnar))
+            
+            if 'excel' not in formatos:
+                return archivos_generados
+            
+            # ✅ DIVISIÓN INTELIGENTE POR ESTUDIANTE
+            # Los pagos ya están ordenados por carné: cada estudiante ocupa un
+            # rango contiguo de filas y los bloques se cortan como rebanadas.
+            if motor_excel == 'streaming':
+                columnas, carnets, tomar_bloque = self._pagos_ordenados_export(pagos)
+            else:
+                columnas, carnets = None, df_export['carnet']
+                tomar_bloque = lambda inicio, fin: df_export.iloc[inicio:fin]
+            total_registros = len(carnets)
+            bloques = self._particionar_por_estudiante(carnets)
+            total_carnets = sum(num_estudiantes for _, _, num_estudiantes in bloques)
+            num_bloques = len(bloques)
+            
+            self.log_estado(
+                f"📦 Preparando división en bloques",
+                total_registros=total_registros,
+                total_carnets=total_carnets,
+                tamaño_bloque=self.TAMAÑO_BLOQUE
+            )
+            
+            self.log_estado(
+                f"✅ División optimizada",
+                bloques=num_bloques,
+                promedio_estudiantes_por_bloque=total_carnets // num_bloques if num_bloques > 0 else 0
+            )
+            
+            tareas = []
+            for i, (inicio, fin, num_estudiantes) in enumerate(bloques):
+                if num_bloques > 1:
+                    nombre_archivo = f"{nombre_base}_parte_{i+1}_de_{num_bloques}{extension}"
+                else:
+                    nombre_archivo = f"{nombre_base}{extension}"
+                
+                ruta_archivo = directorio / nombre_archivo
+                
+                if ruta_archivo.exists():
+                    ruta_archivo.unlink()
+                
+                tareas.append((inicio, fin, ruta_archivo, num_estudiantes))
+            
+            # Cada bloque se toma recién al escribirlo
+            trabajos = (
+                (tomar_bloque(inicio, fin), ruta_archivo) for inicio, fin, ruta_archivo, _ in tareas
+            )
+            inicio_escritura = time.perf_counter()
+            if write_workers > 1 and num_bloques > 1:
+                tiempos = self._escribir_bloques_paralelo(trabajos, motor_excel, write_workers, columnas)
+            else:
+                tiempos = (
+                    _escribir_bloque_cronometrado(bloque, ruta_archivo, motor_excel, columnas)
+                    for bloque, ruta_archivo in trabajos
+                )
+            
+            # Los resultados llegan en el orden de los bloques, aun en paralelo
+            for i, ((inicio, fin, ruta_archivo, num_estudiantes), segundos) in enumerate(zip(tareas, tiempos)):
+                archivos_generados.append(str(ruta_archivo))
+                self.estadisticas['bloques_generados'] += 1
+                self.estadisticas['tiempos_escritura'].append(segundos)
+                if self.instrumentar:
+                    self._registrar_etapa('escritura_bloque', segundos)
+                
+                self.log_estado(
+                    f"✅ Bloque {i+1}/{num_bloques} guardado",
+                    archivo=ruta_archivo.name,
+                    registros=fin - inicio,
+                    estudiantes=num_estudiantes,
+                    segundos=round(segundos, 3)
+                )
+            
+            self.log_estado(
+                f"⏱️ Escritura de bloques completada",
+                bloques=num_bloques,
+                write_workers=write_workers,
+                segundos=round(time.perf_counter() - inicio_escritura, 3)
+            )
+            
+            return archivos_generados
+            
+        except Exception as e:
+            self.log_estado(f"❌ Error guardando archivos: {e}", "error")
+            import traceback
+            traceback.print_exc()
+            return []
+
+    def _preparar_df_export(
+        self,
+        pagos: Iterable[Dict[str, Any]],
+        columnas: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        DataFrame de exportación ordenado por carné y fecha.
+        columnas: lista fija de columnas (las ausentes salen vacías); por defecto
+        solo las de COLUMNAS_EXPORT presentes en los pagos.
+        """
+        if isinstance(pagos, RegistroPagos):
+            df = pagos.to_dataframe()
+        else:
+            df = pd.DataFrame(pagos)
+        df['numero_boleta'] = df['numero_boleta'].astype(str)
+        df['monto'] = pd.to_numeric(df['monto'], errors='coerce')
+        with self._medir_etapa('ordenamiento'):
+            df = df.sort_values(['carnet', 'fecha_pago'], na_position='last')
+
+        if columnas is not None:
+            return df.reindex(columns=columnas)
+        return df[[c for c in COLUMNAS_EXPORT if c in df.columns]]
+
+    def _pagos_ordenados_export(self, pagos: Iterable[Dict[str, Any]]):
+        """
+        Orden de exportación sin armar un DataFrame, para el motor streaming.
+        Devuelve (columnas, carnés en orden, tomar_bloque(inicio, fin)), donde
+        tomar_bloque entrega los pagos de esas filas; de un RegistroPagos se
+        materializan solo los del bloque.
+        """
+        with self._medir_etapa('ordenamiento'):
+            if isinstance(pagos, RegistroPagos):
+                presentes = pagos.columnas()
+                orden = pagos.orden_exportacion()
+                ordenados = None
+            else:
+                ordenados = sorted(pagos, key=_clave_orden_pago)
+                presentes = set().union(*(pago.keys() for pago in ordenados))
+
+        if ordenados is None:
+            carnets = pd.Series([pago['carnet'] for pago in pagos.pagos_en(orden)], dtype=object)
+            tomar_bloque = lambda inicio, fin: list(pagos.pagos_en(orden[inicio:fin]))
+        else:
+            carnets = pd.Series([pago['carnet'] for pago in ordenados], dtype=object)
+            tomar_bloque = lambda inicio, fin: ordenados[inicio:fin]
+
+        columnas = [c for c in COLUMNAS_EXPORT if c in presentes]
+        return columnas, carnets, tomar_bloque
+
+    def _escribir_bloques_paralelo(
+        self,
+        trabajos: Iterable[Tuple[Union[pd.DataFrame, List[Dict[str, Any]]], Path]],
+        motor_excel: str,
+        write_workers: int,
+        columnas: Optional[List[str]] = None
+    ) -> Iterator[float]:
+        """
+        ✅ Serializa los bloques en un pool de procesos.
+        Entrega el tiempo de escritura de cada bloque en el orden original,
+        con a lo sumo write_workers * 2 bloques en vuelo.
+        """
+        pendientes = deque()
+
+        with ProcessPoolExecutor(max_workers=write_workers) as pool:
+            for bloque, ruta_archivo in trabajos:
+                pendientes.append(pool.submit(
+                    _escribir_bloque_cronometrado, bloque, ruta_archivo, motor_excel, columnas
+                ))
+                if len(pendientes) >= write_workers * 2:
+                    yield pendientes.popleft().result()
+
+            while pendientes:
+                yield pendientes.popleft().result()
+
+    def generar_archivo_columnar(self, df_export: pd.DataFrame, ruta_archivo: Path, formato: str = 'parquet') -> Path:
+        """
+        ✅ Escribe los pagos normalizados en Parquet o Arrow IPC con columnas tipadas:
+        fecha_pago date32, monto float64, año int32 y banco / concepto /
+        plan_estudios (y demás categorías) codificados como diccionario.
+        El archivo Arrow se puede abrir con memory-map (ver cargar_pagos_columnar).
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("La salida Parquet/Arrow requiere pyarrow: pip install pyarrow") from e
+
+        columnas = {}
+        for columna in df_export.columns:
+            serie = df_export[columna]
+            if columna == 'fecha_pago':
+                fechas = pd.to_datetime(serie, format='%Y-%m-%d', errors='coerce')
+                columnas[columna] = pa.array(fechas, from_pandas=True).cast(pa.date32())
+            elif columna == 'monto':
+                columnas[columna] = pa.array(serie.astype(np.float64), type=pa.float64(), from_pandas=True)
+            elif columna == 'año':
+                columnas[columna] = pa.array(serie.astype('Int32'), type=pa.int32(), from_pandas=True)
+            else:
+                valores = pa.array(serie.astype(object), type=pa.string(), from_pandas=True)
+                if columna in COLUMNAS_DICCIONARIO:
+                    valores = valores.dictionary_encode()
+                columnas[columna] = valores
+
+        tabla = pa.table(columnas)
+
+        if ruta_archivo.exists():
+            ruta_archivo.unlink()
+
+        if formato == 'parquet':
+            pq.write_table(tabla, ruta_archivo)
+        else:
+            with pa.OSFile(str(ruta_archivo), 'wb') as sink:
+                with pa.ipc.new_file(sink, tabla.schema) as writer:
+                    writer.write_table(tabla)
+
+        self.log_estado(
+            f"✅ Archivo {formato} guardado",
+            archivo=ruta_archivo.name,
+            registros=tabla.num_rows
+        )
+        return ruta_archivo
+
+    @cronometrado('particion')
+    def _particionar_por_estudiante(self, carnets: pd.Series) -> List[Tuple[int, int, int]]:
+        """
+        ✅ Calcula los bloques de salida en una sola pasada sobre la columna de
+        carnés ya ordenada. Devuelve (fila_inicio, fila_fin, num_estudiantes) por
+        bloque; un estudiante nunca queda repartido entre dos archivos.
+        """
+        conteos = carnets.groupby(carnets, sort=False, dropna=False).size().to_numpy()
+
+        bloques = []
+        inicio = 0
+        fin = 0
+        estudiantes = 0
+
+        for num_registros in conteos:
+            if fin - inicio + num_registros > self.TAMAÑO_BLOQUE and estudiantes:
+                bloques.append((inicio, fin, estudiantes))
+                inicio = fin
+                estudiantes = 0
+            fin += int(num_registros)
+            estudiantes += 1
+
+        if estudiantes:
+            bloques.append((inicio, fin, estudiantes))
+
+        return bloques
+
+    # ========== PROCESAMIENTO INCREMENTAL ==========
+    def procesar_excel_incremental(
+        self,
+        archivo_entrada: str,
+        archivo_estado: str,
+        modo_lectura: str = 'pandas',
+        columnar: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, List]]:
+        """
+        ✅ Reprocesa solo los estudiantes cuyas filas cambiaron desde la última corrida.
+
+        Cada bloque de 4 filas se identifica con una huella de sus celdas crudas
+        más la del encabezado (columnas_info, notas y mapeos del procesador).
+        archivo_estado guarda huellas, pagos y estadísticas de cada bloque; los
+        bloques sin cambios reutilizan sus pagos sin pasar por
+        _procesar_columnas_especiales / _procesar_columnas_meses.
+
+        Devuelve (pagos, cambios) con cambios = {'agregados', 'eliminados',
+        'modificados'}; cada modificado es un par (antes, después).
+
+        archivo_estado es un pickle: guárdelo donde solo escriba quien corre el
+        procesador. La carga solo acepta tipos de datos simples (ver
+        _UnpicklerEstado) y un estado con otras clases se ignora, pero un
+        estado ajeno igual puede inyectar pagos en la salida.
+        """
+        if modo_lectura not in MODOS_LECTURA:
+            raise ValueError(f"Modo de lectura no soportado: {modo_lectura}")
+
+        self._iniciar_procesamiento(archivo_entrada, modo_lectura)
+        cambios: Dict[str, List] = {'agregados': [], 'eliminados': [], 'modificados': []}
+
+        try:
+            bloques, columnas_info, notas_pago_encabezado = self._abrir_bloques(archivo_entrada, modo_lectura)
+            huella_encabezado = self._huella_encabezado(columnas_info, notas_pago_encabezado)
+
+            estado_previo = self._cargar_estado_incremental(archivo_estado)
+            bloques_previos = estado_previo.get('bloques', {})
+            reutilizables = bloques_previos if estado_previo.get('huella_encabezado') == huella_encabezado else {}
+            if bloques_previos and not reutilizables:
+                self.log_estado("⚠️ Encabezado o configuración distintos: se reprocesan todos los bloques", "warning")
+
+            pagos = RegistroPagos() if columnar else []
+            bloques_actuales: Dict[str, Dict[str, Any]] = {}
+            orden: List[str] = []
+            reprocesados = 0
+
+            for i, filas in bloques:
+                huella = self._huella_bloque(filas, huella_encabezado)
+                registro = bloques_actuales.get(huella) or reutilizables.get(huella)
+
+                if registro is None:
+                    registro = self._procesar_bloque_aislado(i, filas, columnas_info, notas_pago_encabezado)
+                    reprocesados += 1
+                else:
+                    self._fusionar_estadisticas(registro['estadisticas'])
+
+                # Los bloques con errores no se guardan: se reintentan en la próxima corrida
+                if not registro['estadisticas']['errores']:
+                    bloques_actuales[huella] = registro
+                    orden.append(huella)
+                pagos.extend(registro['pagos'])
+
+            cambios = self._diferencias_pagos(estado_previo, bloques_previos, orden, bloques_actuales)
+
+            self._guardar_estado_incremental(archivo_estado, {
+                'version': VERSION_ESTADO_INCREMENTAL,
+                'huella_encabezado': huella_encabezado,
+                'orden': orden,
+                'bloques': bloques_actuales,
+            })
+
+            self.log_estado(
+                f"♻️ Procesamiento incremental",
+                bloques=len(orden),
+                reprocesados=reprocesados,
+                reutilizados=len(orden) - reprocesados,
+                pagos_agregados=len(cambios['agregados']),
+                pagos_eliminados=len(cambios['eliminados']),
+                pagos_modificados=len(cambios['modificados'])
+            )
+
+            if self.indice_boletas is not None:
+                pagos = self._aplicar_indice_boletas(pagos, archivo_entrada)
+
+            self.generar_reporte_final(pagos)
+            return pagos, cambios
+
+        except FileNotFoundError as e:
+            self.log_estado(f"❌ {e}", "error")
+            return [], cambios
+        except Exception as e:
+            self.log_estado(f"❌ Error fatal: {e}", "error")
+            import traceback
+            traceback.print_exc()
+            return [], cambios
+
+    def _procesar_bloque_aislado(
+        self,
+        i: int,
+        filas: Tuple,
+        columnas_info: List[Dict],
+        notas_pago_encabezado: Optional[str]
+    ) -> Dict[str, Any]:
+        """
+        Procesa un bloque con estadísticas propias y las fusiona en las de la corrida,
+        igual que un worker; así pueden guardarse y reaplicarse si el bloque no cambia.
+        """
+        estadisticas_corrida = self.estadisticas
+        self.estadisticas = self._nuevas_estadisticas()
+        try:
+            pagos = self._procesar_bloques([(i, filas)], columnas_info, notas_pago_encabezado)
+            estadisticas_bloque = self.estadisticas
+        finally:
+            self.estadisticas = estadisticas_corrida
+
+        self._fusionar_estadisticas(estadisticas_bloque)
+        # Los tiempos son de esta corrida: no se reaplican si el bloque no cambia
+        estadisticas_bloque['etapas_segundos'] = defaultdict(float)
+        estadisticas_bloque['etapas_llamadas'] = defaultdict(int)
+        return {'pagos': pagos, 'estadisticas': estadisticas_bloque}
+
+    def _huella_encabezado(self, columnas_info: List[Dict], notas_pago_encabezado: Optional[str]) -> str:
+        """Huella del encabezado y de los mapeos que afectan la extracción."""
+        configuracion = (
+            VERSION_ESTADO_INCREMENTAL,
+            columnas_info,
+            notas_pago_encabezado,
+            self.mes_a_numero,
+            self.meses_orden,
+            self.program_aliases,
+            self.programas_validos,
+            self.mapeo_planes_completo,
+            self.patrones_bancos,
+        )
+        return hashlib.blake2b(repr(configuracion).encode('utf-8'), digest_size=16).hexdigest()
+
+    @staticmethod
+    def _huella_bloque(filas: Tuple, huella_encabezado: str) -> str:
+        """Huella de las 4 filas crudas de un estudiante (NaN y None cuentan igual)."""
+        h = hashlib.blake2b(huella_encabezado.encode('ascii'), digest_size=16)
+        for fila in filas:
+            h.update(repr([_clave_celda(v) for v in fila]).encode('utf-8'))
+            h.update(b'\n')
+        return h.hexdigest()
+
+    def _cargar_estado_incremental(self, archivo_estado: str) -> Dict[str, Any]:
+        """Estado de la corrida anterior, o {} si falta, es ilegible o de otra versión."""
+        ruta = Path(archivo_estado)
+        if not ruta.exists():
+            self.log_estado("ℹ️ Sin estado incremental previo: se procesan todos los bloques")
+            return {}
+        try:
+            with open(ruta, 'rb') as f:
+                estado = _UnpicklerEstado(f).load()
+        except Exception as e:
+            self.log_estado(f"⚠️ Estado incremental ilegible, se ignora", "warning", error=str(e)[:200])
+            return {}
+        if not isinstance(estado, dict) or estado.get('version') != VERSION_ESTADO_INCREMENTAL:
+            self.log_estado("⚠️ Estado incremental de otra versión, se ignora", "warning")
+            return {}
+        return estado
+
+    @staticmethod
+    def _guardar_estado_incremental(archivo_estado: str, estado: Dict[str, Any]):
+        """Escribe el estado de forma atómica (archivo temporal + reemplazo)."""
+        ruta = Path(archivo_estado)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = ruta.with_name(ruta.name + '.tmp')
+        with open(temporal, 'wb') as f:
+            pickle.dump(estado, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, ruta)
+
+    @staticmethod
+    def _diferencias_pagos(
+        estado_previo: Dict[str, Any],
+        bloques_previos: Dict[str, Dict[str, Any]],
+        orden: List[str],
+        bloques_actuales: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, List]:
+        """
+        Compara solo los bloques que aparecieron o desaparecieron: sus pagos se
+        emparejan por CAMPOS_IDENTIDAD_PAGO + ocurrencia; un par con otros
+        valores es un pago modificado.
+        """
+        conteo_previo = Counter(estado_previo.get('orden', []))
+        conteo_actual = Counter(orden)
+
+        antes: List[Dict[str, Any]] = []
+        despues: List[Dict[str, Any]] = []
+        for huella in conteo_previo.keys() | conteo_actual.keys():
+            diferencia = conteo_actual[huella] - conteo_previo[huella]
+            if diferencia > 0:
+                despues.extend(bloques_actuales[huella]['pagos'] * diferencia)
+            elif diferencia < 0:
+                antes.extend(bloques_previos[huella]['pagos'] * -diferencia)
+
+        def indexar(pagos: List[Dict[str, Any]]) -> Dict[Tuple, Dict[str, Any]]:
+            ocurrencias = Counter()
+            indice = {}
+            for pago in pagos:
+                identidad = tuple(pago.get(c) for c in CAMPOS_IDENTIDAD_PAGO)
+                indice[identidad + (ocurrencias[identidad],)] = pago
+                ocurrencias[identidad] += 1
+            return indice
+
+        indice_antes = indexar(antes)
+        indice_despues = indexar(despues)
+
+        cambios: Dict[str, List] = {'agregados': [], 'eliminados': [], 'modificados': []}
+        for clave, pago in indice_despues.items():
+            previo = indice_antes.get(clave)
+            if previo is None:
+                cambios['agregados'].append(pago)
+            elif previo != pago:
+                cambios['modificados'].append((previo, pago))
+        cambios['eliminados'] = [pago for clave, pago in indice_antes.items() if clave not in indice_despues]
+        return cambios
+
+    def generar_reporte_cambios(self, cambios: Dict[str, List], archivo_salida: str) -> Optional[str]:
+        """
+        ✅ Exporta los cambios de una corrida incremental a una hoja 'Cambios':
+        una fila por pago agregado/eliminado y dos (antes/después) por modificado.
+        """
+        filas = []
+        for pago in cambios['agregados']:
+            filas.append({'cambio': 'agregado', **pago})
+        for pago in cambios['eliminados']:
+            filas.append({'cambio': 'eliminado', **pago})
+        for previo, actual in cambios['modificados']:
+            filas.append({'cambio': 'modificado (antes)', **previo})
+            filas.append({'cambio': 'modificado (después)', **actual})
+
+        if not filas:
+            self.log_estado("ℹ️ Sin cambios de pagos desde la corrida anterior")
+            return None
+
+        df = pd.DataFrame(filas)
+        df = df.reindex(columns=['cambio'] + COLUMNAS_EXPORT).rename(columns=COLUMNAS_RENOMBRADAS)
+        with pd.ExcelWriter(archivo_salida, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name='Cambios')
+
+        self.log_estado(f"📝 Reporte de cambios guardado", archivo=archivo_salida, filas=len(df))
+        return archivo_salida
+
+    # ========== PIPELINE ==========
+    def procesar_excel_pipeline(
+        self,
+        archivo_entrada: str,
+        archivo_salida: str,
+        modo_lectura: str = 'streaming',
+        orden_global: bool = False,
+        motor_excel: str = 'openpyxl',
+        tamaño_cola: int = 64
+    ) -> List[str]:
+        """
+        ✅ Extracción en pipeline: lectura, normalización y escritura se solapan.
+
+        Un hilo lee bloques de estudiantes, otro los normaliza y el hilo actual
+        escribe cada parte en cuanto reúne TAMAÑO_BLOQUE pagos. Las etapas se
+        conectan con colas acotadas (tamaño_cola), así la memoria no crece con
+        el tamaño del archivo. Si una etapa falla se cancelan las demás y el
+        error se informa como en procesar_excel_v3.
+
+        orden_global=False: cada parte sale ordenada por carné/fecha y las partes
+        siguen el orden de los estudiantes en el archivo de entrada.
+        orden_global=True: las partes se ordenan y vuelcan a disco como corridas
+        y se fusionan externamente; el resultado es idéntico al de
+        procesar_excel_v3 + generar_excel_normalizado_en_bloques.
+        """
+        if modo_lectura not in MODOS_LECTURA:
+            raise ValueError(f"Modo de lectura no soportado: {modo_lectura}")
+        if motor_excel not in MOTORES_EXCEL:
+            raise ValueError(f"Motor de escritura no soportado: {motor_excel}. Use uno de {MOTORES_EXCEL}")
+
+        self._iniciar_procesamiento(archivo_entrada, modo_lectura)
+        self.log_estado(f"⚙️ Pipeline", orden_global=orden_global, tamaño_cola=tamaño_cola)
+
+        cancelado = threading.Event()
+        errores: List[BaseException] = []
+        hilos: List[threading.Thread] = []
+
+        try:
+            bloques, columnas_info, notas_pago_encabezado = self._abrir_bloques(archivo_entrada, modo_lectura)
+
+            cola_bloques = queue.Queue(maxsize=tamaño_cola)
+            cola_pagos = queue.Queue(maxsize=tamaño_cola)
+
+            def normalizar():
+                for bloque in self._consumir_cola(cola_bloques, cancelado, errores):
+                    pagos = self._procesar_bloques([bloque], columnas_info, notas_pago_encabezado)
+                    if self.indice_boletas is not None:
+                        pagos = self._aplicar_indice_boletas(pagos, archivo_entrada)
+                    yield pagos
+
+            hilos = [
+                threading.Thread(
+                    target=self._alimentar_cola, args=(bloques, cola_bloques, cancelado, errores),
+                    name='pipeline-lectura', daemon=True
+                ),
+                threading.Thread(
+                    target=self._alimentar_cola, args=(normalizar(), cola_pagos, cancelado, errores),
+                    name='pipeline-normalizacion', daemon=True
+                ),
+            ]
+            for hilo in hilos:
+                hilo.start()
+
+            grupos = self._consumir_cola(cola_pagos, cancelado, errores)
+            if orden_global:
+                with tempfile.TemporaryDirectory(prefix='pagos_pipeline_') as directorio_temporal:
+                    archivos = self._escribir_partes(
+                        self._ordenar_externamente(grupos, Path(directorio_temporal)),
+                        archivo_salida, motor_excel
+                    )
+            else:
+                archivos = self._escribir_partes(grupos, archivo_salida, motor_excel)
+
+            for hilo in hilos:
+                hilo.join()
+            if errores:
+                raise errores[0]
+
+            self.generar_reporte_final([])
+            return archivos
+
+        except FileNotFoundError as e:
+            self.log_estado(f"❌ {e}", "error")
+            return []
+        except Exception as e:
+            self.log_estado(f"❌ Error fatal: {e}", "error")
+            import traceback
+            traceback.print_exc()
+            return []
+        finally:
+            # Detiene las etapas que sigan vivas (p. ej. si falló la escritura)
+            cancelado.set()
+            for hilo in hilos:
+                hilo.join()
+
+    @staticmethod
+    def _poner_en_cola(cola: queue.Queue, elemento: Any, cancelado: threading.Event) -> bool:
+        """Encola esperando lugar; devuelve False si el pipeline se canceló antes."""
+        while not cancelado.is_set():
+            try:
+                cola.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
 
-    # ========== GENERACIÓN DE ARCHIVOS ==========
-    def generar_excel_normalizado_en_bloques(self, pagos: List[Dict[str, Any]], archivo_salida: str) -> List[str]:
+    @classmethod
+    def _alimentar_cola(
+        cls,
+        productor: Iterable[Any],
+        cola: queue.Queue,
+        cancelado: threading.Event,
+        errores: List[BaseException]
+    ):
         """
-        ✅ MEJORADO: Genera archivos preservando integridad de estudiantes.
+        Etapa del pipeline: pasa los elementos del productor a una cola acotada.
+        Un error en el productor cancela todo el pipeline.
         """
-        if not pagos:
-            self.log_estado("⚠️ No hay pagos para exportar", "warning")
-            return []
-
         try:
-            df = pd.DataFrame(pagos)
-            df['numero_boleta'] = df['numero_boleta'].astype(str)
-            df['monto'] = pd.to_numeric(df['monto'], errors='coerce')
-            df = df.sort_values(['carnet', 'fecha_pago'], na_position='last')
+            for elemento in productor:
+                if not cls._poner_en_cola(cola, elemento, cancelado):
+                    return
+        except BaseException as e:
+            errores.append(e)
+            cancelado.set()
+        finally:
+            # Cierra el productor (y el libro que tenga abierto) si quedó a medias
+            cerrar = getattr(productor, 'close', None)
+            if cerrar is not None:
+                cerrar()
+            cls._poner_en_cola(cola, FIN_ETAPA, cancelado)
 
-            columnas_export = [
-                'carnet',
-                'nombre_estudiante',
-                'plan_estudios',
-                'Notas de pago',
-                'Nomenclatura',
-                'estatus',
-                'numero_boleta',
-                'monto',
-                'fecha_pago',
-                'banco',
-                'concepto',
-                'tipo_pago',
-                'mes_pago',
-                'año'
-            ]
-            
-            columnas_export = [c for c in columnas_export if c in df.columns]
-            df_export = df[columnas_export]
-            total_registros = len(df_export)
-            
-            archivos_generados = []
-            archivo_path = Path(archivo_salida)
-            nombre_base = archivo_path.stem
-            extension = archivo_path.suffix
-            directorio = archivo_path.parent
-            
-            # ✅ DIVISIÓN INTELIGENTE POR ESTUDIANTE
-            carnets_unicos = df_export['carnet'].unique()
-            total_carnets = len(carnets_unicos)
-            
+    @staticmethod
+    def _consumir_cola(
+        cola: queue.Queue,
+        cancelado: threading.Event,
+        errores: List[BaseException]
+    ) -> Iterator[Any]:
+        """Recorre una cola del pipeline hasta la marca de fin; si se cancela, relanza el error."""
+        while True:
+            if cancelado.is_set():
+                raise errores[0] if errores else RuntimeError("Pipeline cancelado")
+            try:
+                elemento = cola.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if elemento is FIN_ETAPA:
+                return
+            yield elemento
+
+    def _escribir_partes(
+        self,
+        grupos: Iterable[List[Dict[str, Any]]],
+        archivo_salida: str,
+        motor_excel: str
+    ) -> List[str]:
+        """
+        Escribe los pagos de cada estudiante (un grupo por estudiante) en partes
+        de hasta TAMAÑO_BLOQUE registros, sin repartir un estudiante entre dos.
+        El total de partes se conoce al final: se escriben con nombre provisional
+        y luego se renombran a _parte_i_de_N (o al nombre base si hay una sola).
+        """
+        archivo_path = Path(archivo_salida)
+        nombre_base = archivo_path.stem
+        extension = archivo_path.suffix
+        directorio = archivo_path.parent
+
+        provisionales: List[Path] = []
+        parte: List[Dict[str, Any]] = []
+        estudiantes = 0
+
+        def volcar():
+            ruta = directorio / f"{nombre_base}_parte_{len(provisionales) + 1}_parcial{extension}"
+            if motor_excel == 'streaming':
+                bloque = sorted(parte, key=_clave_orden_pago)
+            else:
+                bloque = self._preparar_df_export(parte, columnas=COLUMNAS_EXPORT)
+            segundos = _escribir_bloque_cronometrado(bloque, ruta, motor_excel, COLUMNAS_EXPORT)
+            provisionales.append(ruta)
+            self.estadisticas['tiempos_escritura'].append(segundos)
+            if self.instrumentar:
+                self._registrar_etapa('escritura_bloque', segundos)
             self.log_estado(
-                f"📦 Preparando división en bloques",
-                total_registros=total_registros,
-                total_carnets=total_carnets,
-                tamaño_bloque=self.TAMAÑO_BLOQUE
+                f"✅ Parte {len(provisionales)} guardada",
+                registros=len(parte),
+                estudiantes=estudiantes,
+                segundos=round(segundos, 3)
             )
-            
-            bloques = []
-            bloque_actual = []
-            registros_actual = 0
-            
-            for carnet in carnets_unicos:
-                registros_estudiante = df_export[df_export['carnet'] == carnet]
-                num_registros = len(registros_estudiante)
-                
-                if registros_actual + num_registros > self.TAMAÑO_BLOQUE and bloque_actual:
-                    bloques.append(bloque_actual)
-                    bloque_actual = [carnet]
-                    registros_actual = num_registros
-                else:
-                    bloque_actual.append(carnet)
-                    registros_actual += num_registros
-            
-            if bloque_actual:
-                bloques.append(bloque_actual)
-            
-            num_bloques = len(bloques)
-            
-            self.log_estado(
-                f"✅ División optimizada",
-                bloques=num_bloques,
-                promedio_estudiantes_por_bloque=total_carnets // num_bloques if num_bloques > 0 else 0
+
+        for pagos_estudiante in grupos:
+            if not pagos_estudiante:
+                continue
+            if len(parte) + len(pagos_estudiante) > self.TAMAÑO_BLOQUE and estudiantes:
+                volcar()
+                parte = []
+                estudiantes = 0
+            parte.extend(pagos_estudiante)
+            estudiantes += 1
+
+        if estudiantes:
+            volcar()
+
+        if not provisionales:
+            self.log_estado("⚠️ No hay pagos para exportar", "warning")
+            return []
+
+        archivos_generados = []
+        num_partes = len(provisionales)
+        for i, ruta in enumerate(provisionales):
+            if num_partes > 1:
+                nombre_archivo = f"{nombre_base}_parte_{i+1}_de_{num_partes}{extension}"
+            else:
+                nombre_archivo = f"{nombre_base}{extension}"
+            archivos_generados.append(str(ruta.replace(directorio / nombre_archivo)))
+            self.estadisticas['bloques_generados'] += 1
+
+        return archivos_generados
+
+    def _ordenar_externamente(
+        self,
+        grupos: Iterable[List[Dict[str, Any]]],
+        directorio_temporal: Path
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Ordenamiento externo por carné/fecha: vuelca corridas ordenadas de hasta
+        TAMAÑO_BLOQUE pagos y las fusiona con heapq.merge. La fusión es estable,
+        igual que sort_values, y reagrupa los pagos por carné.
+        """
+        corridas: List[Path] = []
+        corrida: List[Dict[str, Any]] = []
+
+        for pagos_estudiante in grupos:
+            corrida.extend(pagos_estudiante)
+            if len(corrida) >= self.TAMAÑO_BLOQUE:
+                corridas.append(_volcar_corrida(corrida, directorio_temporal / f"corrida_{len(corridas)}.pkl"))
+                corrida = []
+        if corrida:
+            corridas.append(_volcar_corrida(corrida, directorio_temporal / f"corrida_{len(corridas)}.pkl"))
+
+        self.log_estado(f"🔀 Fusionando corridas ordenadas", corridas=len(corridas))
+
+        fusion = heapq.merge(*(_leer_corrida(ruta) for ruta in corridas), key=_clave_orden_pago)
+        for _, grupo in groupby(fusion, key=itemgetter('carnet')):
+            yield list(grupo)
+
+    # ========== CARGA A POSTGRES ==========
+    @staticmethod
+    def _filas_staging_kardex(pagos: Iterable[Dict[str, Any]]) -> Iterator[Tuple]:
+        """Pagos como filas tipadas para el COPY binario (ver TIPOS_STAGING_KARDEX)."""
+        for pago in pagos:
+            boleta = pago.get('numero_boleta')
+            monto = pago.get('monto')
+            fecha = pago.get('fecha_pago')
+            año = pago.get('año')
+            yield (
+                pago.get('carnet'),
+                pago.get('plan_estudios'),
+                None if boleta is None else str(boleta),
+                None if boleta is None else normalizar_boleta(boleta),
+                None if monto is None or monto != monto else Decimal(str(monto)).quantize(Decimal('0.01')),
+                date.fromisoformat(fecha) if isinstance(fecha, str) else None,
+                pago.get('banco'),
+                normalizar_banco_kardex(pago.get('banco')),
+                pago.get('concepto'),
+                pago.get('mes_pago'),
+                None if año is None or año != año else int(año),
+                pago.get('tipo_pago'),
             )
-            
-            for i, carnets_bloque in enumerate(bloques):
-                df_bloque = df_export[df_export['carnet'].isin(carnets_bloque)]
-                
-                if num_bloques > 1:
-                    nombre_archivo = f"{nombre_base}_parte_{i+1}_de_{num_bloques}{extension}"
-                else:
-                    nombre_archivo = f"{nombre_base}{extension}"
-                
-                ruta_archivo = directorio / nombre_archivo
-                
-                if ruta_archivo.exists():
-                    ruta_archivo.unlink()
-                
-                with pd.ExcelWriter(ruta_archivo, engine='openpyxl') as writer:
-                    df_bloque_to_write = df_bloque.rename(columns={'estatus': 'Estatus (normalizado)'})
-                    df_bloque_to_write.to_excel(writer, index=False, sheet_name='Pagos')
-
-                    worksheet = writer.sheets['Pagos']
-                    for idx, col in enumerate(df_bloque_to_write.columns, 1):
-                        max_length = max(
-                            df_bloque_to_write[col].astype(str).str.len().max(),
-                            len(col)
-                        )
-                        col_letter = chr(64 + idx) if idx <= 26 else 'A' + chr(64 + idx - 26)
-                        worksheet.column_dimensions[col_letter].width = min(max_length + 2, 50)
-                
-                archivos_generados.append(str(ruta_archivo))
-                self.estadisticas['bloques_generados'] += 1
-                
-                self.log_estado(
-                    f"✅ Bloque {i+1}/{num_bloques} guardado",
-                    archivo=nombre_archivo,
-                    registros=len(df_bloque),
-                    estudiantes=len(carnets_bloque)
+
+    def cargar_kardex_pagos(
+        self,
+        pagos: Iterable[Dict[str, Any]],
+        dsn: str,
+        estado_pago: str = 'pendiente_revision',
+        usuario_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        ✅ Carga los pagos directamente en kardex_pagos, sin pasar por los bloques Excel.
+
+        Todo ocurre en una transacción:
+        1. COPY FROM STDIN (binario) a una tabla temporal de staging; las tablas
+           temporales de Postgres no escriben WAL
+        2. un solo join resuelve carné → estudiante_programa_id (SQL_RESOLVER_KARDEX)
+        3. un solo INSERT ... ON CONFLICT (boleta_fingerprint) inserta o actualiza;
+           banco_normalizado, numero_boleta_normalizada y la huella siguen las
+           reglas de producción, así los pagos ya importados se actualizan
+
+        Los pagos sin fecha o monto, o cuyo carné no tiene programa activo, no se
+        cargan y se informan en el resultado (carnets_sin_estudiante lista esos
+        carnés); los repetidos (misma huella) se cargan una vez. Requiere psycopg 3 (pip install "psycopg[binary]").
+        """
+        if estado_pago not in ESTADOS_PAGO_KARDEX:
+            raise ValueError(f"Estado de pago no soportado: {estado_pago}. Use uno de {ESTADOS_PAGO_KARDEX}")
+        try:
+            import psycopg
+        except ImportError as e:
+            raise ImportError('La carga a Postgres requiere psycopg: pip install "psycopg[binary]"') from e
+
+        inicio = time.perf_counter()
+        columnas = ', '.join(f'"{c}"' for c in COLUMNAS_STAGING_KARDEX)
+
+        with psycopg.connect(dsn) as conexion:
+            with conexion.cursor() as cursor:
+                cursor.execute(SQL_STAGING_KARDEX)
+
+                with cursor.copy(f"COPY stg_kardex_pagos ({columnas}) FROM STDIN (FORMAT BINARY)") as copia:
+                    copia.set_types(TIPOS_STAGING_KARDEX)
+                    for fila in self._filas_staging_kardex(pagos):
+                        copia.write_row(fila)
+
+                cursor.execute(SQL_RESOLVER_KARDEX)
+                cursor.execute(
+                    """
+                    SELECT count(*),
+                           count(*) FILTER (WHERE s.fecha_pago IS NULL OR s.monto IS NULL),
+                           count(*) FILTER (WHERE e.carnet IS NULL)
+                    FROM stg_kardex_pagos s
+                    LEFT JOIN stg_kardex_estudiantes e USING (carnet, plan_estudios)
+                    """
                 )
-            
-            return archivos_generados
-            
-        except Exception as e:
-            self.log_estado(f"❌ Error guardando archivos: {e}", "error")
-            import traceback
-            traceback.print_exc()
-            return []
+                total, incompletos, sin_estudiante = cursor.fetchone()
+                cursor.execute(
+                    """
+                    SELECT DISTINCT s.carnet
+                    FROM stg_kardex_pagos s
+                    LEFT JOIN stg_kardex_estudiantes e USING (carnet, plan_estudios)
+                    WHERE e.carnet IS NULL
+                    ORDER BY s.carnet
+                    """
+                )
+                carnets_sin_estudiante = [fila[0] for fila in cursor.fetchall()]
+
+                cursor.execute(SQL_UPSERT_KARDEX, {'estado_pago': estado_pago, 'usuario_id': usuario_id})
+                insertados = [fila[0] for fila in cursor.fetchall()]
+
+        resultado = {
+            'pagos': total,
+            'insertados': sum(insertados),
+            'actualizados': len(insertados) - sum(insertados),
+            'sin_fecha_o_monto': incompletos,
+            'sin_estudiante': sin_estudiante,
+            'carnets_sin_estudiante': carnets_sin_estudiante,
+        }
+        self.log_estado(
+            f"🐘 Pagos cargados en kardex_pagos",
+            **{clave: valor for clave, valor in resultado.items() if clave != 'carnets_sin_estudiante'},
+            segundos=round(time.perf_counter() - inicio, 3)
+        )
+        return resultado
+
+    # ========== BOLETAS DUPLICADAS ==========
+    def _aplicar_indice_boletas(self, pagos: Iterable[Dict[str, Any]], archivo_entrada: str):
+        """
+        ✅ Compara los pagos extraídos con el índice de boletas.
+
+        Es duplicado un pago cuya clave (ver clave_boleta) ya está en el índice, o
+        que se repite dentro de esta corrida. Solo no cuentan las boletas que
+        registró un libro con el mismo contenido (mismo SHA-256): reprocesarlo no
+        las duplica, pero el libro de otro mes con el mismo nombre sí. Los
+        duplicados quedan en estadisticas['pagos_duplicados'] y, con
+        accion_duplicados='descartar', se quitan del resultado; las claves nuevas
+        se registran con el nombre del libro como origen.
+        """
+        origen = Path(archivo_entrada).name
+        if self._huella_libro_indice is None:
+            self._huella_libro_indice = _sha256_archivo(archivo_entrada).hexdigest()
+        libro = self._huella_libro_indice
+
+        claves = [clave_boleta(p['numero_boleta'], p['banco'], p['monto']) for p in pagos]
+        previas = self.indice_boletas.buscar({c for c in claves if c is not None})
+
+        conservados = RegistroPagos() if isinstance(pagos, RegistroPagos) else []
+        nuevas: List[Tuple[str, str]] = []
+        for pago, clave in zip(pagos, claves):
+            if clave is None:
+                conservados.append(pago)
+                continue
+
+            self.estadisticas['boletas_consultadas'] += 1
+            if clave in self._claves_ejecucion:
+                origen_previo = ORIGEN_MISMA_EJECUCION
+            else:
+                self._claves_ejecucion.add(clave)
+                origen_previo, libro_previo = previas.get(clave, (None, None))
+                if origen_previo is None:
+                    nuevas.append((clave, origen))
+                if origen_previo is None or libro_previo == libro:
+                    conservados.append(pago)
+                    continue
+
+            self.estadisticas['boletas_duplicadas'] += 1
+            self.estadisticas['pagos_duplicados'].append({**pago, 'origen_duplicado': origen_previo})
+            if self.eventos is not None:
+                self.eventos.emitir(
+                    'boleta_duplicada', carnet=pago['carnet'],
+                    valor_crudo=pago['numero_boleta'], valor_normalizado=clave,
+                    origen=origen_previo, accion=self.accion_duplicados
+                )
+            if self.accion_duplicados == 'descartar':
+                self.estadisticas['boletas_descartadas'] += 1
+            else:
+                conservados.append(pago)
+
+        self.estadisticas['boletas_registradas'] += self.indice_boletas.registrar(nuevas, libro)
+        return conservados if self.accion_duplicados == 'descartar' else pagos
+
+    def _banco_indice(self, texto: Any) -> str:
+        """Banco canónico para las claves sembradas (sin tocar bancos_detectados)."""
+        return self._clasificar_banco(texto) or "No especificado"
+
+    @staticmethod
+    def _filas_salida_previa(ruta: Path) -> Iterator[Tuple[Any, Any, Any]]:
+        """(boleta, banco, monto) de un bloque de salida .xlsx, .parquet o .arrow."""
+        columnas = ['numero_boleta', 'banco', 'monto']
+        if ruta.suffix in EXTENSIONES_COLUMNARES.values():
+            tabla = cargar_pagos_columnar(str(ruta)).select(columnas)
+            yield from zip(*(tabla.column(c).to_pylist() for c in columnas))
+        else:
+            df = pd.read_excel(ruta, sheet_name=HOJA_PAGOS, usecols=columnas, dtype={'numero_boleta': str})
+            yield from zip(df['numero_boleta'], df['banco'], df['monto'])
+
+    @staticmethod
+    def _filas_kardex_respaldo(ruta: Path) -> Iterator[Tuple[Any, Any, Any]]:
+        """(boleta, banco, monto) de kardex_pagos en un respaldo pg_dump -Fc (ver lector_pgdump)."""
+        from lector_pgdump import LectorPgDump
+
+        with LectorPgDump(ruta) as lector:
+            for fila in lector.filas('kardex_pagos', ['numero_boleta', 'banco', 'monto_pagado']):
+                yield fila['numero_boleta'], fila['banco'], fila['monto_pagado']
+
+    def sembrar_indice_boletas(self, fuente: str) -> int:
+        """
+        ✅ Carga en el índice las boletas de una salida anterior (.xlsx, .parquet,
+        .arrow) o de kardex_pagos en un respaldo pg_dump (cualquier otra extensión).
+        Se puede repetir sin duplicar entradas. Devuelve cuántas boletas eran nuevas.
+        """
+        if self.indice_boletas is None:
+            raise ValueError("No hay índice de boletas configurado")
+
+        ruta = Path(fuente)
+        inicio = time.perf_counter()
+        if ruta.suffix in ('.xlsx', *EXTENSIONES_COLUMNARES.values()):
+            origen, filas = f"salida:{ruta.name}", self._filas_salida_previa(ruta)
+        else:
+            origen, filas = f"kardex:{ruta.name}", self._filas_kardex_respaldo(ruta)
+
+        claves = (clave_boleta(boleta, self._banco_indice(banco), monto) for boleta, banco, monto in filas)
+        nuevas = self.indice_boletas.registrar((clave, origen) for clave in claves if clave is not None)
+        self.log_estado(
+            f"🗂️ Índice de boletas sembrado",
+            fuente=ruta.name,
+            nuevas=nuevas,
+            segundos=round(time.perf_counter() - inicio, 3)
+        )
+        return nuevas
+
+    def generar_reporte_duplicados(self, archivo_salida: str) -> Optional[str]:
+        """✅ Exporta los pagos con boleta duplicada a una hoja 'Duplicados', con el origen de la boleta previa."""
+        duplicados = self.estadisticas['pagos_duplicados']
+        if not duplicados:
+            return None
+
+        df = pd.DataFrame(duplicados)
+        df = df.reindex(columns=['origen_duplicado'] + COLUMNAS_EXPORT).rename(columns=COLUMNAS_RENOMBRADAS)
+        with pd.ExcelWriter(archivo_salida, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name='Duplicados')
+
+        self.log_estado(f"📝 Reporte de boletas duplicadas guardado", archivo=archivo_salida, filas=len(df))
+        return archivo_salida
+
+    # ========== INSTRUMENTACIÓN ==========
+    def _registrar_etapa(self, etapa: str, segundos: float, llamadas: int = 1):
+        self.estadisticas['etapas_segundos'][etapa] += segundos
+        self.estadisticas['etapas_llamadas'][etapa] += llamadas
+
+    @contextlib.contextmanager
+    def _medir_etapa(self, etapa: str):
+        """Mide un tramo de código como una llamada de la etapa (si hay instrumentación)."""
+        if not self.instrumentar:
+            yield
+            return
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._registrar_etapa(etapa, time.perf_counter() - inicio)
+
+    def _cronometrar_iterador(self, etapa: str, iterador: Iterable[Any]) -> Iterator[Any]:
+        """
+        Suma a la etapa solo el tiempo de producir cada elemento (no el del consumidor);
+        el recorrido completo cuenta como una llamada.
+        """
+        iterador = iter(iterador)
+        try:
+            while True:
+                inicio = time.perf_counter()
+                try:
+                    elemento = next(iterador)
+                except StopIteration:
+                    self._registrar_etapa(etapa, time.perf_counter() - inicio)
+                    return
+                self._registrar_etapa(etapa, time.perf_counter() - inicio, llamadas=0)
+                yield elemento
+        finally:
+            # Un recorrido interrumpido cierra también el iterador de origen
+            cerrar = getattr(iterador, 'close', None)
+            if cerrar is not None:
+                cerrar()
+
+    def resumen_instrumentacion(self) -> Dict[str, Any]:
+        """Tiempos y llamadas por etapa, más la memoria pico, en un dict serializable a JSON."""
+        segundos = self.estadisticas['etapas_segundos']
+        llamadas = self.estadisticas['etapas_llamadas']
+        etapas = [e for e in ETAPAS_INSTRUMENTADAS if e in llamadas or e in segundos]
+        etapas += sorted(set(segundos) - set(etapas))
+        return {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'estudiantes_procesados': self.estadisticas['estudiantes_procesados'],
+            'pagos_extraidos': self.estadisticas['pagos_extraidos'],
+            'etapas': {
+                etapa: {'segundos': round(segundos.get(etapa, 0.0), 6), 'llamadas': llamadas.get(etapa, 0)}
+                for etapa in etapas
+            },
+            'rss_pico_mb': rss_pico_mb(),
+        }
+
+    def texto_instrumentacion(self) -> str:
+        """Tabla de etapas para los reportes de consola."""
+        resumen = self.resumen_instrumentacion()
+        texto = f"⏱️ ETAPAS (segundos inclusivos / llamadas):\n"
+        for etapa, valores in resumen['etapas'].items():
+            texto += f"   • {etapa:<22} {valores['segundos']:>10.3f} s  {valores['llamadas']:>10,}\n"
+        rss = resumen['rss_pico_mb']
+        if rss['proceso'] is not None:
+            texto += f"   • Memoria pico (RSS): {rss['proceso']:.1f} MB"
+            if rss['hijos']:
+                texto += f" | workers: {rss['hijos']:.1f} MB"
+            texto += "\n"
+        return texto
+
+    def exportar_instrumentacion(self, ruta_archivo: str) -> str:
+        """✅ Guarda resumen_instrumentacion() como JSON."""
+        with open(ruta_archivo, 'w', encoding='utf-8') as f:
+            json.dump(self.resumen_instrumentacion(), f, ensure_ascii=False, indent=2)
+        self.log_estado(f"⏱️ Instrumentación guardada", archivo=ruta_archivo)
+        return ruta_archivo
 
     # ========== REPORTES ==========
     def generar_reporte_final(self, pagos: List[Dict[str, Any]]):
@@ -1431,6 +4691,34 @@ class ExcelPaymentProcessorV3:
         for banco, count in top_bancos:
             rep += f"   • {banco}: {count}\n"
         
+        aciertos = sum(self.estadisticas['cache_aciertos'].values())
+        fallos = sum(self.estadisticas['cache_fallos'].values())
+        if aciertos + fallos > 0:
+            rep += f"\n🧠 CACHÉ DE NORMALIZACIÓN:\n"
+            rep += f"   • Aciertos: {aciertos} | Fallos: {fallos} | Tasa: {aciertos / (aciertos + fallos) * 100:.1f}%\n"
+            for funcion in sorted(set(self.estadisticas['cache_aciertos']) | set(self.estadisticas['cache_fallos'])):
+                rep += (
+                    f"   • {funcion}: {self.estadisticas['cache_aciertos'][funcion]} aciertos"
+                    f" / {self.estadisticas['cache_fallos'][funcion]} fallos\n"
+                )
+        
+        if self.instrumentar:
+            rep += "\n" + self.texto_instrumentacion()
+        
+        if self.indice_boletas is not None:
+            origenes = Counter(p['origen_duplicado'] for p in self.estadisticas['pagos_duplicados'])
+            rep += f"\n🗂️ BOLETAS DUPLICADAS ({self.indice_boletas.ruta}):\n"
+            rep += f"   • Consultadas: {self.estadisticas['boletas_consultadas']}\n"
+            rep += f"   • Duplicadas: {self.estadisticas['boletas_duplicadas']}"
+            rep += f" ({self.estadisticas['boletas_descartadas']} descartadas)\n"
+            rep += f"   • Registradas en el índice: {self.estadisticas['boletas_registradas']}\n"
+            for origen, count in origenes.most_common(5):
+                rep += f"   • Ya en {origen}: {count}\n"
+        
+        if self.eventos is not None:
+            self.eventos.vaciar()
+            rep += f"\n🧾 EVENTOS JSONL: ejecución {self.eventos.id_ejecucion} en {self.eventos.directorio}/\n"
+        
         rep += f"""
 ❌ ERRORES: {self.estadisticas['errores']}
 📦 BLOQUES GENERADOS: {self.estadisticas['bloques_generados']}
@@ -1440,41 +4728,484 @@ class ExcelPaymentProcessorV3:
         self.log_estado("✅ Procesamiento completado")
 
 
+# ========== WORKERS ==========
+def _escribir_bloque_cronometrado(
+    bloque: Union[pd.DataFrame, Iterable[Dict[str, Any]]],
+    ruta_archivo: Path,
+    motor_excel: str,
+    columnas: Optional[List[str]] = None
+) -> float:
+    """Escribe un bloque .xlsx y devuelve los segundos que tomó."""
+    inicio = time.perf_counter()
+    escribir_bloque_excel(bloque, ruta_archivo, motor_excel, columnas)
+    return time.perf_counter() - inicio
+
+
+def _procesar_lote_bloques(
+    clase,
+    lote: List[Tuple[int, Tuple]],
+    columnas_info: List[Dict],
+    notas_pago_encabezado: Optional[str],
+    opciones: Dict[str, Any]
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Procesa un lote de bloques en un proceso hijo con estadísticas propias."""
+    processor = clase(**opciones, configurar_logging=False)
+    if lote and isinstance(lote[0][1], np.ndarray):
+        processor._precalcular_montos(np.stack([filas[1] for _, filas in lote]), columnas_info)
+        processor._precalcular_fechas(np.stack([filas[2] for _, filas in lote]), columnas_info)
+    pagos = processor._procesar_bloques(lote, columnas_info, notas_pago_encabezado)
+    if processor.eventos is not None:
+        processor.eventos.cerrar()
+    return pagos, processor.estadisticas
+
+
+def cargar_pagos_columnar(ruta_archivo: str):
+    """
+    Abre una salida Parquet o Arrow como pyarrow.Table.
+    Los archivos .arrow se leen con memory-map, sin copiar ni reparsear.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("La lectura Parquet/Arrow requiere pyarrow: pip install pyarrow") from e
+
+    if str(ruta_archivo).endswith('.arrow'):
+        return pa.ipc.open_file(pa.memory_map(str(ruta_archivo), 'r')).read_all()
+    return pq.read_table(ruta_archivo, memory_map=True)
+
+
+def _procesar_libro_lote(
+    ruta_archivo: str,
+    opciones: Dict[str, Any],
+    modo_lectura: str,
+    archivo_salida: Optional[str]
+) -> Dict[str, Any]:
+    """
+    Extrae un libro dentro del pool del modo lote. Nunca lanza: un error queda
+    en el resultado para que un archivo dañado no detenga el lote.
+    archivo_salida=None devuelve los pagos (salida unificada) en lugar de escribirlos.
+    """
+    inicio = time.perf_counter()
+    resultado: Dict[str, Any] = {'archivo': ruta_archivo, 'pagos': None, 'num_pagos': 0, 'archivos': [], 'error': None}
+
+    try:
+        processor = ExcelPaymentProcessorV3(**opciones, configurar_logging=False)
+        processor._iniciar_procesamiento(ruta_archivo, modo_lectura)
+        bloques, columnas_info, notas_pago_encabezado = processor._abrir_bloques(ruta_archivo, modo_lectura)
+        pagos = processor._procesar_bloques(bloques, columnas_info, notas_pago_encabezado)
+
+        resultado['num_pagos'] = len(pagos)
+        if archivo_salida is None:
+            resultado['pagos'] = pagos
+        elif pagos:
+            resultado['archivos'] = processor.generar_excel_normalizado_en_bloques(pagos, archivo_salida)
+        resultado['estadisticas'] = processor.estadisticas
+        if processor.eventos is not None:
+            processor.eventos.cerrar()
+    except Exception as e:
+        resultado['error'] = f"{type(e).__name__}: {e}"
+
+    resultado['segundos'] = time.perf_counter() - inicio
+    return resultado
+
+
+def _resultado_libro_fallido(ruta_archivo: str, error: BaseException) -> Dict[str, Any]:
+    return {
+        'archivo': ruta_archivo, 'pagos': None, 'num_pagos': 0, 'archivos': [],
+        'error': f"{type(error).__name__}: {error}", 'segundos': 0.0
+    }
+
+
+def _procesar_libros_aislados(
+    tareas: List[Tuple[int, str, Optional[str]]],
+    opciones: Dict[str, Any],
+    modo_lectura: str,
+    workers: Optional[int]
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Procesa cada (índice, libro, destino) en su propio proceso, hasta workers a la vez.
+    Si un proceso muere (segfault, OOM, os._exit) solo falla su libro.
+    """
+    pendientes = deque(tareas)
+    activos: Dict[Any, Tuple[int, str, ProcessPoolExecutor]] = {}
+    limite = workers or os.cpu_count() or 1
+
+    while pendientes or activos:
+        while pendientes and len(activos) < limite:
+            indice, libro, destino = pendientes.popleft()
+            pool = ProcessPoolExecutor(max_workers=1)
+            activos[pool.submit(_procesar_libro_lote, libro, opciones, modo_lectura, destino)] = (indice, libro, pool)
+
+        listos, _ = wait(activos, return_when=FIRST_COMPLETED)
+        for futuro in listos:
+            indice, libro, pool = activos.pop(futuro)
+            pool.shutdown()
+            try:
+                yield indice, futuro.result()
+            except Exception as e:
+                yield indice, _resultado_libro_fallido(libro, e)
+
+
 # ========== FUNCIÓN PRINCIPAL ==========
-def procesar_archivo_v3(entrada: str, salida: str):
-    """Función principal."""
+def procesar_archivo_v3(
+    entrada: str,
+    salida: str,
+    modo_lectura: str = 'pandas',
+    workers: int = 1,
+    usar_cache: bool = True,
+    columnar: bool = False,
+    formatos: Tuple[str, ...] = ('excel',),
+    motor_excel: str = 'openpyxl',
+    write_workers: int = 1,
+    pipeline: bool = False,
+    orden_global: bool = False,
+    cache_libros: bool = False,
+    estado_incremental: Optional[str] = None,
+    archivo_checkpoint: Optional[str] = None,
+    resume: bool = False,
+    eventos_jsonl: bool = False,
+    instrumentar: bool = False,
+    kardex_dsn: Optional[str] = None,
+    indice_boletas: Optional[str] = None,
+    sembrar_boletas: Tuple[str, ...] = (),
+    accion_duplicados: str = 'marcar'
+):
+    """
+    Función principal.
+    pipeline=True lee, normaliza y escribe en paralelo (solo salida Excel;
+    ver ExcelPaymentProcessorV3.procesar_excel_pipeline); con workers,
+    write_workers, columnar, otros formatos, estado_incremental, checkpoints o
+    kardex_dsn lanza ValueError.
+    cache_libros=True reutiliza la hoja parseada en DIRECTORIO_CACHE_LIBROS.
+    estado_incremental: archivo de estado para reprocesar solo los estudiantes
+    que cambiaron; los cambios de pagos se exportan a <salida>_cambios.xlsx.
+    archivo_checkpoint / resume: checkpoints periódicos y reanudación
+    (ver ExcelPaymentProcessorV3.procesar_excel_v3).
+    eventos_jsonl=True registra cada corrección por fila en logs/eventos_<id>_NNN.jsonl.
+    instrumentar=True mide tiempos y llamadas por etapa y los guarda en
+    <salida>_instrumentacion.json (incluida la escritura de bloques).
+    kardex_dsn: además de los bloques, carga los pagos en kardex_pagos
+    (ver ExcelPaymentProcessorV3.cargar_kardex_pagos).
+    indice_boletas: archivo SQLite del índice de boletas (ver IndiceBoletas),
+    sembrado antes con las salidas o respaldos de sembrar_boletas; los pagos
+    con boleta duplicada se exportan a <salida>_duplicados.xlsx y, con
+    accion_duplicados='descartar', no salen en los bloques.
+    """
+    if pipeline:
+        # El pipeline escribe solo bloques .xlsx desde un hilo lector y otro normalizador
+        no_soportadas = [
+            opcion for opcion, activa in (
+                ('workers', workers > 1),
+                ('write_workers', write_workers > 1),
+                ('columnar', columnar),
+                ('formatos', tuple(formatos) != ('excel',)),
+                ('estado_incremental', estado_incremental is not None),
+                ('archivo_checkpoint', archivo_checkpoint is not None),
+                ('resume', resume),
+                ('kardex_dsn', kardex_dsn is not None),
+            ) if activa
+        ]
+        if no_soportadas:
+            raise ValueError(f"Opciones no soportadas con pipeline=True: {', '.join(no_soportadas)}")
+    elif orden_global:
+        raise ValueError("orden_global requiere pipeline=True")
+
     print("🚀 PROCESADOR DE PAGOS V3.1")
     print("="*90)
     print(f"📅 Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"👤 Usuario: AndresSantosSotec")
     print("="*90)
     
-    processor = ExcelPaymentProcessorV3(log_level=logging.INFO)
+    processor = ExcelPaymentProcessorV3(
+        log_level=logging.INFO,
+        usar_cache=usar_cache,
+        cache_libros=CacheLibros() if cache_libros else None,
+        eventos=RegistroEventos() if eventos_jsonl else None,
+        instrumentar=instrumentar,
+        indice_boletas=IndiceBoletas(indice_boletas) if indice_boletas else None,
+        accion_duplicados=accion_duplicados
+    )
+    salida_path = Path(salida)
+    
+    for fuente in sembrar_boletas:
+        nuevas = processor.sembrar_indice_boletas(fuente)
+        print(f"🗂️ Índice de boletas: {nuevas} boletas nuevas desde {fuente}")
+    
+    if pipeline:
+        archivos = processor.procesar_excel_pipeline(
+            entrada, salida, modo_lectura=modo_lectura,
+            orden_global=orden_global, motor_excel=motor_excel
+        )
+        if archivos:
+            print("\n✅ PROCESO COMPLETADO")
+            print(f"📊 Total de pagos: {processor.estadisticas['pagos_extraidos']}")
+            print(f"📦 Archivos generados: {len(archivos)}")
+            for archivo in archivos:
+                print(f"   • {archivo}")
+        else:
+            print("\n❌ NO SE PUDIERON EXTRAER PAGOS")
+        _reporte_duplicados_salida(processor, salida_path)
+        if instrumentar:
+            _exportar_instrumentacion_salida(processor, salida)
+        return
     
-    pagos = processor.procesar_excel_v3(entrada)
+    if estado_incremental:
+        pagos, cambios = processor.procesar_excel_incremental(
+            entrada, estado_incremental, modo_lectura=modo_lectura, columnar=columnar
+        )
+        processor.generar_reporte_cambios(
+            cambios, str(salida_path.with_name(f"{salida_path.stem}_cambios{salida_path.suffix}"))
+        )
+    else:
+        pagos = processor.procesar_excel_v3(
+            entrada, modo_lectura=modo_lectura, workers=workers, columnar=columnar,
+            archivo_checkpoint=archivo_checkpoint, resume=resume
+        )
     
     if pagos:
-        archivos = processor.generar_excel_normalizado_en_bloques(pagos, salida)
+        archivos = processor.generar_excel_normalizado_en_bloques(
+            pagos, salida, formatos=formatos, motor_excel=motor_excel,
+            write_workers=write_workers
+        )
         if archivos:
             print("\n✅ PROCESO COMPLETADO")
             print(f"📊 Total de pagos: {len(pagos)}")
             print(f"📦 Archivos generados: {len(archivos)}")
             for archivo in archivos:
                 print(f"   • {archivo}")
+        if kardex_dsn:
+            carga = processor.cargar_kardex_pagos(pagos, kardex_dsn)
+            print(
+                f"🐘 kardex_pagos: {carga['insertados']} insertados, {carga['actualizados']} actualizados, "
+                f"{carga['sin_estudiante']} sin estudiante, {carga['sin_fecha_o_monto']} sin fecha o monto"
+            )
+            if carga['carnets_sin_estudiante']:
+                print(f"   Carnés sin estudiante_programa: {', '.join(carga['carnets_sin_estudiante'][:20])}"
+                      + (" ..." if len(carga['carnets_sin_estudiante']) > 20 else ""))
     else:
         print("\n❌ NO SE PUDIERON EXTRAER PAGOS")
+    
+    _reporte_duplicados_salida(processor, salida_path)
+    if instrumentar:
+        _exportar_instrumentacion_salida(processor, salida)
+
+
+def _reporte_duplicados_salida(processor: ExcelPaymentProcessorV3, salida_path: Path):
+    """Guarda <salida>_duplicados.xlsx (si hubo duplicados) y cierra el índice de boletas."""
+    if processor.indice_boletas is None:
+        return
+    archivo = processor.generar_reporte_duplicados(
+        str(salida_path.with_name(f"{salida_path.stem}_duplicados.xlsx"))
+    )
+    if archivo:
+        print(f"🗂️ Boletas duplicadas: {processor.estadisticas['boletas_duplicadas']} → {archivo}")
+    processor.indice_boletas.cerrar()
+
+
+def _exportar_instrumentacion_salida(processor: ExcelPaymentProcessorV3, salida: str):
+    """Imprime las etapas (ya con la escritura) y las guarda junto a la salida."""
+    salida_path = Path(salida)
+    print("\n" + processor.texto_instrumentacion())
+    processor.exportar_instrumentacion(str(salida_path.with_name(f"{salida_path.stem}_instrumentacion.json")))
+
+
+def listar_libros(entradas: str) -> List[Path]:
+    """Libros .xlsx/.xlsm de un directorio o de un patrón glob (sin archivos temporales ~$)."""
+    ruta = Path(entradas)
+    if ruta.is_dir():
+        candidatos = list(ruta.glob('*.xlsx')) + list(ruta.glob('*.xlsm'))
+    else:
+        candidatos = [Path(c) for c in glob.glob(entradas, recursive=True)]
+
+    return sorted(
+        c for c in candidatos
+        if c.is_file() and not c.name.startswith('~$') and c.suffix.lower() in ('.xlsx', '.xlsm')
+    )
+
+
+def procesar_lote(
+    entradas: str,
+    directorio_salida: str,
+    workers: Optional[int] = None,
+    unificado: bool = False,
+    nombre_unificado: str = "pagos_normalizados_lote.xlsx",
+    modo_lectura: str = 'pandas',
+    usar_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    ✅ Modo lote: extrae todos los libros de control de un directorio o glob en
+    un pool de procesos (un libro por tarea).
+
+    - unificado=False: cada libro genera sus propios bloques <nombre>_normalizado.xlsx
+    - unificado=True: los pagos de todos los libros se juntan y se dividen en un
+      solo juego de bloques, con la misma regla de integridad por estudiante
+
+    Las estadísticas de los libros se fusionan en un reporte combinado. Cada libro
+    informa su tiempo; un libro que falla se reporta y el resto continúa. Si un
+    proceso del pool muere, el pool queda inutilizable: los libros que no habían
+    terminado se reintentan cada uno en su propio proceso, así solo falla el que
+    lo provocó.
+    """
+    if modo_lectura not in MODOS_LECTURA:
+        raise ValueError(f"Modo de lectura no soportado: {modo_lectura}")
+
+    libros = listar_libros(entradas)
+    print("🚀 PROCESADOR DE PAGOS V3.1 - MODO LOTE")
+    print("="*90)
+    print(f"📂 Entradas: {entradas} ({len(libros)} libros)")
+    print("="*90)
+
+    processor = ExcelPaymentProcessorV3(log_level=logging.INFO, usar_cache=usar_cache)
+    processor.estadisticas['inicio_procesamiento'] = datetime.now()
+    resumen: Dict[str, Any] = {'libros': [], 'archivos': []}
+
+    if not libros:
+        processor.log_estado("⚠️ No se encontraron libros para procesar", "warning", entradas=entradas)
+        return resumen
+
+    salida = Path(directorio_salida)
+    salida.mkdir(parents=True, exist_ok=True)
+
+    # Nombres de salida deterministas; libros con el mismo nombre en carpetas distintas se numeran
+    destinos: List[Optional[str]] = []
+    usados: Dict[str, int] = defaultdict(int)
+    for libro in libros:
+        usados[libro.stem] += 1
+        sufijo = f"_{usados[libro.stem]}" if usados[libro.stem] > 1 else ""
+        destinos.append(None if unificado else str(salida / f"{libro.stem}{sufijo}_normalizado.xlsx"))
+
+    opciones = processor._opciones_worker()
+    pagos_unificados: List[Dict[str, Any]] = []
+
+    resultados: Dict[int, Dict[str, Any]] = {}
+    sin_terminar: List[Tuple[int, str, Optional[str]]] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = [
+            pool.submit(_procesar_libro_lote, str(libro), opciones, modo_lectura, destino)
+            for libro, destino in zip(libros, destinos)
+        ]
+        for i, futuro in enumerate(futuros):
+            try:
+                resultados[i] = futuro.result()
+            except BrokenProcessPool:
+                sin_terminar.append((i, str(libros[i]), destinos[i]))
+            except Exception as e:
+                resultados[i] = _resultado_libro_fallido(str(libros[i]), e)
+
+    if sin_terminar:
+        processor.log_estado(
+            f"⚠️ Un proceso del pool terminó abruptamente; se reintentan los libros pendientes por separado",
+            "warning",
+            libros=len(sin_terminar)
+        )
+        for i, resultado in _procesar_libros_aislados(sin_terminar, opciones, modo_lectura, workers):
+            resultados[i] = resultado
+
+    # Los resultados se incorporan en el orden de los libros
+    for i, libro in enumerate(libros):
+        resultado = resultados[i]
+
+        if resultado['error']:
+            processor.log_estado(
+                f"❌ Libro con error, se omite", "error",
+                archivo=libro.name, error=resultado['error'][:200]
+            )
+        else:
+            processor._fusionar_estadisticas(resultado['estadisticas'])
+            if resultado.get('pagos'):
+                pagos_unificados.extend(resultado['pagos'])
+            resumen['archivos'].extend(resultado['archivos'])
+            processor.log_estado(
+                f"✅ Libro procesado",
+                archivo=libro.name,
+                pagos=resultado['num_pagos'],
+                segundos=round(resultado['segundos'], 2)
+            )
+
+        resumen['libros'].append({
+            'archivo': resultado['archivo'],
+            'pagos': resultado['num_pagos'],
+            'segundos': resultado['segundos'],
+            'error': resultado['error'],
+        })
+
+    if unificado and pagos_unificados:
+        resumen['archivos'] = processor.generar_excel_normalizado_en_bloques(
+            pagos_unificados, str(salida / nombre_unificado)
+        )
+
+    processor.generar_reporte_final(pagos_unificados)
+
+    print(f"\n{'Libro':<50} | {'Pagos':>8} | {'Tiempo (s)':>10} | Estado")
+    print("-" * 90)
+    for libro in resumen['libros']:
+        estado = "OK" if not libro['error'] else f"ERROR: {libro['error'][:40]}"
+        print(f"{Path(libro['archivo']).name[:50]:<50} | {libro['pagos']:>8,} | {libro['segundos']:>10.2f} | {estado}")
+
+    fallidos = sum(1 for libro in resumen['libros'] if libro['error'])
+    print(f"\n📦 Archivos generados: {len(resumen['archivos'])}")
+    if fallidos:
+        print(f"⚠️ Libros con error: {fallidos} de {len(libros)}")
+
+    return resumen
 
 
 def main():
     """Función principal del script."""
-    archivo_entrada = "pagos_originales.xlsx"
-    archivo_salida = "pagos_normalizados_v3.1.xlsx"
+    parser = argparse.ArgumentParser(description="Procesador de pagos V3.1")
+    parser.add_argument('entrada', nargs='?', default="pagos_originales.xlsx", help="Libro de control de pagos")
+    parser.add_argument('salida', nargs='?', default="pagos_normalizados_v3.1.xlsx", help="Archivo de salida")
+    parser.add_argument('--cache-libros', action='store_true', help=f"Reutilizar hojas ya parseadas (guarda la grilla en {DIRECTORIO_CACHE_LIBROS})")
+    parser.add_argument('--limpiar-cache-libros', action='store_true', help="Vaciar la caché de hojas parseadas y salir")
+    parser.add_argument('--lote', metavar='DIRECTORIO_O_GLOB', help="Procesar todos los libros de un directorio o patrón")
+    parser.add_argument('--directorio-salida', default="salida_lote", help="Directorio de salida del modo lote")
+    parser.add_argument('--unificado', action='store_true', help="Modo lote: un solo juego de bloques para todos los libros")
+    parser.add_argument('--workers', type=int, default=None, help="Modo lote: procesos en paralelo (por defecto, uno por CPU)")
+    parser.add_argument('--eventos-jsonl', action='store_true', help="Registrar cada corrección por fila en logs/eventos_<id>_NNN.jsonl")
+    parser.add_argument('--instrumentar', action='store_true', help="Medir tiempos y llamadas por etapa (<salida>_instrumentacion.json)")
+    parser.add_argument('--perfilar', choices=PERFILADORES, help="Perfilar la corrida con cProfile o pyinstrument")
+    parser.add_argument('--kardex-dsn', help="Cargar también los pagos en kardex_pagos (cadena de conexión de Postgres)")
+    parser.add_argument('--indice-boletas', nargs='?', const=str(ARCHIVO_INDICE_BOLETAS), metavar='ARCHIVO_SQLITE',
+                        help=f"Detectar boletas ya registradas (por defecto {ARCHIVO_INDICE_BOLETAS})")
+    parser.add_argument('--sembrar-boletas', nargs='+', default=[], metavar='FUENTE',
+                        help="Salidas previas (.xlsx/.parquet/.arrow) o respaldos pg_dump con que sembrar el índice")
+    parser.add_argument('--descartar-duplicados', action='store_true', help="Quitar de la salida los pagos con boleta duplicada")
+    parser.add_argument('--checkpoint', metavar='ARCHIVO', help="Guardar el avance periódicamente en ARCHIVO (se borra al terminar)")
+    parser.add_argument('--resume', action='store_true', help="Continuar desde el checkpoint (por defecto <salida>.checkpoint)")
+    args = parser.parse_args()
     
-    if not Path(archivo_entrada).exists():
-        print(f"❌ ERROR: Archivo no encontrado '{archivo_entrada}'")
+    if args.limpiar_cache_libros:
+        eliminadas = CacheLibros().limpiar()
+        print(f"🧹 Caché de libros vaciada: {eliminadas} entradas eliminadas de {DIRECTORIO_CACHE_LIBROS}")
         return
     
-    procesar_archivo_v3(archivo_entrada, archivo_salida)
+    if args.lote:
+        procesar_lote(args.lote, args.directorio_salida, workers=args.workers, unificado=args.unificado)
+        return
+    
+    for archivo in [args.entrada, *args.sembrar_boletas]:
+        if not Path(archivo).exists():
+            print(f"❌ ERROR: Archivo no encontrado '{archivo}'")
+            return
+    
+    with perfilar(args.perfilar, str(Path(args.salida).with_suffix(''))):
+        procesar_archivo_v3(
+            args.entrada, args.salida,
+            cache_libros=args.cache_libros,
+            eventos_jsonl=args.eventos_jsonl,
+            instrumentar=args.instrumentar,
+            kardex_dsn=args.kardex_dsn,
+            indice_boletas=args.indice_boletas or (
+                str(ARCHIVO_INDICE_BOLETAS) if args.sembrar_boletas or args.descartar_duplicados else None
+            ),
+            sembrar_boletas=tuple(args.sembrar_boletas),
+            accion_duplicados='descartar' if args.descartar_duplicados else 'marcar',
+            archivo_checkpoint=args.checkpoint or (
+                str(Path(args.salida).with_suffix('.checkpoint')) if args.resume else None
+            ),
+            resume=args.resume
+        )
 
 
 if __name__ == "__main__":
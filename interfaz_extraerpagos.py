@@ -255,6 +255,16 @@ class InterfazExtraerPagos(ctk.CTk):
         )
         label_progreso.pack(anchor="w", padx=15, pady=(15, 10))
         
+        # Reanudar una corrida interrumpida desde su checkpoint
+        self.var_reanudar = ctk.BooleanVar(value=False)
+        self.check_reanudar = ctk.CTkCheckBox(
+            frame_progreso,
+            text="Reanudar desde el último checkpoint",
+            variable=self.var_reanudar,
+            font=ctk.CTkFont(size=self.get_responsive_font_size(12))
+        )
+        self.check_reanudar.pack(anchor="w", padx=15, pady=(0, 10))
+        
         # Barra de progreso
         self.progress_bar = ctk.CTkProgressBar(frame_progreso, mode="indeterminate")
         self.progress_bar.pack(fill="x", padx=15, pady=10)
@@ -383,6 +393,7 @@ class InterfazExtraerPagos(ctk.CTk):
         self.btn_seleccionar.configure(state="disabled")
         self.btn_carpeta.configure(state="disabled")
         self.btn_limpiar.configure(state="disabled")
+        self.check_reanudar.configure(state="disabled")
         self.procesando = True
         
         # Iniciar barra de progreso
@@ -413,6 +424,7 @@ class InterfazExtraerPagos(ctk.CTk):
             # Crear nombre de archivo de salida
             nombre_base = Path(self.archivo_entrada).stem
             archivo_salida = carpeta_salida / f"{nombre_base}_procesado.xlsx"
+            archivo_checkpoint = archivo_salida.with_suffix('.checkpoint')
             
             self.agregar_log(f"📄 Archivo entrada: {self.archivo_entrada}")
             self.agregar_log(f"📂 Carpeta salida: {carpeta_salida}")
@@ -439,7 +451,11 @@ class InterfazExtraerPagos(ctk.CTk):
             self.agregar_log("⏳ Procesando archivo...")
             
             # Procesar
-            pagos = processor.procesar_excel_v3(self.archivo_entrada)
+            pagos = processor.procesar_excel_v3(
+                self.archivo_entrada,
+                archivo_checkpoint=str(archivo_checkpoint),
+                resume=self.var_reanudar.get()
+            )
             
             if pagos:
                 self.agregar_log("")
@@ -501,6 +517,7 @@ class InterfazExtraerPagos(ctk.CTk):
         self.btn_seleccionar.configure(state="normal")
         self.btn_carpeta.configure(state="normal")
         self.btn_limpiar.configure(state="normal")
+        self.check_reanudar.configure(state="normal")
     
     def abrir_carpeta_resultados(self):
         """Abre la carpeta de resultados en el explorador"""
@@ -554,6 +571,7 @@ class InterfazExtraerPagos(ctk.CTk):
         
         self.btn_procesar.configure(state="disabled")
         self.btn_abrir_carpeta.configure(state="disabled")
+        self.var_reanudar.set(False)
         
         self.progress_bar.set(0)
 
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Lector de respaldos pg_dump en formato personalizado (PGDMP, pg_dump -Fc)
+
+Lee el TOC del archivo y descomprime por streaming solo los datos de las
+tablas pedidas, sin restaurar en un servidor. Las filas COPY se decodifican
+a tipos de Python según el CREATE TABLE del propio respaldo.
+
+La memoria queda acotada a un bloque comprimido y una fila, sin importar
+el tamaño del respaldo.
+"""
+
+import argparse
+import gzip
+import re
+import sys
+import zlib
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+MAGICO = b'PGDMP'
+
+# Versiones de archivo (K_VERS_1_x de pg_backup_archiver.h)
+VERSION_MINIMA = (1, 12)
+VERSION_MAXIMA = (1, 16)
+K_VERS_1_14 = (1, 14)   # tableam en el TOC
+K_VERS_1_15 = (1, 15)   # algoritmo de compresión en el encabezado
+K_VERS_1_16 = (1, 16)   # relkind en el TOC
+
+# Algoritmos de compresión (pg_compress_algorithm)
+COMPRESION_NINGUNA = 0
+COMPRESION_GZIP = 1
+COMPRESION_LZ4 = 2
+COMPRESION_ZSTD = 3
+NOMBRES_COMPRESION = {0: 'none', 1: 'gzip', 2: 'lz4', 3: 'zstd'}
+
+# Estado de la posición de los datos de una entrada del TOC
+POSICION_NO_GUARDADA = 1   # respaldo escrito a un pipe: hay que recorrer el archivo
+POSICION_GUARDADA = 2
+SIN_DATOS = 3
+
+BLOQUE_DATOS = 1
+BLOQUE_BLOBS = 3
+
+# Tablas que interesan para validar carnés y boletas
+TABLAS_POR_DEFECTO = ('kardex_pagos', 'estudiante_programa', 'prospectos', 'cuotas_programa_estudiante')
+
+TAMAÑO_LECTURA = 1 << 16
+
+ESCAPES_COPY = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v', '\\': '\\'}
+PATRON_ESCAPE = re.compile(r'\\(?:([0-7]{1,3})|x([0-9A-Fa-f]{1,2})|(.))')
+
+
+class ErrorPgDump(Exception):
+    """Archivo que no es un respaldo PGDMP válido o que no se puede leer."""
+
+
+# ========== CONVERSIÓN DE TIPOS ==========
+def _a_bool(texto: str) -> bool:
+    return texto == 't'
+
+
+def _a_timestamp(texto: str) -> Any:
+    # infinity / -infinity / fechas BC no caben en datetime: se dejan como texto
+    try:
+        return datetime.fromisoformat(texto)
+    except ValueError:
+        return texto
+
+
+def _a_fecha(texto: str) -> Any:
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        return texto
+
+
+def _a_hora(texto: str) -> Any:
+    try:
+        return dt_time.fromisoformat(texto)
+    except ValueError:
+        return texto
+
+
+CONVERSORES: Dict[str, Callable[[str], Any]] = {
+    'smallint': int,
+    'integer': int,
+    'bigint': int,
+    'numeric': Decimal,
+    'real': float,
+    'double precision': float,
+    'boolean': _a_bool,
+    'date': _a_fecha,
+    'timestamp without time zone': _a_timestamp,
+    'timestamp with time zone': _a_timestamp,
+    'time without time zone': _a_hora,
+}
+
+
+def conversor_tipo(tipo_sql: str) -> Callable[[str], Any]:
+    """Conversor de texto COPY para un tipo SQL; los tipos desconocidos quedan como str."""
+    base = re.sub(r'\(.*?\)', '', tipo_sql).strip().lower()
+    if base.endswith('[]'):
+        return str
+    return CONVERSORES.get(base, str)
+
+
+def columnas_create_table(definicion: str) -> Dict[str, str]:
+    """Columna → tipo SQL a partir del CREATE TABLE guardado en el TOC."""
+    inicio = definicion.find('(')
+    fin = definicion.rfind(')')
+    if inicio < 0 or fin < 0:
+        return {}
+
+    columnas = {}
+    for linea in definicion[inicio + 1:fin].split('\n'):
+        linea = linea.strip().rstrip(',')
+        if not linea or linea.upper().startswith(('CONSTRAINT', 'CHECK', 'PRIMARY', 'UNIQUE', 'FOREIGN')):
+            continue
+        match = re.match(r'^("(?:[^"]|"")+"|\S+)\s+(.+?)(?:\s+(?:DEFAULT|NOT NULL|NULL|COLLATE|GENERATED|CONSTRAINT)\b.*)?$', linea)
+        if match:
+            nombre = match.group(1)
+            if nombre.startswith('"'):
+                nombre = nombre[1:-1].replace('""', '"')
+            columnas[nombre] = match.group(2).strip()
+    return columnas
+
+
+def columnas_copy(sentencia_copy: str) -> List[str]:
+    """Columnas en orden a partir de "COPY esquema.tabla (a, b, ...) FROM stdin;"."""
+    match = re.search(r'\((.*)\)\s+FROM\s+stdin', sentencia_copy, re.IGNORECASE | re.DOTALL)
+    if not match:
+        return []
+    return [c.strip().strip('"').replace('""', '"') for c in match.group(1).split(',')]
+
+
+def _desescapar(campo: str) -> str:
+    """Quita los escapes del formato texto de COPY (\\t, \\n, \\\\, octales, \\xhh)."""
+    if '\\' not in campo:
+        return campo
+
+    def reemplazo(match: re.Match) -> str:
+        octal, hexa, simple = match.groups()
+        if octal:
+            return chr(int(octal, 8))
+        if hexa:
+            return chr(int(hexa, 16))
+        return ESCAPES_COPY.get(simple, simple)
+
+    return PATRON_ESCAPE.sub(reemplazo, campo)
+
+
+# ========== LECTOR ==========
+class LectorPgDump:
+    """
+    ✅ Lector de respaldos pg_dump -Fc.
+
+    Al abrir lee solo el encabezado y el TOC (entradas). tablas() lista las
+    tablas con datos y filas(tabla) recorre las filas de una tabla como dicts
+    tipados; con posiciones guardadas salta directo a los datos, y si el
+    respaldo se escribió a un pipe (o viene envuelto en .gz) recorre el
+    archivo saltando los bloques que no se piden.
+    Compresión soportada: ninguna y gzip; lz4 y zstd requieren los paquetes
+    lz4 / zstandard.
+    """
+
+    def __init__(self, ruta_archivo: str):
+        self.ruta = Path(ruta_archivo)
+        self._archivo = self._abrir()
+        try:
+            self._leer_encabezado()
+            self.entradas = self._leer_toc()
+        except Exception:
+            self._archivo.close()
+            raise
+        self._fin_toc = self._archivo.tell()
+
+    def _abrir(self):
+        archivo = open(self.ruta, 'rb')
+        if archivo.read(2) == b'\x1f\x8b':
+            archivo.close()
+            archivo = gzip.open(self.ruta, 'rb')
+        else:
+            archivo.seek(0)
+        return archivo
+
+    def cerrar(self):
+        self._archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+
+    # ----- primitivas del formato -----
+    def _leer(self, n: int) -> bytes:
+        datos = self._archivo.read(n)
+        if len(datos) != n:
+            raise ErrorPgDump(f"Fin de archivo inesperado en {self.ruta.name}")
+        return datos
+
+    def _leer_byte(self) -> int:
+        return self._leer(1)[0]
+
+    def _leer_int(self) -> int:
+        """Entero con byte de signo seguido de int_size bytes little-endian."""
+        signo = self._leer_byte()
+        valor = int.from_bytes(self._leer(self.int_size), 'little')
+        return -valor if signo else valor
+
+    def _leer_str(self) -> Optional[str]:
+        largo = self._leer_int()
+        if largo < 0:
+            return None
+        return self._leer(largo).decode('utf-8', errors='replace')
+
+    def _leer_offset(self) -> Tuple[int, int]:
+        estado = self._leer_byte()
+        posicion = int.from_bytes(self._leer(self.off_size), 'little')
+        return estado, posicion
+
+    # ----- encabezado y TOC -----
+    def _leer_encabezado(self):
+        if self._archivo.read(5) != MAGICO:
+            raise ErrorPgDump(f"{self.ruta.name} no es un respaldo pg_dump en formato personalizado")
+
+        vmaj, vmin, _ = self._leer(3)
+        self.version = (vmaj, vmin)
+        if not VERSION_MINIMA <= self.version <= VERSION_MAXIMA:
+            raise ErrorPgDump(f"Versión de archivo no soportada: {vmaj}.{vmin}")
+
+        self.int_size = self._leer_byte()
+        self.off_size = self._leer_byte()
+        formato = self._leer_byte()
+        if formato != 1:
+            raise ErrorPgDump(f"Formato de archivo no soportado ({formato}): solo pg_dump -Fc")
+
+        if self.version >= K_VERS_1_15:
+            self.compresion = self._leer_byte()
+        else:
+            # Nivel de zlib: 0 = sin compresión, cualquier otro valor = gzip
+            self.compresion = COMPRESION_GZIP if self._leer_int() != 0 else COMPRESION_NINGUNA
+
+        segundos, minutos, hora, dia, mes, año, _ = (self._leer_int() for _ in range(7))
+        self.fecha = datetime(año + 1900, mes + 1, dia, hora, minutos, segundos)
+        self.base_datos = self._leer_str()
+        self.version_servidor = self._leer_str()
+        self.version_pg_dump = self._leer_str()
+
+    def _leer_toc(self) -> List[Dict[str, Any]]:
+        entradas = []
+        for _ in range(self._leer_int()):
+            entrada: Dict[str, Any] = {'dump_id': self._leer_int()}
+            entrada['tiene_datos'] = bool(self._leer_int())
+            self._leer_str()    # tableoid
+            self._leer_str()    # oid
+            entrada['tag'] = self._leer_str()
+            entrada['desc'] = self._leer_str()
+            entrada['seccion'] = self._leer_int()
+            entrada['defn'] = self._leer_str()
+            self._leer_str()    # dropStmt
+            entrada['copy'] = self._leer_str()
+            entrada['esquema'] = self._leer_str()
+            self._leer_str()    # tablespace
+            if self.version >= K_VERS_1_14:
+                self._leer_str()    # tableam
+            if self.version >= K_VERS_1_16:
+                self._leer_int()    # relkind
+            entrada['owner'] = self._leer_str()
+            self._leer_str()    # withOids (siempre "false")
+
+            dependencias = []
+            while (dependencia := self._leer_str()) is not None:
+                dependencias.append(int(dependencia))
+            entrada['dependencias'] = dependencias
+
+            entrada['estado_datos'], entrada['posicion'] = self._leer_offset()
+            entradas.append(entrada)
+        return entradas
+
+    # ----- consultas -----
+    def tablas(self) -> List[str]:
+        """Tablas con datos en el respaldo (esquema.tabla)."""
+        return [f"{e['esquema']}.{e['tag']}" for e in self.entradas if e['desc'] == 'TABLE DATA']
+
+    def _entrada_datos(self, tabla: str) -> Dict[str, Any]:
+        esquema, _, nombre = tabla.rpartition('.')
+        for entrada in self.entradas:
+            if entrada['desc'] == 'TABLE DATA' and entrada['tag'] == nombre and (not esquema or entrada['esquema'] == esquema):
+                return entrada
+        raise KeyError(f"La tabla {tabla} no tiene datos en {self.ruta.name}")
+
+    def esquema_tabla(self, tabla: str) -> List[Tuple[str, str]]:
+        """[(columna, tipo SQL)] en el orden del COPY."""
+        datos = self._entrada_datos(tabla)
+        definicion = next(
+            (e['defn'] for e in self.entradas
+             if e['desc'] == 'TABLE' and e['tag'] == datos['tag'] and e['esquema'] == datos['esquema']),
+            ''
+        )
+        tipos = columnas_create_table(definicion or '')
+        return [(c, tipos.get(c, 'text')) for c in columnas_copy(datos['copy'] or '')]
+
+    # ----- datos -----
+    def _buscar_bloque(self, dump_id: int, entrada: Dict[str, Any]):
+        """Deja el archivo al inicio de los chunks del bloque de dump_id."""
+        if entrada['estado_datos'] == POSICION_GUARDADA and self._archivo.seekable():
+            self._archivo.seek(entrada['posicion'])
+        else:
+            self._archivo.seek(self._fin_toc)
+
+        while True:
+            encabezado = self._archivo.read(1)
+            if not encabezado:
+                raise ErrorPgDump(f"No se encontraron los datos de la entrada {dump_id}")
+            id_bloque = self._leer_int()
+            if encabezado[0] == BLOQUE_DATOS and id_bloque == dump_id:
+                return
+            if encabezado[0] == BLOQUE_BLOBS:
+                raise ErrorPgDump("Los bloques de large objects no están soportados")
+            self._saltar_chunks()
+
+    def _saltar_chunks(self):
+        while (largo := self._leer_int()) != 0:
+            self._archivo.seek(largo, 1)
+
+    def _chunks(self) -> Iterator[bytes]:
+        while (largo := self._leer_int()) != 0:
+            yield self._leer(largo)
+
+    def _descompresor(self) -> Callable[[bytes], bytes]:
+        if self.compresion == COMPRESION_NINGUNA:
+            return lambda datos: datos
+        if self.compresion == COMPRESION_GZIP:
+            return zlib.decompressobj().decompress
+        if self.compresion == COMPRESION_LZ4:
+            try:
+                import lz4.frame
+            except ImportError as e:
+                raise ImportError("El respaldo usa lz4: pip install lz4") from e
+            return lz4.frame.LZ4FrameDecompressor().decompress
+        if self.compresion == COMPRESION_ZSTD:
+            try:
+                import zstandard
+            except ImportError as e:
+                raise ImportError("El respaldo usa zstd: pip install zstandard") from e
+            return zstandard.ZstdDecompressor().decompressobj().decompress
+        raise ErrorPgDump(f"Compresión desconocida: {self.compresion}")
+
+    def lineas_copy(self, tabla: str) -> Iterator[str]:
+        """Líneas COPY (texto) de la tabla, descomprimidas por streaming."""
+        entrada = self._entrada_datos(tabla)
+        if entrada['estado_datos'] == SIN_DATOS:
+            return
+
+        self._buscar_bloque(entrada['dump_id'], entrada)
+        descomprimir = self._descompresor()
+        pendiente = b''
+
+        for chunk in self._chunks():
+            pendiente += descomprimir(chunk)
+            *lineas, pendiente = pendiente.split(b'\n')
+            for linea in lineas:
+                if linea == b'\\.':
+                    return
+                yield linea.decode('utf-8')
+
+        if pendiente and pendiente != b'\\.':
+            yield pendiente.decode('utf-8')
+
+    def filas(self, tabla: str, columnas: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        ✅ Filas de la tabla como dicts con tipos de Python (int, Decimal, date,
+        datetime, bool, str). \\N se convierte en None. columnas limita los
+        campos decodificados.
+        """
+        esquema = self.esquema_tabla(tabla)
+        indices = [
+            (i, nombre, conversor_tipo(tipo))
+            for i, (nombre, tipo) in enumerate(esquema)
+            if columnas is None or nombre in columnas
+        ]
+
+        for linea in self.lineas_copy(tabla):
+            campos = linea.split('\t')
+            yield {
+                nombre: None if campos[i] == '\\N' else conversor(_desescapar(campos[i]))
+                for i, nombre, conversor in indices
+            }
+
+    def resumen(self) -> str:
+        return (
+            f"{self.ruta.name}: base {self.base_datos}, pg_dump {self.version_pg_dump}, "
+            f"archivo {self.version[0]}.{self.version[1]}, compresión {NOMBRES_COMPRESION.get(self.compresion, '?')}, "
+            f"{len(self.entradas)} entradas, {self.fecha:%Y-%m-%d %H:%M}"
+        )
+
+
+def main():
+    """Lista las tablas de un respaldo o muestra filas de las tablas pedidas."""
+    parser = argparse.ArgumentParser(description="Lector de respaldos pg_dump -Fc")
+    parser.add_argument('respaldo', help="Archivo .backup / .dump (formato personalizado)")
+    parser.add_argument('--tablas', nargs='*', default=list(TABLAS_POR_DEFECTO), help="Tablas a leer")
+    parser.add_argument('--muestra', type=int, default=3, help="Filas de ejemplo por tabla")
+    args = parser.parse_args()
+
+    try:
+        lector = LectorPgDump(args.respaldo)
+    except ErrorPgDump as e:
+        print(f"❌ {e}")
+        return 1
+
+    with lector:
+        print(f"📦 {lector.resumen()}")
+        disponibles = {t.rpartition('.')[2] for t in lector.tablas()}
+        for tabla in args.tablas:
+            if tabla not in disponibles:
+                print(f"\n⚠️ {tabla}: sin datos en el respaldo")
+                continue
+            total = 0
+            print(f"\n📋 {tabla}: {', '.join(c for c, _ in lector.esquema_tabla(tabla))}")
+            try:
+                for fila in lector.filas(tabla):
+                    if total < args.muestra:
+                        print(f"   • {fila}")
+                    total += 1
+            except ErrorPgDump as e:
+                print(f"   ⚠️ Lectura interrumpida tras {total:,} filas: {e}")
+                continue
+            print(f"   Total: {total:,} filas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Fixtures compartidas de las pruebas.
+
+Las pruebas de Postgres usan KARDEX_TEST_DSN si está definida; si no, levantan
+un servidor local con pgserver. Sin psycopg o sin servidor se omiten.
+"""
+
+import logging
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from benchmark_pagos import generar_libro_control
+from extraer_pagos import ExcelPaymentProcessorV3
+
+
+@pytest.fixture(scope='session')
+def libro_control(tmp_path_factory) -> Path:
+    """Libro sintético pequeño con todos los formatos de fecha, banco y pagos múltiples."""
+    return generar_libro_control(
+        str(tmp_path_factory.mktemp('libros') / 'control.xlsx'),
+        estudiantes=120, años=(2023, 2024), proporcion_multiples=0.1, seed=7
+    )
+
+
+@pytest.fixture
+def nuevo_procesador():
+    """Fábrica de procesadores silenciosos y sin archivo de log."""
+    def crear(**opciones) -> ExcelPaymentProcessorV3:
+        return ExcelPaymentProcessorV3(log_level=logging.WARNING, configurar_logging=False, **opciones)
+    return crear
+
+
+@pytest.fixture(scope='session')
+def servidor_postgres(tmp_path_factory):
+    pytest.importorskip('psycopg')
+    dsn = os.environ.get('KARDEX_TEST_DSN')
+    if dsn:
+        yield dsn
+        return
+
+    pgserver = pytest.importorskip('pgserver')
+    # Sus mensajes de cierre llegan cuando pytest ya cerró la captura
+    logging.getLogger('pgserver').setLevel(logging.WARNING)
+    try:
+        servidor = pgserver.get_server(str(tmp_path_factory.mktemp('pgdata')), cleanup_mode='stop')
+    except Exception as e:
+        pytest.skip(f"No se pudo iniciar Postgres local: {e}")
+    yield servidor.get_uri()
+    servidor.cleanup()
+
+
+@pytest.fixture
+def dsn_postgres(servidor_postgres):
+    """Base de datos vacía y propia de la prueba."""
+    import psycopg
+    from psycopg.conninfo import make_conninfo
+
+    nombre = f"kardex_prueba_{uuid.uuid4().hex[:8]}"
+    with psycopg.connect(servidor_postgres, autocommit=True) as conexion:
+        conexion.execute(f'CREATE DATABASE "{nombre}"')
+    yield make_conninfo(servidor_postgres, dbname=nombre)
+    with psycopg.connect(servidor_postgres, autocommit=True) as conexion:
+        conexion.execute(f'DROP DATABASE "{nombre}" WITH (FORCE)')
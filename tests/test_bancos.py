@@ -0,0 +1,82 @@
+"""Paridad del detector de bancos compilado con el recorrido original patrón por patrón."""
+
+import re
+import subprocess
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+pytestmark = pytest.mark.filterwarnings('ignore:Cell .* is marked as a date:UserWarning')
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+CASOS_BORDE = [
+    'G & T', 'g&t continental', 'G&T', 'G  &  T Continental', 'gyt',
+    'visa net', 'VisaNet', 'VISA NET', 'Visa', 'visa/bi', 'Visa Net BI',
+    'n/a', 'N/A', 'NA', '-', '0', 'null', 'None', 'NULL', '', '   ', None, float('nan'), 0, 12345,
+    'BI', 'bi', ' bi ', 'bi/bac', 'Banco BI', 'deposito bi 123', 'bino', 'abi', 'BI-123',
+    'Banco Industrial', 'INDUSTRIAL', 'BAC', 'BAC Credomatic', 'Credomatic', 'Bantrab', 'BANRURAL',
+    'Promerica', 'Promérica', 'PROMÉRICA', 'Crédomatic', 'BÍ', 'Bí', 'Banrural é', 'ábac',
+    'MasterCard', 'Master Card', 'MASTERCARD', 'Neo Link', 'NEOLINK', 'neolink bi',
+    'No especificado', 'Efectivo', 'transferencia\nbi', 'BAC / BI',
+]
+
+
+def detectar_banco_por_patron(procesador, texto):
+    """detectar_banco original: re.search de cada patrón en orden (sin estadísticas)."""
+    if not texto or procesador._is_empty(texto):
+        return "No especificado"
+    t = str(texto).strip().lower()
+    if t in ['n/a', 'na', '0', '-', 'null', 'none']:
+        return "No especificado"
+    for patron, nombre_banco in procesador.patrones_bancos:
+        if re.search(patron, t, re.IGNORECASE):
+            return nombre_banco
+    return "No especificado"
+
+
+def _bancos_de_libros_muestra():
+    """Columna banco de los libros de muestra versionados en el repositorio."""
+    archivos = subprocess.run(
+        ['git', 'ls-files', '*.xlsx'], cwd=RAIZ, capture_output=True, text=True, check=True
+    ).stdout.split('\n')
+    valores = set()
+    for archivo in archivos:
+        if not archivo or Path(archivo).name.startswith('~$'):
+            continue
+        try:
+            df = pd.read_excel(RAIZ / archivo, dtype=object)
+        except Exception:
+            continue
+        if 'banco' in df.columns:
+            valores.update(df['banco'].dropna().astype(str))
+    return valores
+
+
+@pytest.fixture(scope='module')
+def textos_banco(libro_control):
+    textos = _bancos_de_libros_muestra()
+    # Celdas crudas del libro de control sintético (incluye variantes de MEZCLA_BANCOS)
+    grilla = pd.read_excel(libro_control, dtype=object, header=None).to_numpy().ravel()
+    textos.update(v for v in grilla if isinstance(v, str))
+    return sorted(textos) + CASOS_BORDE
+
+
+def test_detectar_banco_igual_al_recorrido_original(textos_banco, nuevo_procesador):
+    procesador = nuevo_procesador(usar_cache=False)
+    assert len(textos_banco) > len(CASOS_BORDE)
+    for texto in textos_banco:
+        assert procesador.detectar_banco(texto) == detectar_banco_por_patron(procesador, texto), texto
+
+
+def test_detectar_bancos_en_lote(textos_banco, nuevo_procesador):
+    individual = nuevo_procesador(usar_cache=False)
+    lote = nuevo_procesador(usar_cache=False)
+
+    esperado = [individual.detectar_banco(texto) for texto in textos_banco]
+    assert lote.detectar_bancos(textos_banco) == esperado
+    assert lote.detectar_bancos(textos_banco) == esperado
+    assert dict(lote.estadisticas['bancos_detectados']) == {
+        banco: 2 * cantidad for banco, cantidad in individual.estadisticas['bancos_detectados'].items()
+    }
@@ -0,0 +1,149 @@
+"""Compuerta de regresiones: dispersión, comparación de corridas y base fija."""
+
+import pytest
+
+import benchmark_pagos
+from benchmark_pagos import (
+    ETAPAS_SUITE, _dispersion_relativa, buscar_base, cargar_historial, comparar_con_base,
+    comparar_corridas, guardar_corrida
+)
+
+
+def corrida(tiempos=(1.0, 1.0, 1.0), rss=100.0, base=False, escenario='sintetico_1000'):
+    return {
+        'fecha': '2026-01-01T00:00:00',
+        'modo_lectura': 'streaming',
+        'repeticiones': len(tiempos),
+        'base': base,
+        'escenarios': {
+            escenario: {
+                'pagos': 10,
+                'tiempos': {etapa: list(tiempos) for etapa in ETAPAS_SUITE},
+                'rss_pico_mb': rss,
+            }
+        },
+    }
+
+
+def estados(filas, etapa=None):
+    return {f['etapa']: f['estado'] for f in filas if etapa is None or f['etapa'] == etapa}
+
+
+def test_dispersion_relativa():
+    assert _dispersion_relativa([2.0]) == 0.0
+    assert _dispersion_relativa([0.0, 0.0, 0.0]) == 0.0
+    assert _dispersion_relativa([1.0, 1.0, 1.0]) == 0.0
+    # mediana 2, desvíos |1-2|,|2-2|,|4-2| -> MAD 1 -> 0.5
+    assert _dispersion_relativa([1.0, 2.0, 4.0]) == pytest.approx(0.5)
+    assert _dispersion_relativa([10.0, 11.0, 9.0, 10.0]) == pytest.approx(0.05)
+
+
+def test_comparar_corridas_regresion_mejora_ok():
+    base = corrida((1.0, 1.0, 1.0))
+
+    assert set(estados(comparar_corridas(base, corrida((1.5, 1.5, 1.5)))).values()) == {'REGRESIÓN', 'OK'}
+    assert estados(comparar_corridas(base, corrida((1.5, 1.5, 1.5))))['lectura'] == 'REGRESIÓN'
+    assert estados(comparar_corridas(base, corrida((0.5, 0.5, 0.5))))['lectura'] == 'MEJORA'
+    assert estados(comparar_corridas(base, corrida((1.05, 1.05, 1.05))))['lectura'] == 'OK'
+
+    fila = comparar_corridas(base, corrida((1.5, 1.5, 1.5)))[0]
+    assert fila['cambio_pct'] == pytest.approx(50.0)
+    assert fila['tolerancia_pct'] == pytest.approx(benchmark_pagos.UMBRAL_REGRESION_PCT)
+    assert fila['unidad'] == 's'
+
+
+def test_comparar_corridas_tolerancia_por_ruido():
+    # MAD relativa 0.2 -> tolerancia 3 × 20 % = 60 %: un +50 % es ruido
+    base = corrida((0.8, 1.0, 1.2))
+    filas = comparar_corridas(base, corrida((1.5, 1.5, 1.5)))
+    assert estados(filas)['lectura'] == 'OK'
+    assert filas[0]['tolerancia_pct'] == pytest.approx(benchmark_pagos.FACTOR_RUIDO * 20)
+
+    assert estados(comparar_corridas(base, corrida((2.0, 2.0, 2.0))))['lectura'] == 'REGRESIÓN'
+
+
+def test_comparar_corridas_minimo_segundos():
+    base = corrida((0.01, 0.01, 0.01))
+    # +100 % pero solo 10 ms: por debajo del piso absoluto
+    assert estados(comparar_corridas(base, corrida((0.02, 0.02, 0.02))))['lectura'] == 'OK'
+    assert estados(comparar_corridas(base, corrida((0.02, 0.02, 0.02)), minimo_segundos=0.005))['lectura'] == 'REGRESIÓN'
+
+
+def test_comparar_corridas_memoria():
+    base = corrida(rss=100.0)
+    assert estados(comparar_corridas(base, corrida(rss=120.0)), 'memoria_pico') == {'memoria_pico': 'REGRESIÓN'}
+    assert estados(comparar_corridas(base, corrida(rss=110.0)), 'memoria_pico') == {'memoria_pico': 'OK'}
+    assert estados(comparar_corridas(base, corrida(rss=80.0)), 'memoria_pico') == {'memoria_pico': 'MEJORA'}
+    assert estados(comparar_corridas(base, corrida(rss=110.0), umbral_memoria_pct=5.0), 'memoria_pico') == {
+        'memoria_pico': 'REGRESIÓN'
+    }
+    assert 'memoria_pico' not in estados(comparar_corridas(base, corrida(rss=None)))
+
+
+def test_comparar_corridas_omite_escenarios_sin_par():
+    assert comparar_corridas(corrida(), corrida(escenario='sintetico_10000')) == []
+
+
+def test_buscar_base_no_usa_la_corrida_anterior():
+    assert buscar_base([]) is None
+    assert buscar_base([corrida(), corrida()]) is None
+
+    fija = corrida(base=True)
+    assert buscar_base([corrida(), fija, corrida()]) is fija
+
+
+@pytest.fixture
+def suite_falsa(monkeypatch):
+    """Reemplaza benchmark_suite por corridas predefinidas (sin medir nada)."""
+    corridas = []
+
+    def falsa(tamaños, repeticiones=3, modo_lectura='streaming', directorio='benchmarks',
+              archivo_resultados=None, etiqueta='', base=False, guardar=True):
+        actual = dict(corridas.pop(0), base=base, etiqueta=etiqueta)
+        if archivo_resultados and guardar:
+            guardar_corrida(actual, archivo_resultados)
+        return actual
+
+    monkeypatch.setattr(benchmark_pagos, 'benchmark_suite', falsa)
+    return corridas
+
+
+def test_compuerta_sin_base_falla_sin_medir(tmp_path, suite_falsa):
+    resultados = tmp_path / 'resultados.json'
+    guardar_corrida(corrida(), resultados)
+
+    assert comparar_con_base([1000], archivo_resultados=resultados) == 1
+    assert len(cargar_historial(resultados)) == 1
+
+
+def test_compuerta_base_fija_y_corridas_fallidas(tmp_path, suite_falsa):
+    resultados = tmp_path / 'resultados.json'
+
+    suite_falsa.append(corrida((1.0, 1.0, 1.0)))
+    assert comparar_con_base([1000], archivo_resultados=resultados, fijar_base=True) == 0
+    assert [c['base'] for c in cargar_historial(resultados)] == [True]
+
+    # Una regresión falla y no se guarda; repetirla sigue fallando contra la misma base
+    suite_falsa.extend([corrida((1.5, 1.5, 1.5)), corrida((1.5, 1.5, 1.5))])
+    assert comparar_con_base([1000], archivo_resultados=resultados) == 1
+    assert comparar_con_base([1000], archivo_resultados=resultados) == 1
+    assert len(cargar_historial(resultados)) == 1
+
+    suite_falsa.append(corrida((1.02, 1.02, 1.02)))
+    assert comparar_con_base([1000], archivo_resultados=resultados) == 0
+    historial = cargar_historial(resultados)
+    assert [c['base'] for c in historial] == [True, False]
+    assert buscar_base(historial) is not None and buscar_base(historial)['base']
+
+    # La corrida aprobada no reemplaza a la base
+    suite_falsa.append(corrida((1.2, 1.2, 1.2)))
+    assert comparar_con_base([1000], archivo_resultados=resultados) == 1
+
+
+def test_compuerta_sin_escenarios_en_comun(tmp_path, suite_falsa):
+    resultados = tmp_path / 'resultados.json'
+    guardar_corrida(corrida(base=True), resultados)
+    suite_falsa.append(corrida(escenario='sintetico_10000'))
+
+    assert comparar_con_base([10000], archivo_resultados=resultados) == 1
+    assert len(cargar_historial(resultados)) == 1
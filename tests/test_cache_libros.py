@@ -0,0 +1,33 @@
+"""Caché en disco de hojas parseadas (CacheLibros)."""
+
+from datetime import datetime, time
+
+import numpy as np
+import pandas as pd
+
+from extraer_pagos import CacheLibros
+
+
+def test_ida_y_vuelta(tmp_path):
+    cache = CacheLibros(tmp_path)
+    df = pd.DataFrame(
+        [['ASM-2020001', 1500, 850.5, True], [datetime(2024, 1, 31, 8, 30), time(9, 15), None, 'ñandú €']],
+        dtype=object
+    )
+    assert cache.guardar('libro', df)
+
+    cargado = cache.cargar('libro')
+    for esperado, obtenido in zip(df.to_numpy().ravel(), cargado.to_numpy().ravel()):
+        if esperado is None:
+            assert obtenido is None or (isinstance(obtenido, float) and np.isnan(obtenido))
+        else:
+            assert obtenido == esperado and type(obtenido) is type(esperado)
+
+
+def test_texto_no_codificable_omite_la_cache(tmp_path):
+    cache = CacheLibros(tmp_path)
+    df = pd.DataFrame([['normal', 'surrogate \ud800 suelto']], dtype=object)
+
+    assert cache.guardar('libro', df) is False
+    assert cache.cargar('libro') is None
+    assert not any(tmp_path.iterdir())
@@ -0,0 +1,67 @@
+"""La caché de normalización no cambia pagos, estadísticas ni advertencias."""
+
+import logging
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+# Tiempos y contadores de la propia caché dependen de la corrida, no del contenido del libro
+CLAVES_DE_CORRIDA = {'inicio_procesamiento', 'etapas_segundos', 'etapas_llamadas', 'cache_aciertos', 'cache_fallos'}
+
+
+def _procesar(nuevo_procesador, libro, caplog, **opciones):
+    modo_lectura = opciones.pop('modo_lectura')
+    procesador = nuevo_procesador(**opciones)
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        pagos = pd.DataFrame(procesador.procesar_excel_v3(str(libro), modo_lectura=modo_lectura))
+    advertencias = Counter(r.getMessage() for r in caplog.records if r.levelno >= logging.WARNING)
+    estadisticas = {
+        clave: dict(valor) if isinstance(valor, dict) else valor
+        for clave, valor in procesador.estadisticas.items()
+        if clave not in CLAVES_DE_CORRIDA
+    }
+    return procesador, pagos, estadisticas, advertencias
+
+
+@pytest.mark.parametrize('modo_lectura', ['pandas', 'streaming'])
+@pytest.mark.parametrize('tamaño_cache', [4096, 8], ids=['cache-grande', 'cache-con-desalojos'])
+def test_cache_igual_a_sin_cache(libro_control, nuevo_procesador, caplog, modo_lectura, tamaño_cache):
+    sin_cache, pagos_base, estadisticas_base, advertencias_base = _procesar(
+        nuevo_procesador, libro_control, caplog, modo_lectura=modo_lectura, usar_cache=False
+    )
+    con_cache, pagos, estadisticas, advertencias = _procesar(
+        nuevo_procesador, libro_control, caplog,
+        modo_lectura=modo_lectura, usar_cache=True, tamaño_cache=tamaño_cache
+    )
+
+    assert not sin_cache.estadisticas['cache_aciertos']
+    assert sum(con_cache.estadisticas['cache_aciertos'].values()) > 0
+
+    # El libro ejercita las estadísticas que la caché debe reaplicar en cada acierto
+    for clave in ('bancos_detectados', 'planes_detectados', 'planes_no_mapeados'):
+        assert estadisticas_base[clave]
+    for clave in ('fechas_parseadas', 'fechas_fallidas', 'fechas_no_disponibles'):
+        assert estadisticas_base[clave] > 0
+    assert any('Plan NO mapeado' in mensaje for mensaje in advertencias_base)
+
+    pd.testing.assert_frame_equal(pagos, pagos_base)
+    assert estadisticas == estadisticas_base
+    assert advertencias == advertencias_base
+
+
+def test_acierto_repite_estadisticas_y_advertencias(nuevo_procesador, caplog):
+    procesador = nuevo_procesador(usar_cache=True)
+
+    with caplog.at_level(logging.WARNING):
+        resultados = [procesador.obtener_programa('Plan nuevo') for _ in range(3)]
+        procesador.detectar_banco('banrural')
+        procesador.detectar_banco('banrural')
+
+    assert len(set(resultados)) == 1
+    assert procesador.estadisticas['cache_aciertos']['obtener_programa'] == 2
+    assert procesador.estadisticas['cache_aciertos']['detectar_banco'] == 1
+    assert procesador.estadisticas['planes_no_mapeados']['Plan nuevo'] == 3
+    assert sum(procesador.estadisticas['bancos_detectados'].values()) == 2
+    assert sum('Plan NO mapeado' in r.getMessage() for r in caplog.records) == 3
@@ -0,0 +1,123 @@
+"""Una corrida interrumpida y reanudada desde el checkpoint da el mismo resultado que una completa."""
+
+import pickle
+
+import pandas as pd
+import pytest
+
+from extraer_pagos import RegistroPagos, VERSION_CHECKPOINT
+
+# Tiempos y aciertos de caché dependen de la corrida, no del contenido del libro
+CLAVES_DE_CORRIDA = {'inicio_procesamiento', 'etapas_segundos', 'cache_aciertos', 'cache_fallos'}
+
+
+def _estadisticas(procesador):
+    return {
+        clave: dict(valor) if isinstance(valor, dict) else valor
+        for clave, valor in procesador.estadisticas.items()
+        if clave not in CLAVES_DE_CORRIDA
+    }
+
+
+class Corte(BaseException):
+    """Como un Ctrl+C: no lo atrapan los except Exception del procesador."""
+
+
+def _interrumpir_en(procesador, llamada):
+    """El bloque de estudiante número `llamada` corta la corrida."""
+    original = procesador._procesar_bloque_estudiante
+    llamadas = [0]
+
+    def fallar(*args, **kwargs):
+        llamadas[0] += 1
+        if llamadas[0] == llamada:
+            raise Corte()
+        return original(*args, **kwargs)
+
+    procesador._procesar_bloque_estudiante = fallar
+
+
+def _leer_diario(ruta):
+    registros = []
+    with open(ruta, 'rb') as f:
+        while True:
+            try:
+                registros.append(pickle.load(f))
+            except EOFError:
+                return registros
+
+
+@pytest.mark.parametrize('modo_lectura', ['pandas', 'streaming'])
+@pytest.mark.parametrize('columnar', [False, True], ids=['lista', 'columnar'])
+def test_reanudar_igual_a_corrida_completa(libro_control, nuevo_procesador, tmp_path, modo_lectura, columnar):
+    completo = nuevo_procesador()
+    pagos_completos = completo.procesar_excel_v3(str(libro_control), modo_lectura=modo_lectura, columnar=columnar)
+    assert len(pagos_completos) > 0
+
+    checkpoint = tmp_path / 'avance.ckpt'
+    interrumpido = nuevo_procesador()
+    _interrumpir_en(interrumpido, 75)
+    with pytest.raises(Corte):
+        interrumpido.procesar_excel_v3(
+            str(libro_control), modo_lectura=modo_lectura, columnar=columnar,
+            archivo_checkpoint=str(checkpoint), checkpoint_bloques=20
+        )
+    assert checkpoint.exists()
+
+    diario = _leer_diario(checkpoint)
+    assert diario[0]['version'] == VERSION_CHECKPOINT
+    avances = diario[1:]
+    assert len(avances) == 3
+    # Cada registro lleva solo lo de su tramo: el diario no crece en forma cuadrática
+    for avance in avances:
+        assert len(avance['estadisticas']['carnets_procesados']) == 20
+        assert avance['estadisticas']['estudiantes_procesados'] == 20
+
+    reanudado = nuevo_procesador()
+    pagos_reanudados = reanudado.procesar_excel_v3(
+        str(libro_control), modo_lectura=modo_lectura, columnar=columnar,
+        archivo_checkpoint=str(checkpoint), checkpoint_bloques=20, resume=True
+    )
+    assert not checkpoint.exists()
+
+    if columnar:
+        assert isinstance(pagos_reanudados, RegistroPagos)
+        pagos_completos, pagos_reanudados = list(pagos_completos), list(pagos_reanudados)
+    pd.testing.assert_frame_equal(pd.DataFrame(pagos_reanudados), pd.DataFrame(pagos_completos))
+    assert _estadisticas(reanudado) == _estadisticas(completo)
+
+
+def test_reanudar_con_registro_truncado(libro_control, nuevo_procesador, tmp_path):
+    completo = nuevo_procesador()
+    pagos_completos = completo.procesar_excel_v3(str(libro_control))
+
+    checkpoint = tmp_path / 'avance.ckpt'
+    interrumpido = nuevo_procesador()
+    _interrumpir_en(interrumpido, 50)
+    with pytest.raises(Corte):
+        interrumpido.procesar_excel_v3(str(libro_control), archivo_checkpoint=str(checkpoint), checkpoint_bloques=10)
+
+    # Corte durante la escritura del último registro
+    contenido = checkpoint.read_bytes()
+    checkpoint.write_bytes(contenido[:-15])
+
+    reanudado = nuevo_procesador()
+    pagos = reanudado.procesar_excel_v3(
+        str(libro_control), archivo_checkpoint=str(checkpoint), checkpoint_bloques=10, resume=True
+    )
+    pd.testing.assert_frame_equal(pd.DataFrame(pagos), pd.DataFrame(pagos_completos))
+    assert _estadisticas(reanudado) == _estadisticas(completo)
+
+
+def test_checkpoint_de_otro_libro_se_ignora(libro_control, nuevo_procesador, tmp_path):
+    checkpoint = tmp_path / 'avance.ckpt'
+    with open(checkpoint, 'wb') as f:
+        pickle.dump({'version': VERSION_CHECKPOINT, 'huella_archivo': 'otra'}, f)
+        pickle.dump({'siguiente_fila': 99, 'pagos': [{'carnet': 'X'}], 'estadisticas': {}}, f)
+
+    completo = nuevo_procesador()
+    pagos_completos = completo.procesar_excel_v3(str(libro_control))
+
+    reanudado = nuevo_procesador()
+    pagos = reanudado.procesar_excel_v3(str(libro_control), archivo_checkpoint=str(checkpoint), resume=True)
+    pd.testing.assert_frame_equal(pd.DataFrame(pagos), pd.DataFrame(pagos_completos))
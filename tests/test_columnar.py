@@ -0,0 +1,132 @@
+"""Salidas Parquet / Arrow: tipos, año nulo y mismo contenido que los bloques Excel."""
+
+import builtins
+import logging
+import sys
+
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+from extraer_pagos import COLUMNAS_DICCIONARIO, ExcelPaymentProcessorV3, cargar_pagos_columnar
+
+@pytest.fixture(scope='module')
+def salidas(libro_control, tmp_path_factory):
+    """Pagos del libro de control exportados a Excel, Parquet y Arrow."""
+    procesador = ExcelPaymentProcessorV3(log_level=logging.WARNING, configurar_logging=False, tamaño_bloque=700)
+    pagos = procesador.procesar_excel_v3(str(libro_control))
+    directorio = tmp_path_factory.mktemp('columnar')
+    archivos = procesador.generar_excel_normalizado_en_bloques(
+        pagos, str(directorio / 'pagos.xlsx'), formatos=('excel', 'parquet', 'arrow')
+    )
+    return pagos, directorio, archivos
+
+
+def _texto(serie):
+    return pd.Series([None if pd.isna(v) else str(v) for v in serie.astype(object)], dtype=object)
+
+
+def _normalizar(df):
+    """Columnas comparables entre la hoja Excel y la tabla columnar."""
+    return pd.DataFrame({
+        'carnet': _texto(df['carnet']),
+        'numero_boleta': _texto(df['numero_boleta']),
+        'monto': df['monto'].astype(float),
+        'fecha_pago': _texto(pd.to_datetime(df['fecha_pago']).dt.strftime('%Y-%m-%d')),
+        'banco': _texto(df['banco']),
+        'concepto': _texto(df['concepto']),
+        'tipo_pago': _texto(df['tipo_pago']),
+        'mes_pago': _texto(df['mes_pago']),
+        'año': df['año'].astype('Int64'),
+    }).reset_index(drop=True)
+
+
+def test_archivos_generados(salidas):
+    _, directorio, archivos = salidas
+    assert str(directorio / 'pagos.parquet') in archivos
+    assert str(directorio / 'pagos.arrow') in archivos
+    assert any(a.endswith('_parte_1_de_4.xlsx') for a in archivos)
+
+
+@pytest.mark.parametrize('extension', ['parquet', 'arrow'])
+def test_tipos_de_columna(salidas, extension):
+    pagos, directorio, _ = salidas
+    tabla = cargar_pagos_columnar(str(directorio / f'pagos.{extension}'))
+
+    assert tabla.num_rows == len(pagos)
+    assert tabla.schema.field('fecha_pago').type == pa.date32()
+    assert tabla.schema.field('monto').type == pa.float64()
+    assert tabla.schema.field('año').type == pa.int32()
+    for columna in COLUMNAS_DICCIONARIO:
+        if columna in tabla.column_names:
+            assert pa.types.is_dictionary(tabla.schema.field(columna).type), columna
+    for columna in ('carnet', 'numero_boleta'):
+        assert tabla.schema.field(columna).type == pa.string()
+
+
+@pytest.mark.parametrize('extension', ['parquet', 'arrow'])
+def test_año_nulo_se_conserva(salidas, extension):
+    pagos, directorio, _ = salidas
+    sin_año = sum(1 for pago in pagos if pago.get('año') is None)
+    assert sin_año > 0
+
+    tabla = cargar_pagos_columnar(str(directorio / f'pagos.{extension}'))
+    assert tabla['año'].null_count == sin_año
+    # Se lee como entero nullable, no como float con NaN
+    assert str(tabla.to_pandas(types_mapper=pd.ArrowDtype)['año'].dtype) == 'int32[pyarrow]'
+
+
+def test_parquet_y_arrow_iguales(salidas):
+    _, directorio, _ = salidas
+    parquet = cargar_pagos_columnar(str(directorio / 'pagos.parquet'))
+    arrow = cargar_pagos_columnar(str(directorio / 'pagos.arrow'))
+    assert parquet.to_pandas().equals(arrow.to_pandas())
+
+
+@pytest.mark.parametrize('extension', ['parquet', 'arrow'])
+def test_mismo_contenido_que_excel(salidas, extension):
+    _, directorio, archivos = salidas
+    partes = [a for a in archivos if a.endswith('.xlsx')]
+    excel = pd.concat([pd.read_excel(parte, dtype=object) for parte in partes], ignore_index=True)
+    tabla = cargar_pagos_columnar(str(directorio / f'pagos.{extension}')).to_pandas()
+
+    pd.testing.assert_frame_equal(_normalizar(tabla), _normalizar(excel))
+
+
+def test_registro_columnar_igual_a_lista(libro_control, nuevo_procesador, salidas, tmp_path):
+    _, directorio, _ = salidas
+    procesador = nuevo_procesador()
+    registro = procesador.procesar_excel_v3(str(libro_control), columnar=True)
+    procesador.generar_excel_normalizado_en_bloques(registro, str(tmp_path / 'pagos.xlsx'), formatos=('parquet',))
+
+    esperado = cargar_pagos_columnar(str(directorio / 'pagos.parquet'))
+    assert cargar_pagos_columnar(str(tmp_path / 'pagos.parquet')).equals(esperado)
+
+
+def _simular_sin_pyarrow(monkeypatch):
+    """Desde aquí, importar pyarrow falla como en un entorno sin la dependencia."""
+    importar = builtins.__import__
+
+    def importar_sin_pyarrow(nombre, *args, **kwargs):
+        if nombre == 'pyarrow' or nombre.startswith('pyarrow.'):
+            raise ImportError(f"No module named '{nombre}'")
+        return importar(nombre, *args, **kwargs)
+
+    for modulo in [m for m in sys.modules if m == 'pyarrow' or m.startswith('pyarrow.')]:
+        monkeypatch.delitem(sys.modules, modulo)
+    monkeypatch.setattr(builtins, '__import__', importar_sin_pyarrow)
+
+
+def test_sin_pyarrow_error_claro(salidas, nuevo_procesador, tmp_path, monkeypatch):
+    pagos, directorio, _ = salidas
+    procesador = nuevo_procesador()
+    # pandas también usa pyarrow al ordenar: el DataFrame se arma antes de quitarlo
+    df_export = procesador._preparar_df_export(pagos)
+
+    _simular_sin_pyarrow(monkeypatch)
+
+    with pytest.raises(ImportError, match='pip install pyarrow'):
+        cargar_pagos_columnar(str(directorio / 'pagos.parquet'))
+    with pytest.raises(ImportError, match='pip install pyarrow'):
+        procesador.generar_archivo_columnar(df_export, tmp_path / 'pagos.parquet', 'parquet')
@@ -0,0 +1,67 @@
+"""Los motores de escritura .xlsx producen las mismas hojas y anchos de columna."""
+
+import openpyxl
+import pytest
+
+from extraer_pagos import ExcelPaymentProcessorV3
+
+pytest.importorskip('xlsxwriter')
+
+
+def _leer_hojas(archivos):
+    hojas = []
+    for archivo in archivos:
+        hoja = openpyxl.load_workbook(archivo)['Pagos']
+        anchos = {}
+        for dimension in hoja.column_dimensions.values():
+            for columna in range(dimension.min, dimension.max + 1):
+                anchos[columna] = round(dimension.width, 4)
+        hojas.append(([tuple(celda.value for celda in fila) for fila in hoja.iter_rows()], anchos))
+    return hojas
+
+
+def _exportar(nuevo_procesador, libro, directorio, motor_excel, columnar=False, write_workers=1):
+    procesador = nuevo_procesador(tamaño_bloque=700)
+    pagos = procesador.procesar_excel_v3(str(libro), columnar=columnar)
+    directorio.mkdir()
+    archivos = procesador.generar_excel_normalizado_en_bloques(
+        pagos, str(directorio / 'salida.xlsx'), motor_excel=motor_excel, write_workers=write_workers
+    )
+    assert len(archivos) > 1
+    return [a.rsplit('/', 1)[-1] for a in archivos], _leer_hojas(archivos)
+
+
+@pytest.mark.parametrize('columnar', [False, True], ids=['dicts', 'registro'])
+@pytest.mark.parametrize('write_workers', [1, 2])
+def test_streaming_igual_a_openpyxl(libro_control, nuevo_procesador, tmp_path, monkeypatch, columnar, write_workers):
+    nombres_base, hojas_base = _exportar(nuevo_procesador, libro_control, tmp_path / 'openpyxl', 'openpyxl', columnar)
+
+    # El motor streaming toma las filas de los pagos, sin armar DataFrames
+    def sin_dataframe(*args, **kwargs):
+        raise AssertionError("el motor streaming no debe armar el DataFrame de exportación")
+    monkeypatch.setattr(ExcelPaymentProcessorV3, '_preparar_df_export', sin_dataframe)
+
+    nombres, hojas = _exportar(
+        nuevo_procesador, libro_control, tmp_path / 'streaming', 'streaming', columnar, write_workers
+    )
+
+    assert nombres == nombres_base
+    for (filas, anchos), (filas_base, anchos_base) in zip(hojas, hojas_base):
+        assert filas == filas_base
+        assert anchos == anchos_base
+    # Columnas sin ningún valor ('Notas de pago') toman el ancho del encabezado
+    assert all(ancho > 0 for _, anchos in hojas for ancho in anchos.values())
+
+
+def test_pipeline_streaming_igual_a_openpyxl(libro_control, nuevo_procesador, tmp_path):
+    resultados = []
+    for motor_excel in ('openpyxl', 'streaming'):
+        directorio = tmp_path / motor_excel
+        directorio.mkdir()
+        archivos = nuevo_procesador(tamaño_bloque=700).procesar_excel_pipeline(
+            str(libro_control), str(directorio / 'salida.xlsx'), motor_excel=motor_excel
+        )
+        assert archivos
+        resultados.append(_leer_hojas(archivos))
+
+    assert resultados[0] == resultados[1]
@@ -0,0 +1,145 @@
+"""_parsear_fechas, parse_fechas y _precalcular_fechas dan lo mismo que parse_fecha_mejorada."""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from extraer_pagos import FECHA_FALLIDA, FECHA_NO_DISPONIBLE, FECHA_PARSEADA
+
+ESTADISTICAS_FECHAS = (
+    'fechas_parseadas', 'fechas_fallidas', 'fechas_no_disponibles', 'fechas_cambio_año', 'fechas_corregidas'
+)
+NOMBRES_ESTADO = {
+    FECHA_NO_DISPONIBLE: 'fechas_no_disponibles',
+    FECHA_PARSEADA: 'fechas_parseadas',
+    FECHA_FALLIDA: 'fechas_fallidas',
+}
+
+VALORES = [
+    # Serial de Excel (dentro y fuera de rango)
+    45000, 45000.5, 30000, 24999, 70000,
+    # dd/mm/yyyy
+    '15/03/2024', '5/1/2023', ' 07/08/2024 ', '31/02/2024', '12/13/2024', '01/01/1999', '15/03/2031',
+    # d-mmm, con día ajustado, día 0 y mes desconocido
+    '4-ago', '7-Sep', '15-enero', '31-feb', '30-FEB', '0-ago', '4-xyz', '29-feb',
+    # ISO y otros que resuelve pandas
+    '2024-03-15', '2024-03-15 00:00:00', '2031-01-01', datetime(2024, 3, 15), pd.Timestamp('2023-11-02'),
+    # Vacíos e inválidos
+    None, np.nan, '', '  ', 'N/A', '-', 'abc', '4/ago', '15/03',
+]
+
+# (año_contexto, mes_nombre, año_columna) como los usa el procesamiento por estudiante
+CONTEXTOS = [
+    (2020, None, None),               # columnas especiales
+    (None, None, None),
+    (2023, 'Noviembre', 2023),        # 'ene'..'jun' pasan a 2024
+    (2023, 'Noviembre.1', 2023),
+    (2023, 'Marzo', 2023),            # sin cambio de año
+    (2024, 'Julio', 2024),
+    (2024, 'Columna rara', 2024),
+    (2023, None, 2023),
+]
+VALORES_CONTEXTO = ['4-ene', '30-jun', '31-jun', '4-jul', '15-dic', '29-feb', '1/2/2024', 45000]
+
+
+def _contar(procesador):
+    return {clave: procesador.estadisticas[clave] for clave in ESTADISTICAS_FECHAS}
+
+
+def _escalar(procesador, valor, contexto):
+    """parse_fecha_mejorada y el efecto que tuvo en las estadísticas."""
+    antes = _contar(procesador)
+    fecha = procesador.parse_fecha_mejorada(
+        valor, año_contexto=contexto[0], mes_nombre=contexto[1], año_columna=contexto[2]
+    )
+    despues = _contar(procesador)
+    return fecha, {clave: despues[clave] - antes[clave] for clave in ESTADISTICAS_FECHAS if despues[clave] != antes[clave]}
+
+
+def _casos():
+    return [(valor, contexto) for contexto in CONTEXTOS for valor in VALORES + VALORES_CONTEXTO]
+
+
+def _arreglo(valores):
+    arreglo = np.empty(len(valores), dtype=object)
+    arreglo[:] = valores
+    return arreglo
+
+
+def test_casos_cubren_todos_los_estados(nuevo_procesador):
+    procesador = nuevo_procesador()
+    efectos = set()
+    for valor, contexto in _casos():
+        efectos.update(_escalar(procesador, valor, contexto)[1])
+    assert efectos == set(ESTADISTICAS_FECHAS)
+
+
+def test_parsear_fechas_igual_a_escalar(nuevo_procesador):
+    casos = _casos()
+    escalar = nuevo_procesador()
+    esperados = [_escalar(escalar, valor, contexto) for valor, contexto in casos]
+
+    lote = nuevo_procesador()
+    fechas, estado, cambio_año, corregida = lote._parsear_fechas(
+        [valor for valor, _ in casos],
+        _arreglo([c[0] for _, c in casos]),
+        _arreglo([c[1] for _, c in casos]),
+        _arreglo([c[2] for _, c in casos]),
+    )
+
+    for k, ((valor, contexto), (fecha, efectos)) in enumerate(zip(casos, esperados)):
+        obtenidos = {NOMBRES_ESTADO[int(estado[k])]: 1}
+        if cambio_año[k]:
+            obtenidos['fechas_cambio_año'] = 1
+        if corregida[k]:
+            obtenidos['fechas_corregidas'] = 1
+        assert (fechas[k], obtenidos) == (fecha, efectos), (valor, contexto)
+
+    # El motor por lotes no toca las estadísticas
+    assert all(valor == 0 for valor in _contar(lote).values())
+
+
+@pytest.mark.parametrize('contexto', CONTEXTOS, ids=str)
+def test_parse_fechas_igual_a_escalar(nuevo_procesador, contexto):
+    valores = VALORES + VALORES_CONTEXTO
+    escalar = nuevo_procesador()
+    esperadas = [_escalar(escalar, valor, contexto)[0] for valor in valores]
+
+    lote = nuevo_procesador()
+    assert lote.parse_fechas(valores, *contexto) == esperadas
+    assert _contar(lote) == _contar(escalar)
+
+
+def test_precalcular_fechas_igual_a_escalar(nuevo_procesador):
+    procesador = nuevo_procesador()
+    inicio = procesador.COL_MESES_START
+    columnas_info = [
+        {'indice': inicio, 'año': 2023, 'nombre': 'Noviembre', 'mes_numero': 11},
+        {'indice': inicio + 1, 'año': 2023, 'nombre': 'Marzo', 'mes_numero': 3},
+        {'indice': inicio + 2, 'año': 2024, 'nombre': 'Julio', 'mes_numero': 7},
+    ]
+    contextos = {idx: (2020, None, None) for idx in procesador._indices_columnas_pago([])}
+    contextos.update({c['indice']: (c['año'], c['nombre'], c['año']) for c in columnas_info})
+
+    valores = VALORES + VALORES_CONTEXTO
+    filas_fechas = np.full((len(valores), inicio + len(columnas_info)), None, dtype=object)
+    for idx in contextos:
+        # Cada columna con los valores en otro orden, más celdas múltiples que no se precalculan
+        filas_fechas[:, idx] = np.roll(_arreglo(valores), idx)
+    filas_fechas[0, inicio] = '4-ene/5-feb'
+
+    procesador._precalcular_fechas(filas_fechas, columnas_info)
+    assert procesador._fechas_precalculadas
+
+    # Como en el procesamiento: se consulta con el texto ya limpio de la celda
+    celdas = [
+        (valor.strip() if isinstance(valor, str) else valor, contextos[idx])
+        for idx in contextos
+        for valor in filas_fechas[:, idx]
+    ]
+    referencia = nuevo_procesador()
+    for valor, contexto in celdas:
+        assert _escalar(procesador, valor, contexto) == _escalar(referencia, valor, contexto), (valor, contexto)
+    assert _contar(procesador) == _contar(referencia)
@@ -0,0 +1,183 @@
+"""Procesamiento incremental: huellas de bloque, reutilización y diferencias entre corridas."""
+
+import pickle
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from extraer_pagos import ExcelPaymentProcessorV3, VERSION_ESTADO_INCREMENTAL
+
+# Tiempos y aciertos de caché dependen de la corrida, no del contenido del libro
+CLAVES_DE_CORRIDA = {'inicio_procesamiento', 'etapas_segundos', 'etapas_llamadas', 'cache_aciertos', 'cache_fallos'}
+
+
+def _estadisticas(procesador):
+    return {
+        clave: dict(valor) if isinstance(valor, dict) else valor
+        for clave, valor in procesador.estadisticas.items()
+        if clave not in CLAVES_DE_CORRIDA
+    }
+
+
+def _incremental(nuevo_procesador, libro, estado):
+    """Corrida incremental; devuelve también cuántos bloques se reprocesaron."""
+    procesador = nuevo_procesador()
+    original = procesador._procesar_bloque_aislado
+    reprocesados = []
+
+    def contar(i, *args, **kwargs):
+        reprocesados.append(i)
+        return original(i, *args, **kwargs)
+
+    procesador._procesar_bloque_aislado = contar
+    pagos, cambios = procesador.procesar_excel_incremental(str(libro), str(estado))
+    return procesador, pagos, cambios, reprocesados
+
+
+def _modificar_libro(origen, destino, estudiante, nombre=None, borrar_ultimo=False):
+    """Copia el libro cambiando el nombre de un estudiante y/o quitando el último."""
+    shutil.copy(origen, destino)
+    wb = load_workbook(destino)
+    ws = wb.active
+    if nombre is not None:
+        ws.cell(row=3 + 4 * estudiante, column=ExcelPaymentProcessorV3.COL_NOMBRE + 1, value=nombre)
+    if borrar_ultimo:
+        ws.delete_rows(ws.max_row - 3, 4)
+    wb.save(destino)
+    return destino
+
+
+def test_primera_corrida_igual_a_v3(libro_control, nuevo_procesador, tmp_path):
+    completo = nuevo_procesador()
+    pagos_v3 = completo.procesar_excel_v3(str(libro_control))
+
+    procesador, pagos, cambios, reprocesados = _incremental(nuevo_procesador, libro_control, tmp_path / 'estado.pkl')
+
+    pd.testing.assert_frame_equal(pd.DataFrame(pagos), pd.DataFrame(pagos_v3))
+    assert _estadisticas(procesador) == _estadisticas(completo)
+    assert len(reprocesados) == 120
+    assert len(cambios['agregados']) == len(pagos_v3)
+    assert not cambios['eliminados'] and not cambios['modificados']
+
+
+def test_sin_cambios_reutiliza_todos_los_bloques(libro_control, nuevo_procesador, tmp_path):
+    estado = tmp_path / 'estado.pkl'
+    primero, pagos_previos, _, _ = _incremental(nuevo_procesador, libro_control, estado)
+
+    segundo, pagos, cambios, reprocesados = _incremental(nuevo_procesador, libro_control, estado)
+
+    assert reprocesados == []
+    pd.testing.assert_frame_equal(pd.DataFrame(pagos), pd.DataFrame(pagos_previos))
+    assert _estadisticas(segundo) == _estadisticas(primero)
+    assert cambios == {'agregados': [], 'eliminados': [], 'modificados': []}
+
+
+def test_solo_se_reprocesan_los_bloques_modificados(libro_control, nuevo_procesador, tmp_path):
+    estado = tmp_path / 'estado.pkl'
+    _, pagos_previos, _, _ = _incremental(nuevo_procesador, libro_control, estado)
+
+    libro = _modificar_libro(libro_control, tmp_path / 'modificado.xlsx', 10, nombre='Otro Nombre', borrar_ultimo=True)
+    procesador, pagos, cambios, reprocesados = _incremental(nuevo_procesador, libro, estado)
+
+    assert len(reprocesados) == 1
+    completo = nuevo_procesador()
+    pd.testing.assert_frame_equal(pd.DataFrame(pagos), pd.DataFrame(completo.procesar_excel_v3(str(libro))))
+    assert _estadisticas(procesador) == _estadisticas(completo)
+
+    previos = pd.DataFrame(pagos_previos)
+    carnet_modificado = previos['carnet'].unique()[10]
+    carnet_borrado = previos['carnet'].iloc[-1]
+
+    assert not cambios['agregados']
+    assert {p['carnet'] for p in cambios['eliminados']} == {carnet_borrado}
+    assert len(cambios['eliminados']) == (previos['carnet'] == carnet_borrado).sum()
+    assert len(cambios['modificados']) == (previos['carnet'] == carnet_modificado).sum()
+    for antes, despues in cambios['modificados']:
+        assert antes['carnet'] == despues['carnet'] == carnet_modificado
+        assert antes != despues
+
+
+def test_huella_de_bloque():
+    huella = ExcelPaymentProcessorV3._huella_bloque
+    filas = (('ASM1', 'Ana', 100), (None, 1, 2), ('01/02/2024', None, None), ('BI', None, None))
+
+    assert huella(filas, 'enc') == huella(filas, 'enc')
+    # NaN y None son la misma celda vacía
+    con_nan = (('ASM1', 'Ana', 100), (np.nan, 1, 2), ('01/02/2024', np.nan, None), ('BI', None, float('nan')))
+    assert huella(con_nan, 'enc') == huella(filas, 'enc')
+
+    assert huella(filas, 'otro') != huella(filas, 'enc')
+    cambiada = (('ASM1', 'Ana', 101),) + filas[1:]
+    assert huella(cambiada, 'enc') != huella(filas, 'enc')
+
+
+def test_cambio_de_configuracion_reprocesa_todo(libro_control, nuevo_procesador, tmp_path):
+    estado = tmp_path / 'estado.pkl'
+    _incremental(nuevo_procesador, libro_control, estado)
+
+    procesador = nuevo_procesador()
+    columnas_info = [{'indice': 20, 'mes': 'Enero', 'año': 2024}]
+    huella = procesador._huella_encabezado(columnas_info, None)
+    procesador.patrones_bancos = dict(procesador.patrones_bancos, extra='Banco Extra')
+    assert procesador._huella_encabezado(columnas_info, None) != huella
+
+    original = procesador._procesar_bloque_aislado
+    reprocesados = []
+    procesador._procesar_bloque_aislado = lambda i, *a, **k: reprocesados.append(i) or original(i, *a, **k)
+    procesador.procesar_excel_incremental(str(libro_control), str(estado))
+    assert len(reprocesados) == 120
+
+
+def test_estado_con_clases_no_permitidas_se_ignora(libro_control, nuevo_procesador, tmp_path):
+    marca = tmp_path / 'ejecutado'
+
+    class Malicioso:
+        def __reduce__(self):
+            return (Path.touch, (marca,))
+
+    estado = tmp_path / 'estado.pkl'
+    with open(estado, 'wb') as f:
+        pickle.dump({'version': VERSION_ESTADO_INCREMENTAL, 'bloques': Malicioso()}, f)
+
+    _, pagos, _, reprocesados = _incremental(nuevo_procesador, libro_control, estado)
+
+    assert not marca.exists()
+    assert len(reprocesados) == 120 and len(pagos) > 0
+    # El estado se reescribe y la próxima corrida lo reutiliza
+    _, _, _, reprocesados = _incremental(nuevo_procesador, libro_control, estado)
+    assert reprocesados == []
+
+
+def _pago(carnet, concepto, monto, tipo='Mensual', mes=1, año=2024):
+    return {'carnet': carnet, 'tipo_pago': tipo, 'concepto': concepto, 'mes_pago': mes, 'año': año, 'monto': monto}
+
+
+def test_diferencias_pagos():
+    diferencias = ExcelPaymentProcessorV3._diferencias_pagos
+    a = {'pagos': [_pago('A', 'Mes Enero', 100), _pago('A', 'Mes Enero', 50)]}
+    a2 = {'pagos': [_pago('A', 'Mes Enero', 100), _pago('A', 'Mes Enero', 75)]}
+    b = {'pagos': [_pago('B', 'Mes Enero', 200)]}
+    c = {'pagos': [_pago('C', 'Inscripción', 300, tipo='Especial', mes=None)]}
+    previos = {'a': a, 'b': b}
+
+    # Bloques iguales: sin cambios
+    assert diferencias({'orden': ['a', 'b']}, previos, ['a', 'b'], previos) == {
+        'agregados': [], 'eliminados': [], 'modificados': []
+    }
+
+    # a cambia (segunda ocurrencia del mismo concepto), b desaparece, c aparece
+    cambios = diferencias({'orden': ['a', 'b']}, previos, ['a2', 'c'], {'a2': a2, 'c': c})
+    assert cambios['agregados'] == c['pagos']
+    assert cambios['eliminados'] == b['pagos']
+    assert cambios['modificados'] == [(a['pagos'][1], a2['pagos'][1])]
+
+    # Un bloque repetido cuenta por ocurrencia
+    cambios = diferencias({'orden': ['b']}, previos, ['b', 'b'], previos)
+    assert cambios['agregados'] == b['pagos'] and not cambios['eliminados']
+
+    # Sin estado previo todo es agregado
+    cambios = diferencias({}, {}, ['b'], previos)
+    assert cambios['agregados'] == b['pagos']
@@ -0,0 +1,155 @@
+"""Índice persistente de boletas: consultas, siembra, acciones sobre duplicados y reporte."""
+
+import shutil
+import sqlite3
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from extraer_pagos import ORIGEN_MISMA_EJECUCION, IndiceBoletas, _sha256_archivo, clave_boleta
+
+
+@pytest.fixture
+def indice(tmp_path):
+    with IndiceBoletas(tmp_path / 'boletas.sqlite') as indice:
+        yield indice
+
+
+def _procesar(nuevo_procesador, indice, libro, **opciones):
+    procesador = nuevo_procesador(indice_boletas=indice, **opciones)
+    pagos = procesador.procesar_excel_v3(str(libro))
+    return procesador, pagos
+
+
+def _libro_del_mes(libro_control, ruta):
+    """Otro libro con los mismos pagos (contenido distinto, p. ej. el del mes siguiente)."""
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    libro = openpyxl.load_workbook(libro_control)
+    libro.active.cell(row=1, column=1).value = f"{libro.active.cell(row=1, column=1).value} "
+    libro.save(ruta)
+    assert _sha256_archivo(ruta).hexdigest() != _sha256_archivo(libro_control).hexdigest()
+    return ruta
+
+
+def test_registrar_y_buscar(indice, tmp_path):
+    assert indice.registrar([('A|BI|10.00', 'libro1.xlsx'), ('B|BI|20.00', 'libro1.xlsx')], 'sha1') == 2
+    assert indice.registrar([('A|BI|10.00', 'libro2.xlsx'), ('C|BAC|5.00', 'libro2.xlsx')], 'sha2') == 1
+    assert len(indice) == 3
+    assert indice.buscar(['A|BI|10.00', 'C|BAC|5.00', 'Z|BI|1.00']) == {
+        'A|BI|10.00': ('libro1.xlsx', 'sha1'),
+        'C|BAC|5.00': ('libro2.xlsx', 'sha2'),
+    }
+
+    # Persiste al reabrir
+    indice.cerrar()
+    with IndiceBoletas(tmp_path / 'boletas.sqlite') as reabierto:
+        assert len(reabierto) == 3
+
+
+def test_consultas_por_tandas(indice):
+    claves = [f"{i}|BI|1.00" for i in range(IndiceBoletas.TAMAÑO_CONSULTA * 2 + 7)]
+    indice.registrar((clave, 'x') for clave in claves[::2])
+    assert set(indice.buscar(claves)) == set(claves[::2])
+
+
+def test_migra_indice_sin_columna_libro(tmp_path):
+    ruta = tmp_path / 'viejo.sqlite'
+    with sqlite3.connect(ruta) as conexion:
+        conexion.execute(
+            "CREATE TABLE boletas (clave TEXT PRIMARY KEY, origen TEXT NOT NULL, registrada TEXT NOT NULL) WITHOUT ROWID"
+        )
+        conexion.execute("INSERT INTO boletas VALUES ('A|BI|10.00', 'viejo.xlsx', '2024-01-01T00:00:00')")
+    with IndiceBoletas(ruta) as indice:
+        assert indice.buscar(['A|BI|10.00']) == {'A|BI|10.00': ('viejo.xlsx', None)}
+
+
+def test_clave_boleta():
+    assert clave_boleta(' 47-719 ', 'bi', 1500) == '47719|BI|1500.00'
+    assert clave_boleta('47719', None, '1500.001') == '47719|NO ESPECIFICADO|1500.00'
+    assert clave_boleta(None, 'BI', 10) is None
+    assert clave_boleta('--', 'BI', 10) is None
+    assert clave_boleta('1', 'BI', 'x') is None
+
+
+def test_libro_del_mes_siguiente_con_el_mismo_nombre(libro_control, nuevo_procesador, indice, tmp_path):
+    octubre = tmp_path / 'oct' / 'pagos.xlsx'
+    octubre.parent.mkdir()
+    shutil.copy(libro_control, octubre)
+
+    primero, pagos = _procesar(nuevo_procesador, indice, octubre)
+    repetidas_en_libro = primero.estadisticas['boletas_duplicadas']
+    assert all(d['origen_duplicado'] == ORIGEN_MISMA_EJECUCION for d in primero.estadisticas['pagos_duplicados'])
+    assert primero.estadisticas['boletas_registradas'] == len(indice) > 0
+
+    # Reprocesar el mismo libro (mismo contenido, aun con otro nombre) no duplica
+    shutil.copy(octubre, tmp_path / 'copia.xlsx')
+    for ruta in (octubre, tmp_path / 'copia.xlsx'):
+        reproceso, _ = _procesar(nuevo_procesador, indice, ruta)
+        assert reproceso.estadisticas['boletas_duplicadas'] == repetidas_en_libro
+        assert reproceso.estadisticas['boletas_registradas'] == 0
+
+    # El libro de noviembre se llama igual pero trae los pagos ya registrados
+    noviembre = _libro_del_mes(libro_control, tmp_path / 'nov' / 'pagos.xlsx')
+    segundo, pagos_nov = _procesar(nuevo_procesador, indice, noviembre)
+    assert segundo.estadisticas['boletas_duplicadas'] == segundo.estadisticas['boletas_consultadas'] > 0
+    origenes = {d['origen_duplicado'] for d in segundo.estadisticas['pagos_duplicados']}
+    assert origenes <= {'pagos.xlsx', ORIGEN_MISMA_EJECUCION} and 'pagos.xlsx' in origenes
+    # 'marcar' deja los pagos en la salida
+    assert len(pagos_nov) == len(pagos)
+
+
+def test_descartar_quita_duplicados(libro_control, nuevo_procesador, indice, tmp_path):
+    _procesar(nuevo_procesador, indice, libro_control)
+    noviembre = _libro_del_mes(libro_control, tmp_path / 'nov.xlsx')
+
+    procesador, pagos = _procesar(nuevo_procesador, indice, noviembre, accion_duplicados='descartar')
+
+    duplicadas = procesador.estadisticas['boletas_duplicadas']
+    assert duplicadas > 0
+    assert procesador.estadisticas['boletas_descartadas'] == duplicadas
+    sin_clave = sum(1 for p in pagos if clave_boleta(p['numero_boleta'], p['banco'], p['monto']) is None)
+    assert len(pagos) == sin_clave
+
+
+def test_sembrar_desde_salida_previa(libro_control, nuevo_procesador, indice, tmp_path):
+    previo = nuevo_procesador()
+    archivos = previo.generar_excel_normalizado_en_bloques(
+        previo.procesar_excel_v3(str(libro_control)), str(tmp_path / 'salida_previa.xlsx')
+    )
+    assert len(archivos) == 1
+
+    procesador = nuevo_procesador(indice_boletas=indice)
+    nuevas = procesador.sembrar_indice_boletas(archivos[0])
+    assert nuevas == len(indice) > 0
+    assert procesador.sembrar_indice_boletas(archivos[0]) == 0
+
+    pagos = procesador.procesar_excel_v3(str(libro_control))
+    claves = {clave_boleta(p['numero_boleta'], p['banco'], p['monto']) for p in pagos} - {None}
+    assert claves <= set(indice.buscar(claves))
+    assert procesador.estadisticas['boletas_registradas'] == 0
+    assert procesador.estadisticas['boletas_duplicadas'] == procesador.estadisticas['boletas_consultadas']
+    assert 'salida:salida_previa.xlsx' in {d['origen_duplicado'] for d in procesador.estadisticas['pagos_duplicados']}
+
+
+def test_sembrar_sin_indice(nuevo_procesador):
+    with pytest.raises(ValueError):
+        nuevo_procesador().sembrar_indice_boletas('salida.xlsx')
+
+
+def test_reporte_duplicados(libro_control, nuevo_procesador, indice, tmp_path):
+    _procesar(nuevo_procesador, indice, libro_control)
+    procesador, _ = _procesar(nuevo_procesador, indice, _libro_del_mes(libro_control, tmp_path / 'nov.xlsx'))
+
+    archivo = procesador.generar_reporte_duplicados(str(tmp_path / 'duplicados.xlsx'))
+
+    df = pd.read_excel(archivo, sheet_name='Duplicados', dtype={'numero_boleta': str})
+    assert list(df.columns[:2]) == ['origen_duplicado', 'carnet']
+    assert 'Estatus (normalizado)' in df.columns
+    assert len(df) == procesador.estadisticas['boletas_duplicadas']
+    assert set(df['origen_duplicado']) <= {'nov.xlsx', 'control.xlsx', ORIGEN_MISMA_EJECUCION}
+
+
+def test_reporte_sin_duplicados(nuevo_procesador, tmp_path):
+    assert nuevo_procesador().generar_reporte_duplicados(str(tmp_path / 'd.xlsx')) is None
+    assert not (tmp_path / 'd.xlsx').exists()
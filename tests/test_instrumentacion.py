@@ -0,0 +1,108 @@
+"""instrumentar=True mide todas las etapas sin cambiar la salida; perfilar y rss_pico_mb."""
+
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from extraer_pagos import ETAPAS_INSTRUMENTADAS, perfilar, procesar_archivo_v3, rss_pico_mb
+
+# Tiempos y aciertos de caché dependen de la corrida, no del contenido del libro
+CLAVES_DE_CORRIDA = {'inicio_procesamiento', 'etapas_segundos', 'etapas_llamadas', 'cache_aciertos', 'cache_fallos'}
+
+
+def _corrida(nuevo_procesador, libro, directorio, modo_lectura, workers, motor_excel, instrumentar):
+    procesador = nuevo_procesador(instrumentar=instrumentar, tamaño_bloque=700)
+    pagos = procesador.procesar_excel_v3(str(libro), modo_lectura=modo_lectura, workers=workers)
+    directorio.mkdir()
+    archivos = procesador.generar_excel_normalizado_en_bloques(pagos, str(directorio / 'pagos.xlsx'), motor_excel=motor_excel)
+    salida = pd.concat([pd.read_excel(archivo) for archivo in archivos], ignore_index=True)
+    return procesador, pd.DataFrame(pagos), salida, [Path(a).name for a in archivos]
+
+
+def _estadisticas(procesador):
+    return {
+        clave: dict(valor) if isinstance(valor, dict) else valor
+        for clave, valor in procesador.estadisticas.items()
+        if clave not in CLAVES_DE_CORRIDA and clave != 'tiempos_escritura'
+    }
+
+
+@pytest.mark.parametrize('modo_lectura, workers, motor_excel', [
+    ('pandas', 1, 'openpyxl'),
+    ('streaming', 1, 'streaming'),
+    ('numpy', 2, 'openpyxl'),
+], ids=['pandas', 'streaming', 'numpy-workers2'])
+def test_instrumentar_mide_todas_las_etapas_sin_cambiar_salida(
+    libro_control, nuevo_procesador, tmp_path, modo_lectura, workers, motor_excel
+):
+    base, pagos_base, salida_base, archivos_base = _corrida(
+        nuevo_procesador, libro_control, tmp_path / 'sin', modo_lectura, workers, motor_excel, instrumentar=False
+    )
+    medido, pagos, salida, archivos = _corrida(
+        nuevo_procesador, libro_control, tmp_path / 'con', modo_lectura, workers, motor_excel, instrumentar=True
+    )
+
+    assert not base.estadisticas['etapas_segundos'] and not base.estadisticas['etapas_llamadas']
+
+    segundos = medido.estadisticas['etapas_segundos']
+    llamadas = medido.estadisticas['etapas_llamadas']
+    for etapa in ETAPAS_INSTRUMENTADAS:
+        assert llamadas[etapa] > 0, etapa
+        assert segundos[etapa] >= 0, etapa
+    assert set(segundos) <= set(ETAPAS_INSTRUMENTADAS)
+    assert llamadas['escritura_bloque'] == len(archivos)
+    assert llamadas['lectura'] == 1
+
+    pd.testing.assert_frame_equal(pagos, pagos_base)
+    pd.testing.assert_frame_equal(salida, salida_base)
+    assert archivos == archivos_base
+    assert _estadisticas(medido) == _estadisticas(base)
+
+
+def test_resumen_instrumentacion(libro_control, nuevo_procesador, tmp_path):
+    procesador = nuevo_procesador(instrumentar=True)
+    pagos = procesador.procesar_excel_v3(str(libro_control))
+
+    resumen = procesador.resumen_instrumentacion()
+    etapas = list(resumen['etapas'])
+    assert etapas == [e for e in ETAPAS_INSTRUMENTADAS if e in etapas]
+    assert resumen['pagos_extraidos'] == len(pagos)
+    assert all(valores['llamadas'] > 0 for valores in resumen['etapas'].values())
+    texto = procesador.texto_instrumentacion()
+    assert all(etapa in texto for etapa in etapas)
+
+    ruta = procesador.exportar_instrumentacion(str(tmp_path / 'instrumentacion.json'))
+    assert json.loads(Path(ruta).read_text(encoding='utf-8'))['etapas'].keys() == resumen['etapas'].keys()
+
+
+def test_procesar_archivo_exporta_instrumentacion(libro_control, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    procesar_archivo_v3(str(libro_control), str(tmp_path / 'pagos.xlsx'), instrumentar=True)
+
+    resumen = json.loads((tmp_path / 'pagos_instrumentacion.json').read_text(encoding='utf-8'))
+    for etapa in ETAPAS_INSTRUMENTADAS:
+        assert resumen['etapas'][etapa]['llamadas'] > 0, etapa
+
+
+def test_rss_pico_mb():
+    rss = rss_pico_mb()
+    assert set(rss) == {'proceso', 'hijos'}
+    if rss['proceso'] is not None:
+        assert rss['proceso'] > 0
+
+
+def test_perfilar(tmp_path, capsys):
+    with perfilar(None, str(tmp_path / 'nada')):
+        pass
+    assert list(tmp_path.iterdir()) == []
+
+    with perfilar('cprofile', str(tmp_path / 'perfil')):
+        sum(range(1000))
+    assert (tmp_path / 'perfil.prof').exists()
+    assert 'cProfile' in capsys.readouterr().out
+
+    with pytest.raises(ValueError, match='Perfilador no soportado'):
+        with perfilar('otro', str(tmp_path / 'perfil')):
+            pass
@@ -0,0 +1,158 @@
+"""Carga a kardex_pagos: normalización y huella iguales a producción, recargas idempotentes."""
+
+import math
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+from extraer_pagos import SQL_HUELLA_KARDEX, normalizar_banco_kardex, normalizar_boleta
+from lector_pgdump import LectorPgDump
+
+RESPALDO = Path(__file__).resolve().parent.parent / 'lloros' / 'LastBackup.backup'
+
+# Pago id 5 de kardex_pagos en RESPALDO
+PAGO_IMPORTADO = {
+    'estudiante_programa_id': 119,
+    'fecha_pago': date(2020, 1, 1),
+    'monto_pagado': Decimal('1500.00'),
+    'numero_boleta': '47719',
+    'banco': 'No especificado',
+    'numero_boleta_normalizada': '47719',
+    'banco_normalizado': 'NO ESPECIFICADO',
+    'boleta_fingerprint': 'e8c884c21c017ab13eb2ab3627a29c19535490ddbb7a27b191a47ab148a3d1d3',
+}
+
+ESQUEMA = """
+CREATE TABLE prospectos (id bigserial PRIMARY KEY, nombre_completo varchar(255), carnet varchar(255));
+CREATE TABLE tb_programas (id bigserial PRIMARY KEY, abreviatura varchar(50));
+CREATE TABLE estudiante_programa (
+    id bigserial PRIMARY KEY, prospecto_id bigint NOT NULL, programa_id bigint NOT NULL,
+    fecha_inicio date NOT NULL, deleted_at timestamp
+);
+CREATE TABLE kardex_pagos (
+    id bigserial PRIMARY KEY,
+    estudiante_programa_id bigint NOT NULL REFERENCES estudiante_programa(id),
+    cuota_id bigint, fecha_pago date NOT NULL, monto_pagado numeric(12,2) NOT NULL,
+    metodo_pago varchar(50), observaciones text,
+    created_at timestamp DEFAULT now() NOT NULL, updated_at timestamp DEFAULT now() NOT NULL,
+    numero_boleta varchar(255), banco varchar(255), archivo_comprobante varchar(255),
+    estado_pago varchar(255) DEFAULT 'pendiente_revision' NOT NULL, created_by bigint,
+    numero_boleta_normalizada varchar(120), banco_normalizado varchar(120),
+    boleta_fingerprint varchar(128) UNIQUE, archivo_hash varchar(128),
+    uploaded_by bigint, updated_by bigint, fecha_recibo date
+);
+"""
+
+
+def _pagos_importados():
+    with LectorPgDump(RESPALDO) as lector:
+        for fila in lector.filas('kardex_pagos'):
+            if fila['boleta_fingerprint'] is not None:
+                yield fila
+
+
+def test_normalizacion_igual_a_produccion():
+    filas = 0
+    for fila in _pagos_importados():
+        assert normalizar_boleta(fila['numero_boleta']) == fila['numero_boleta_normalizada']
+        assert normalizar_banco_kardex(fila['banco']) == fila['banco_normalizado']
+        filas += 1
+    assert filas > 20_000
+
+
+def test_huella_reproduce_la_del_respaldo(dsn_postgres):
+    import psycopg
+
+    muestra = [fila for i, fila in enumerate(_pagos_importados()) if i % 500 == 0]
+    huella = "SELECT " + SQL_HUELLA_KARDEX.format(
+        banco_normalizado='%(banco_normalizado)s::text',
+        numero_boleta_normalizada='%(numero_boleta_normalizada)s::text',
+        estudiante_programa_id='%(estudiante_programa_id)s::bigint',
+        fecha_pago='%(fecha_pago)s::date'
+    )
+    with psycopg.connect(dsn_postgres) as conexion:
+        assert conexion.execute(huella, PAGO_IMPORTADO).fetchone()[0] == PAGO_IMPORTADO['boleta_fingerprint']
+        for fila in muestra:
+            assert conexion.execute(huella, fila).fetchone()[0] == fila['boleta_fingerprint']
+
+
+def test_recarga_actualiza_pago_ya_importado(dsn_postgres, nuevo_procesador):
+    import psycopg
+
+    with psycopg.connect(dsn_postgres) as conexion:
+        conexion.execute(ESQUEMA)
+        conexion.execute("INSERT INTO prospectos (id, carnet) VALUES (1, 'asm-2020001')")
+        conexion.execute("INSERT INTO tb_programas (id, abreviatura) VALUES (1, 'BBA')")
+        conexion.execute(
+            "INSERT INTO estudiante_programa (id, prospecto_id, programa_id, fecha_inicio) "
+            "VALUES (%(estudiante_programa_id)s, 1, 1, '2020-01-01')", PAGO_IMPORTADO
+        )
+        conexion.execute(
+            """
+            INSERT INTO kardex_pagos (estudiante_programa_id, fecha_pago, monto_pagado, numero_boleta,
+                                      banco, numero_boleta_normalizada, banco_normalizado, boleta_fingerprint)
+            VALUES (%(estudiante_programa_id)s, %(fecha_pago)s, %(monto_pagado)s, %(numero_boleta)s,
+                    %(banco)s, %(numero_boleta_normalizada)s, %(banco_normalizado)s, %(boleta_fingerprint)s)
+            """,
+            PAGO_IMPORTADO
+        )
+
+    pago = {
+        'carnet': 'ASM2020001', 'plan_estudios': 'BBA', 'numero_boleta': '47-719', 'monto': 1500.0,
+        'fecha_pago': '2020-01-01', 'banco': 'No especificado', 'concepto': 'Cuota mensual',
+        'mes_pago': 'Enero', 'año': 2020, 'tipo_pago': 'Mensual',
+    }
+    carga = nuevo_procesador().cargar_kardex_pagos([pago], dsn_postgres)
+    assert (carga['insertados'], carga['actualizados']) == (0, 1)
+
+    with psycopg.connect(dsn_postgres) as conexion:
+        filas = conexion.execute(
+            "SELECT boleta_fingerprint, banco_normalizado, numero_boleta_normalizada FROM kardex_pagos"
+        ).fetchall()
+    assert filas == [(PAGO_IMPORTADO['boleta_fingerprint'], 'NO ESPECIFICADO', '47719')]
+
+
+def test_cargar_libro_dos_veces(dsn_postgres, libro_control, nuevo_procesador):
+    import psycopg
+
+    procesador = nuevo_procesador()
+    pagos = procesador.procesar_excel_v3(str(libro_control))
+    carnets = sorted({p['carnet'] for p in pagos})
+    sin_estudiante = carnets[::5]
+    programas = {}
+
+    with psycopg.connect(dsn_postgres) as conexion:
+        conexion.execute(ESQUEMA)
+        for carnet in carnets:
+            if carnet in sin_estudiante:
+                continue
+            # Con guion y en minúsculas, como se capturan en el CRM
+            prospecto = conexion.execute(
+                "INSERT INTO prospectos (carnet) VALUES (%s) RETURNING id", (carnet[:3].lower() + '-' + carnet[3:],)
+            ).fetchone()[0]
+            programas[carnet] = conexion.execute(
+                "INSERT INTO estudiante_programa (prospecto_id, programa_id, fecha_inicio) "
+                "VALUES (%s, 1, '2020-01-01') RETURNING id", (prospecto,)
+            ).fetchone()[0]
+
+    cargables = [
+        p for p in pagos
+        if p['fecha_pago'] and p['monto'] is not None and not math.isnan(p['monto']) and p['carnet'] in programas
+    ]
+    huellas = {
+        (normalizar_banco_kardex(p['banco']), normalizar_boleta(p['numero_boleta']), programas[p['carnet']], p['fecha_pago'])
+        for p in cargables
+    }
+    assert huellas
+
+    primera = procesador.cargar_kardex_pagos(pagos, dsn_postgres)
+    assert primera['pagos'] == len(pagos)
+    assert (primera['insertados'], primera['actualizados']) == (len(huellas), 0)
+    assert primera['carnets_sin_estudiante'] == sin_estudiante
+
+    segunda = procesador.cargar_kardex_pagos(pagos, dsn_postgres)
+    assert (segunda['insertados'], segunda['actualizados']) == (0, len(huellas))
+    assert segunda['carnets_sin_estudiante'] == sin_estudiante
+
+    with psycopg.connect(dsn_postgres) as conexion:
+        assert conexion.execute("SELECT count(*) FROM kardex_pagos").fetchone()[0] == len(huellas)
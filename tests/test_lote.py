@@ -0,0 +1,34 @@
+"""Modo lote: un libro que mata a su proceso no detiene al resto."""
+
+import os
+import shutil
+from pathlib import Path
+
+import extraer_pagos
+from extraer_pagos import _procesar_libro_lote, procesar_lote
+
+
+def _procesar_o_terminar(ruta_archivo, *args):
+    # Simula un segfault / OOM kill del worker
+    if Path(ruta_archivo).stem == 'danado':
+        os._exit(1)
+    return _procesar_libro_lote(ruta_archivo, *args)
+
+
+def test_proceso_caido_no_detiene_el_lote(tmp_path, monkeypatch, libro_control):
+    entradas = tmp_path / 'entradas'
+    entradas.mkdir()
+    for nombre in ('a', 'b', 'danado', 'c', 'd'):
+        shutil.copy(libro_control, entradas / f"{nombre}.xlsx")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(extraer_pagos, '_procesar_libro_lote', _procesar_o_terminar)
+
+    resumen = procesar_lote(str(entradas), str(tmp_path / 'salida'), workers=2)
+
+    por_libro = {Path(libro['archivo']).stem: libro for libro in resumen['libros']}
+    assert list(por_libro) == ['a', 'b', 'c', 'd', 'danado']
+    assert 'BrokenProcessPool' in por_libro['danado']['error']
+    pagos = {libro['pagos'] for nombre, libro in por_libro.items() if nombre != 'danado'}
+    assert len(pagos) == 1 and pagos.pop() > 0
+    assert all(por_libro[nombre]['error'] is None for nombre in 'abcd')
+    assert len(resumen['archivos']) == 4
@@ -0,0 +1,34 @@
+"""Los modos de lectura y el procesamiento paralelo producen los mismos pagos y estadísticas."""
+
+import pandas as pd
+import pytest
+
+# Tiempos y aciertos de caché dependen del camino de lectura, no del contenido del libro
+CLAVES_DE_CORRIDA = {'inicio_procesamiento', 'etapas_segundos', 'cache_aciertos', 'cache_fallos'}
+
+
+def _procesar(nuevo_procesador, libro, **opciones):
+    procesador = nuevo_procesador()
+    pagos = pd.DataFrame(procesador.procesar_excel_v3(str(libro), **opciones))
+    estadisticas = {
+        clave: dict(valor) if isinstance(valor, dict) else valor
+        for clave, valor in procesador.estadisticas.items()
+        if clave not in CLAVES_DE_CORRIDA
+    }
+    return pagos, estadisticas
+
+
+@pytest.mark.parametrize('opciones', [
+    {'modo_lectura': 'numpy'},
+    {'modo_lectura': 'streaming'},
+    {'modo_lectura': 'pandas', 'workers': 2},
+    {'modo_lectura': 'streaming', 'workers': 2},
+], ids=['numpy', 'streaming', 'pandas-workers2', 'streaming-workers2'])
+def test_modo_igual_a_pandas(libro_control, nuevo_procesador, opciones):
+    pagos_base, estadisticas_base = _procesar(nuevo_procesador, libro_control, modo_lectura='pandas')
+    assert len(pagos_base) > 0
+
+    pagos, estadisticas = _procesar(nuevo_procesador, libro_control, **opciones)
+
+    pd.testing.assert_frame_equal(pagos, pagos_base)
+    assert estadisticas == estadisticas_base
@@ -0,0 +1,60 @@
+"""limpiar_monto, _parsear_montos y el registro de eventos comparten el motivo de rechazo."""
+
+import json
+
+import numpy as np
+import pytest
+
+from extraer_pagos import (
+    MONTO_FUERA_DE_RANGO, MONTO_INVALIDO, MONTO_VACIO, MONTO_VALIDO, RegistroEventos
+)
+
+CASOS = [
+    ('1500', MONTO_VALIDO), ('Q1,500.00', MONTO_VALIDO), ('(250)', MONTO_VALIDO), ('$ 75', MONTO_VALIDO),
+    (99999.5, MONTO_VALIDO), (0, MONTO_VALIDO), (3.5, MONTO_VALIDO),
+    ('200000', MONTO_FUERA_DE_RANGO), ('-150000', MONTO_FUERA_DE_RANGO), ('100000.01', MONTO_FUERA_DE_RANGO),
+    (1e6, MONTO_FUERA_DE_RANGO), ('Q 1 000 000', MONTO_FUERA_DE_RANGO),
+    ('1.2.3', MONTO_INVALIDO), ('--5', MONTO_INVALIDO),
+    ('abc', MONTO_VACIO), ('', MONTO_VACIO), (None, MONTO_VACIO), ('n/a', MONTO_VACIO), ('.', MONTO_VACIO),
+    (float('nan'), MONTO_VACIO),
+]
+
+
+def test_clasificacion_escalar_igual_a_vectorizada(nuevo_procesador):
+    procesador = nuevo_procesador()
+    valores = [valor for valor, _ in CASOS]
+    montos, estados = procesador._parsear_montos(np.array(valores, dtype=object))
+
+    for (valor, esperado), monto, estado in zip(CASOS, montos.tolist(), estados.tolist()):
+        escalar, estado_escalar = procesador._clasificar_monto(valor)
+        assert estado_escalar == estado == esperado, valor
+        if esperado == MONTO_VALIDO:
+            assert escalar == monto
+        else:
+            assert escalar is None and np.isnan(monto)
+
+
+@pytest.mark.parametrize('precalculado', [False, True], ids=['escalar', 'precalculado'])
+def test_eventos_de_monto_rechazado(nuevo_procesador, tmp_path, precalculado):
+    eventos = RegistroEventos(str(tmp_path), id_ejecucion='prueba')
+    procesador = nuevo_procesador(eventos=eventos)
+    procesador._fila_actual = 10
+    valores = ['200000', '1.2.3', '1500', '', '(100001)']
+    if precalculado:
+        montos, estados = procesador._parsear_montos(np.array(valores, dtype=object))
+        procesador._montos_precalculados = dict(zip(valores, zip(montos.tolist(), estados.tolist())))
+
+    for valor in valores:
+        invalidos_previos = procesador.estadisticas['montos_invalidos']
+        fallidas_previas = procesador.estadisticas['fechas_fallidas']
+        procesador.limpiar_monto(valor)
+        procesador._emitir_eventos_valores(7, 'ASM2023000001', invalidos_previos, fallidas_previas, valor, None)
+    eventos.cerrar()
+
+    registros = [json.loads(linea) for archivo in eventos.archivos for linea in open(archivo, encoding='utf-8')]
+    assert [(r['evento'], r['valor_crudo'], r['fila']) for r in registros] == [
+        ('monto_fuera_de_rango', '200000', 12),
+        ('monto_invalido', '1.2.3', 12),
+        ('monto_fuera_de_rango', '(100001)', 12),
+    ]
+    assert procesador.estadisticas['montos_invalidos'] == 3
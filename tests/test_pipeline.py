@@ -0,0 +1,153 @@
+"""procesar_excel_pipeline: mismo resultado que procesar_excel_v3 y cancelación ante errores."""
+
+import threading
+
+import openpyxl
+import pytest
+
+import extraer_pagos
+from extraer_pagos import ExcelPaymentProcessorV3
+
+TAMAÑO_BLOQUE = 700
+
+
+def _leer_filas(archivos):
+    filas = []
+    for archivo in archivos:
+        hoja = openpyxl.load_workbook(archivo, read_only=True)['Pagos']
+        filas.append([tuple(fila) for fila in hoja.iter_rows(values_only=True)])
+    return filas
+
+
+def _nombres(archivos):
+    return [archivo.rsplit('/', 1)[-1] for archivo in archivos]
+
+
+def _con_limite(funcion, segundos=60):
+    """Ejecuta funcion en un hilo daemon; falla si no termina a tiempo (pipeline colgado)."""
+    resultado = {}
+    hilo = threading.Thread(target=lambda: resultado.setdefault('valor', funcion()), daemon=True)
+    hilo.start()
+    hilo.join(segundos)
+    assert not hilo.is_alive(), "el pipeline no terminó"
+    return resultado['valor']
+
+
+def _hilos_pipeline():
+    return [h for h in threading.enumerate() if h.name.startswith('pipeline-')]
+
+
+@pytest.fixture
+def referencia(libro_control, nuevo_procesador, tmp_path):
+    procesador = nuevo_procesador(tamaño_bloque=TAMAÑO_BLOQUE)
+    pagos = procesador.procesar_excel_v3(str(libro_control))
+    (tmp_path / 'v3').mkdir()
+    archivos = procesador.generar_excel_normalizado_en_bloques(pagos, str(tmp_path / 'v3' / 'salida.xlsx'))
+    return pagos, archivos
+
+
+@pytest.mark.parametrize('modo_lectura', ['streaming', 'pandas'])
+def test_orden_global_igual_a_procesar_excel_v3(libro_control, nuevo_procesador, tmp_path, referencia, modo_lectura):
+    _, archivos_v3 = referencia
+    (tmp_path / 'pipeline').mkdir()
+
+    procesador = nuevo_procesador(tamaño_bloque=TAMAÑO_BLOQUE)
+    archivos = procesador.procesar_excel_pipeline(
+        str(libro_control), str(tmp_path / 'pipeline' / 'salida.xlsx'),
+        modo_lectura=modo_lectura, orden_global=True, tamaño_cola=4
+    )
+
+    assert _nombres(archivos) == _nombres(archivos_v3)
+    assert _leer_filas(archivos) == _leer_filas(archivos_v3)
+
+
+def test_sin_orden_global_mismos_pagos(libro_control, nuevo_procesador, tmp_path, referencia):
+    pagos_v3, archivos_v3 = referencia
+    (tmp_path / 'pipeline').mkdir()
+
+    procesador = nuevo_procesador(tamaño_bloque=TAMAÑO_BLOQUE)
+    archivos = procesador.procesar_excel_pipeline(
+        str(libro_control), str(tmp_path / 'pipeline' / 'salida.xlsx'), tamaño_cola=4
+    )
+
+    partes = _leer_filas(archivos)
+    encabezado = partes[0][0]
+    filas = [fila for parte in partes for fila in parte[1:]]
+    assert all(parte[0] == encabezado for parte in partes)
+    assert sorted(filas, key=repr) == sorted((f for p in _leer_filas(archivos_v3) for f in p[1:]), key=repr)
+    assert procesador.estadisticas['pagos_extraidos'] == len(pagos_v3)
+    # Un estudiante nunca queda repartido entre dos partes
+    carnets_por_parte = [{fila[0] for fila in parte[1:]} for parte in partes]
+    assert sum(map(len, carnets_por_parte)) == len(set().union(*carnets_por_parte))
+
+
+def test_error_al_normalizar_con_cola_llena(libro_control, nuevo_procesador, tmp_path, monkeypatch):
+    original = ExcelPaymentProcessorV3._procesar_bloques
+    llamadas = []
+
+    def falla_en_la_tercera(self, *args, **kwargs):
+        llamadas.append(1)
+        if len(llamadas) == 3:
+            raise RuntimeError("falla de normalización")
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(ExcelPaymentProcessorV3, '_procesar_bloques', falla_en_la_tercera)
+    procesador = nuevo_procesador(tamaño_bloque=TAMAÑO_BLOQUE)
+
+    archivos = _con_limite(lambda: procesador.procesar_excel_pipeline(
+        str(libro_control), str(tmp_path / 'salida.xlsx'), tamaño_cola=4
+    ))
+
+    assert archivos == []
+    assert not _hilos_pipeline()
+
+
+@pytest.mark.parametrize('orden_global', [False, True])
+def test_error_al_escribir_con_colas_llenas(libro_control, nuevo_procesador, tmp_path, monkeypatch, orden_global):
+    def falla_al_escribir(*args, **kwargs):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(extraer_pagos, '_escribir_bloque_cronometrado', falla_al_escribir)
+    procesador = nuevo_procesador(tamaño_bloque=50)
+
+    archivos = _con_limite(lambda: procesador.procesar_excel_pipeline(
+        str(libro_control), str(tmp_path / 'salida.xlsx'), orden_global=orden_global, tamaño_cola=2
+    ))
+
+    assert archivos == []
+    assert not _hilos_pipeline()
+
+
+@pytest.mark.parametrize('opciones, opcion', [
+    ({'workers': 2}, 'workers'),
+    ({'write_workers': 2}, 'write_workers'),
+    ({'columnar': True}, 'columnar'),
+    ({'formatos': ('excel', 'parquet')}, 'formatos'),
+    ({'estado_incremental': 'estado.pkl'}, 'estado_incremental'),
+    ({'archivo_checkpoint': 'avance.ckpt', 'resume': True}, 'archivo_checkpoint, resume'),
+    ({'kardex_dsn': 'postgresql://localhost/kardex'}, 'kardex_dsn'),
+])
+def test_pipeline_rechaza_opciones_no_soportadas(tmp_path, opciones, opcion):
+    with pytest.raises(ValueError, match=f"pipeline=True: {opcion}$"):
+        extraer_pagos.procesar_archivo_v3(
+            str(tmp_path / 'entrada.xlsx'), str(tmp_path / 'salida.xlsx'), pipeline=True, **opciones
+        )
+    assert not list(tmp_path.iterdir())
+
+
+def test_orden_global_requiere_pipeline(tmp_path):
+    with pytest.raises(ValueError, match="orden_global"):
+        extraer_pagos.procesar_archivo_v3(
+            str(tmp_path / 'entrada.xlsx'), str(tmp_path / 'salida.xlsx'), orden_global=True
+        )
+
+
+def test_procesar_archivo_v3_con_pipeline(libro_control, tmp_path, monkeypatch, referencia):
+    _, archivos_v3 = referencia
+    # procesar_archivo_v3 escribe su log en ./logs
+    monkeypatch.chdir(tmp_path)
+    extraer_pagos.procesar_archivo_v3(
+        str(libro_control), 'salida.xlsx', pipeline=True, orden_global=True, modo_lectura='streaming'
+    )
+    filas = [fila for parte in _leer_filas(['salida.xlsx']) for fila in parte[1:]]
+    assert filas == [fila for parte in _leer_filas(archivos_v3) for fila in parte[1:]]